@@ -1,7 +1,18 @@
 from django.contrib import admin
-from .models import AgenteIA  # <--- Nome correto
+from .models import AgenteIA, GeracaoCache, JobIA  # <--- Nome correto
 
 @admin.register(AgenteIA)
 class AgenteIAAdmin(admin.ModelAdmin):
     list_display = ('nome', 'temperatura', 'criado_em')
-    search_fields = ('nome', 'descricao')
\ No newline at end of file
+    search_fields = ('nome', 'descricao')
+
+@admin.register(GeracaoCache)
+class GeracaoCacheAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'agente', 'modelo', 'hits', 'latencia_ms', 'expira_em')
+    search_fields = ('chave',)
+
+
+@admin.register(JobIA)
+class JobIAAdmin(admin.ModelAdmin):
+    list_display = ('id', 'card', 'agente', 'status', 'tentativas', 'criado_em', 'concluido_em')
+    list_filter = ('status',)
@@ -0,0 +1,183 @@
+"""
+Cache de gerações da IA, endereçado pelo conteúdo.
+
+Rodar de novo o mesmo agente sobre um card que não mudou dá o mesmo
+pedido ao Gemini. A chave é o hash de tudo que influencia a resposta
+(prompt do agente, temperatura, modelo, título e conteúdo do card).
+Se qualquer um muda, a chave muda e a entrada velha simplesmente expira.
+
+Dois backends, escolhidos em settings.AI_CACHE['BACKEND']:
+- 'django': usa o cache do Django (LocMem, Redis, ...), com TTL por
+  entrada e um limite aproximado de MAX_ENTRADAS (ver CacheDjango);
+- 'banco': tabela GeracaoCache, com TTL e despejo LRU por ultimo_acesso.
+
+Cada entrada conta seus hits e guarda a latência/tokens da geração
+original, para estimar quanto tempo e custo de API o cache economizou.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GeracaoCache
+
+
+def chave_geracao(agente, card, modelo):
+    conteudo = json.dumps(
+        [agente.prompt_sistema, agente.temperatura, modelo, card.titulo, card.conteudo_original],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _economia(entradas):
+    return {
+        'entradas': len(entradas),
+        'hits': sum(e['hits'] for e in entradas),
+        'latencia_economizada_ms': sum(e['hits'] * e['latencia_ms'] for e in entradas),
+        'tokens_economizados': sum(e['hits'] * e['tokens'] for e in entradas),
+    }
+
+
+class CacheDjango:
+    """
+    Sem índice compartilhado (que seria regravado inteiro a cada hit e
+    perderia entradas na corrida entre processos): há MAX_ENTRADAS vagas
+    ('ai_cache:vaga:<n>') e cada chave só pode ocupar duas delas, sorteadas
+    pelo hash. Entrada nova pega uma vaga livre ou despeja a ocupante com o
+    hit mais antigo (ultimo_acesso) das duas: LRU aproximado, O(1) por
+    operação. Uma corrida entre processos no máximo deixa uma entrada fora
+    das vagas, que some pelo TTL.
+    """
+    PREFIXO = 'ai_cache:'
+    PREFIXO_VAGA = 'ai_cache:vaga:'
+
+    def __init__(self, alias, ttl, max_entradas):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.max_entradas = max(1, max_entradas)
+
+    def _vagas(self, chave):
+        numero = int.from_bytes(hashlib.blake2b(chave.encode(), digest_size=8).digest(), 'big')
+        primeira = numero % self.max_entradas
+        if self.max_entradas == 1:
+            return [self.PREFIXO_VAGA + str(primeira)]
+        # Segunda vaga sempre diferente da primeira
+        segunda = (primeira + 1 + (numero // self.max_entradas) % (self.max_entradas - 1)) % self.max_entradas
+        return [self.PREFIXO_VAGA + str(primeira), self.PREFIXO_VAGA + str(segunda)]
+
+    def _ocupar_vaga(self, chave):
+        vagas = self._vagas(chave)
+        ocupantes = self.cache.get_many(vagas)
+        for vaga in vagas:
+            if ocupantes.get(vaga) == chave:
+                return vaga
+        entradas = self.cache.get_many([self.PREFIXO + c for c in ocupantes.values()])
+        # Vaga livre (ou de entrada já expirada) primeiro; senão, o hit mais antigo
+        vaga = min(vagas, key=lambda v: (
+            entradas.get(self.PREFIXO + ocupantes.get(v, ''), {}).get('ultimo_acesso', 0)
+        ))
+        if ocupantes.get(vaga):
+            self.cache.delete(self.PREFIXO + ocupantes[vaga])
+        return vaga
+
+    def buscar(self, chave):
+        entrada = self.cache.get(self.PREFIXO + chave)
+        if entrada is None:
+            return None
+        entrada['hits'] += 1
+        entrada['ultimo_acesso'] = time.time_ns()
+        self.cache.set(self.PREFIXO + chave, entrada, self.ttl)
+        if 'vaga' in entrada:  # entradas do formato antigo não têm vaga
+            self.cache.touch(entrada['vaga'], self.ttl)
+        return entrada
+
+    def guardar(self, chave, resultado, modelo, agente_id, latencia_ms, tokens):
+        entrada = {
+            'chave': chave,
+            'resultado': resultado,
+            'modelo': modelo,
+            'agente_id': agente_id,
+            'latencia_ms': latencia_ms,
+            'tokens': tokens,
+            'hits': 0,
+            'criado_em': timezone.now().isoformat(),
+            'ultimo_acesso': time.time_ns(),
+            'vaga': self._ocupar_vaga(chave),
+        }
+        self.cache.set_many({self.PREFIXO + chave: entrada, entrada['vaga']: chave}, self.ttl)
+
+    def estatisticas(self):
+        # Varre as vagas (O(MAX_ENTRADAS)): só para o relatório, fora do caminho da geração
+        ocupantes = self.cache.get_many([self.PREFIXO_VAGA + str(i) for i in range(self.max_entradas)])
+        encontradas = self.cache.get_many([self.PREFIXO + c for c in ocupantes.values()])
+        entradas = [
+            {k: v for k, v in entrada.items() if k not in ('resultado', 'vaga', 'ultimo_acesso')}
+            for entrada in encontradas.values()
+        ]
+        return {**_economia(entradas), 'por_entrada': entradas}
+
+
+class CacheBanco:
+    CAMPOS = ['chave', 'modelo', 'agente_id', 'latencia_ms', 'tokens', 'hits', 'criado_em', 'ultimo_acesso']
+
+    def __init__(self, ttl, max_entradas):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+
+    def buscar(self, chave):
+        agora = timezone.now()
+        atualizadas = GeracaoCache.objects.filter(chave=chave, expira_em__gt=agora).update(
+            hits=F('hits') + 1, ultimo_acesso=agora
+        )
+        if not atualizadas:
+            return None
+        return GeracaoCache.objects.filter(chave=chave).values('resultado', *self.CAMPOS).first()
+
+    def guardar(self, chave, resultado, modelo, agente_id, latencia_ms, tokens):
+        agora = timezone.now()
+        GeracaoCache.objects.update_or_create(chave=chave, defaults={
+            'resultado': resultado,
+            'modelo': modelo,
+            'agente_id': agente_id,
+            'latencia_ms': latencia_ms,
+            'tokens': tokens,
+            'hits': 0,
+            'ultimo_acesso': agora,
+            'expira_em': agora + timedelta(seconds=self.ttl),
+        })
+        self._despejar(agora)
+
+    def _despejar(self, agora):
+        GeracaoCache.objects.filter(expira_em__lte=agora).delete()
+        # LRU: tudo que passou do limite, do acesso mais antigo para trás
+        excedentes = list(
+            GeracaoCache.objects.order_by('-ultimo_acesso')
+            .values_list('id', flat=True)[self.max_entradas:]
+        )
+        if excedentes:
+            GeracaoCache.objects.filter(id__in=excedentes).delete()
+
+    def estatisticas(self):
+        entradas = list(
+            GeracaoCache.objects.filter(expira_em__gt=timezone.now())
+            .order_by('-hits')
+            .values(*self.CAMPOS)
+        )
+        return {**_economia(entradas), 'por_entrada': entradas}
+
+
+def obter_cache():
+    """Cache configurado em settings.AI_CACHE (None quando desligado)."""
+    config = settings.AI_CACHE
+    backend = config.get('BACKEND')
+    if backend == 'django':
+        return CacheDjango(config.get('ALIAS', 'default'), config['TTL'], config['MAX_ENTRADAS'])
+    if backend == 'banco':
+        return CacheBanco(config['TTL'], config['MAX_ENTRADAS'])
+    return None
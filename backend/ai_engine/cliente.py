@@ -0,0 +1,99 @@
+"""
+Cliente Gemini compartilhado pelo processo.
+
+Criar um `genai.Client` a cada chamada custa a construção do cliente e uma
+conexão HTTP/TLS nova. Aqui o cliente é criado uma vez só (na primeira
+chamada), protegido por lock, e reaproveita as conexões keep-alive do
+httpx entre as requisições.
+
+O cliente assíncrono (streaming) fica um por event loop: as conexões do
+httpx assíncrono pertencem ao loop que as abriu. Sob ASGI há um loop só.
+Os dois usam os mesmos limites de pool; resetar_cliente() fecha todos, os
+assíncronos no loop de cada um.
+"""
+import asyncio
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from google import genai
+from google.genai import types
+
+_cliente = None
+_clientes_por_loop = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _criar_cliente():
+    limites = httpx.Limits(
+        max_connections=settings.GEMINI_MAX_CONEXOES,
+        max_keepalive_connections=settings.GEMINI_MAX_CONEXOES,
+        keepalive_expiry=settings.GEMINI_KEEPALIVE,
+    )
+    http_options = types.HttpOptions(
+        # O SDK recebe o timeout em milissegundos
+        timeout=int(settings.GEMINI_TIMEOUT * 1000),
+        base_url=settings.GEMINI_BASE_URL,
+        client_args={'limits': limites},
+        # Com transport próprio o SDK usa o httpx (e não o aiohttp, se instalado) também no async
+        async_client_args={'transport': httpx.AsyncHTTPTransport(limits=limites)},
+    )
+    return genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+
+
+def obter_cliente():
+    """Retorna o cliente do processo, criando-o na primeira chamada (thread-safe)."""
+    global _cliente
+    if _cliente is None:
+        with _lock:
+            if _cliente is None:
+                _cliente = _criar_cliente()
+    return _cliente
+
+
+def obter_cliente_async():
+    """Retorna o cliente assíncrono (`client.aio`) do event loop atual."""
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_por_loop.get(loop)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes_por_loop.setdefault(loop, _criar_cliente())
+    return cliente.aio
+
+
+def _fechar_async(loop, cliente):
+    cliente.close()  # o genai.Client também abre um httpx síncrono
+    fechar = cliente.aio.aclose()
+    try:
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(fechar, loop)
+        elif not loop.is_closed():
+            loop.run_until_complete(fechar)
+        else:
+            fechar.close()  # loop já fechado: as conexões foram junto
+    except Exception as e:
+        fechar.close()
+        print(f"ERRO GEMINI: cliente assíncrono não fechou: {str(e)}")
+
+
+def resetar_cliente():
+    """Descarta (e fecha) os clientes atuais (testes, troca de chave/configuração)."""
+    global _cliente
+    with _lock:
+        cliente, _cliente = _cliente, None
+        por_loop = list(_clientes_por_loop.items())
+        _clientes_por_loop.clear()
+    if cliente is not None:
+        cliente.close()
+    for loop, cliente_async in por_loop:
+        _fechar_async(loop, cliente_async)
+
+
+@receiver(setting_changed)
+def _resetar_ao_mudar_configuracao(setting, **kwargs):
+    # override_settings(GEMINI_...) nos testes passa a valer na hora
+    if setting.startswith('GEMINI_'):
+        resetar_cliente()
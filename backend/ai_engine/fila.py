@@ -0,0 +1,150 @@
+"""
+Fila durável de execuções de IA (JobIA), consumida pelo worker_ia.
+
+A fila é opcional: o POST ai/run/ com `assincrono` (ou o POST ai/jobs/)
+cria o job; sem isso a execução continua síncrona, na própria requisição.
+A API só grava o job e responde na hora; o worker pega os jobs com
+`SELECT ... FOR UPDATE SKIP LOCKED` (Postgres), de modo que vários
+workers em paralelo nunca pegam o mesmo job. No SQLite, que não tem
+SKIP LOCKED, o job é reivindicado com um UPDATE condicional
+(status=pendente -> executando): só um worker consegue mudar a linha.
+
+Falhas voltam para a fila com backoff exponencial (com jitter) até
+`max_tentativas`. As novas tentativas são só as da fila: a chamada ao
+provedor roda com uma tentativa (resiliencia.chamar), senão um job que
+falha faria max_tentativas x TENTATIVAS chamadas. Jobs presos em 'executando' (worker morto no deploy)
+são devolvidos para a fila depois de AI_FILA_TIMEOUT_EXECUCAO. Job
+recusado pelo limite de IA ou pelo disjuntor (resiliencia.py) volta para a
+fila depois do Retry-After sem gastar tentativa.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import JobIA
+from .resiliencia import IndisponivelIA, PrazoEsgotado
+from .servicos import deve_salvar_no_card, gerar_texto
+
+
+def enfileirar(card, agente, usuario=None, force_refresh=False):
+    return JobIA.objects.create(
+        card=card,
+        agente=agente,
+        usuario=usuario,
+        force_refresh=force_refresh,
+        max_tentativas=settings.AI_FILA_MAX_TENTATIVAS,
+    )
+
+
+def _marcar_executando(trabalhador, agora):
+    return dict(
+        status=JobIA.EXECUTANDO,
+        trabalhador=trabalhador,
+        iniciado_em=agora,
+        tentativas=F('tentativas') + 1,
+    )
+
+
+def reivindicar_job(trabalhador):
+    """Pega o próximo job disponível para este worker (ou None)."""
+    agora = timezone.now()
+    disponiveis = (
+        JobIA.objects.filter(status=JobIA.PENDENTE, disponivel_em__lte=agora)
+        .order_by('disponivel_em', 'id')
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = disponiveis.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            JobIA.objects.filter(pk=job_id).update(**_marcar_executando(trabalhador, agora))
+    else:
+        # SQLite: compare-and-set; se outro worker ganhou a corrida, tenta o próximo
+        job_id = None
+        for candidato in disponiveis.values_list('id', flat=True)[:10]:
+            if JobIA.objects.filter(pk=candidato, status=JobIA.PENDENTE).update(
+                **_marcar_executando(trabalhador, agora)
+            ):
+                job_id = candidato
+                break
+        if job_id is None:
+            return None
+
+    return JobIA.objects.select_related('card', 'agente', 'usuario').get(pk=job_id)
+
+
+def atraso_backoff(tentativa):
+    """Segundos até a próxima tentativa: base * 2^(n-1), com jitter de ±25%."""
+    base = settings.AI_FILA_BACKOFF * (2 ** (tentativa - 1))
+    return base * random.uniform(0.75, 1.25)
+
+
+def _falhou(job, erro):
+    job.erro = str(erro)
+    if job.tentativas < job.max_tentativas:
+        job.status = JobIA.PENDENTE
+        job.disponivel_em = timezone.now() + timedelta(seconds=atraso_backoff(job.tentativas))
+    else:
+        job.status = JobIA.FALHOU
+        job.concluido_em = timezone.now()
+    job.save(update_fields=['erro', 'status', 'disponivel_em', 'concluido_em'])
+    return job
+
+
+def processar_job(job):
+    """Executa um job já reivindicado e grava o resultado (ou agenda a nova tentativa)."""
+    if job.card_id is None:
+        # Card apagado enquanto o job esperava na fila
+        job.status = JobIA.FALHOU
+        job.erro = "Card apagado antes da execução."
+        job.concluido_em = timezone.now()
+        job.save(update_fields=['status', 'erro', 'concluido_em'])
+        return job
+    try:
+        texto, cache_hit = gerar_texto(job.agente, job.card, job.force_refresh, usuario=job.usuario, tentativas=1)
+    except IndisponivelIA as e:
+        if isinstance(e, PrazoEsgotado):
+            return _falhou(job, e)
+        # Recusado antes de chamar o provedor: não conta como tentativa
+        job.erro = str(e)
+        job.status = JobIA.PENDENTE
+        job.tentativas -= 1
+        job.disponivel_em = timezone.now() + timedelta(seconds=e.retry_after or atraso_backoff(1))
+        job.save(update_fields=['erro', 'status', 'tentativas', 'disponivel_em'])
+        return job
+    except Exception as e:
+        return _falhou(job, e)
+
+    try:
+        with transaction.atomic():
+            if deve_salvar_no_card(job.agente):
+                job.card.prompt_refinado = texto
+                job.card.save(update_fields=['prompt_refinado', 'atualizado_em'])
+            job.status = JobIA.CONCLUIDO
+            job.resultado = texto
+            job.cache_hit = cache_hit
+            job.erro = ''
+            job.concluido_em = timezone.now()
+            job.save(update_fields=['status', 'resultado', 'cache_hit', 'erro', 'concluido_em'])
+    except (ObjectDoesNotExist, DatabaseError) as e:
+        # Card apagado durante a execução (o job fica, com card nulo);
+        # update() não falha nem se a linha do job sumiu
+        job.status = JobIA.FALHOU
+        job.erro = f"Não foi possível gravar o resultado: {e}"
+        job.concluido_em = timezone.now()
+        JobIA.objects.filter(pk=job.pk).update(status=job.status, erro=job.erro, concluido_em=job.concluido_em)
+    return job
+
+
+def recuperar_jobs_travados():
+    """Devolve para a fila jobs 'executando' há tempo demais (worker caiu)."""
+    limite = timezone.now() - timedelta(seconds=settings.AI_FILA_TIMEOUT_EXECUCAO)
+    return JobIA.objects.filter(status=JobIA.EXECUTANDO, iniciado_em__lt=limite).update(
+        status=JobIA.PENDENTE, disponivel_em=timezone.now(), trabalhador=''
+    )
@@ -0,0 +1,93 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from ai_engine.fila import processar_job, recuperar_jobs_travados, reivindicar_job
+
+
+class Command(BaseCommand):
+    help = "Processa a fila de execuções de IA (JobIA). Ex: python manage.py worker_ia --concorrencia 4"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concorrencia', type=int, default=settings.AI_FILA_CONCORRENCIA,
+            help='Quantos jobs processar em paralelo (threads).',
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help='Segundos de espera quando a fila está vazia.',
+        )
+        parser.add_argument(
+            '--uma-vez', action='store_true',
+            help='Processa o que estiver disponível e sai (útil em cron e testes).',
+        )
+
+    def handle(self, *args, **options):
+        self.parar = threading.Event()
+        self.uma_vez = options['uma_vez']
+        self.intervalo = options['intervalo']
+        concorrencia = max(1, options['concorrencia'])
+        self.nome = f"{socket.gethostname()}:{os.getpid()}"
+
+        if threading.current_thread() is threading.main_thread():
+            # Deploy/CTRL+C: termina o job atual e sai (o job não se perde)
+            signal.signal(signal.SIGTERM, lambda *_: self.parar.set())
+            signal.signal(signal.SIGINT, lambda *_: self.parar.set())
+
+        self.proxima_recuperacao = 0
+        self.recuperar_travados()
+
+        self.stdout.write(f"🤖 Worker {self.nome} iniciado com {concorrencia} thread(s).")
+        if concorrencia == 1:
+            self.loop(0)
+        else:
+            threads = [
+                threading.Thread(target=self.loop, args=(i,), name=f'worker-ia-{i}')
+                for i in range(concorrencia)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.stdout.write("Worker encerrado.")
+
+    def recuperar_travados(self):
+        # Jobs de workers que caíram depois do início deste também voltam para a fila
+        if time.monotonic() < self.proxima_recuperacao:
+            return
+        self.proxima_recuperacao = time.monotonic() + settings.AI_FILA_INTERVALO_RECUPERACAO
+        recuperados = recuperar_jobs_travados()
+        if recuperados:
+            self.stdout.write(f"♻️  {recuperados} job(s) travado(s) devolvido(s) para a fila.")
+
+    def loop(self, indice):
+        trabalhador = f"{self.nome}#{indice}"
+        try:
+            while not self.parar.is_set():
+                close_old_connections()
+                if indice == 0:
+                    self.recuperar_travados()
+                job = reivindicar_job(trabalhador)
+                if job is None:
+                    if self.uma_vez:
+                        break
+                    self.parar.wait(self.intervalo)
+                    continue
+
+                try:
+                    job = processar_job(job)
+                except Exception as e:
+                    # Um job com problema não derruba a thread; ele volta pela recuperação de travados
+                    self.stderr.write(f"[{trabalhador}] Job {job.id}: erro inesperado ({e})")
+                    continue
+                self.stdout.write(f"[{trabalhador}] Job {job.id}: {job.status} (tentativa {job.tentativas})")
+        finally:
+            # Cada thread abre a própria conexão com o banco
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_engine', '0002_agenteia_delete_actiontemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeracaoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64, unique=True)),
+                ('resultado', models.TextField()),
+                ('modelo', models.CharField(max_length=100)),
+                ('latencia_ms', models.PositiveIntegerField(default=0)),
+                ('tokens', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('ultimo_acesso', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+                ('agente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='geracoes_cache', to='ai_engine.agenteia')),
+            ],
+        ),
+    ]
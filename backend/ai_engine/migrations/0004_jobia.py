@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_engine', '0003_geracaocache'),
+        ('projetos', '0006_indices_board'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('force_refresh', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluido', 'Concluído'), ('falhou', 'Falhou')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=3)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resultado', models.TextField(blank=True)),
+                ('erro', models.TextField(blank=True)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('trabalhador', models.CharField(blank=True, max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('agente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='ai_engine.agenteia')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs_ia', to='projetos.card')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs_ia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'disponivel_em'], name='jobia_fila_idx')],
+            },
+        ),
+    ]
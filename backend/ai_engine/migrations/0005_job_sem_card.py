@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_engine', '0004_jobia'),
+        ('projetos', '0009_arquivo_projeto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobia',
+            name='card',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs_ia', to='projetos.card'),
+        ),
+    ]
@@ -1,4 +1,9 @@
+from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+
+from projetos.models import Card
+
 
 class AgenteIA(models.Model):
     """
@@ -17,4 +22,74 @@ class AgenteIA(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return self.nome
+
+class GeracaoCache(models.Model):
+    """
+    Resultado de uma geração guardado pelo hash do que a produziu
+    (prompt do agente, temperatura, modelo, título e conteúdo do card).
+    Usado pelo backend 'banco' do cache de gerações (ai_engine/cache.py).
+    """
+    chave = models.CharField(max_length=64, unique=True)
+    resultado = models.TextField()
+    modelo = models.CharField(max_length=100)
+    agente = models.ForeignKey(AgenteIA, on_delete=models.SET_NULL, null=True, blank=True, related_name='geracoes_cache')
+
+    # Quanto a geração original custou (para estimar a economia de cada hit)
+    latencia_ms = models.PositiveIntegerField(default=0)
+    tokens = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    ultimo_acesso = models.DateTimeField(auto_now_add=True, db_index=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.chave[:12]} ({self.hits} hits)"
+
+
+class JobIA(models.Model):
+    """
+    Execução de um agente sobre um card, enfileirada para o worker
+    (`python manage.py worker_ia`) em vez de rodar dentro da requisição.
+    """
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDO = 'concluido'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDO, 'Concluído'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    # SET_NULL: apagar ou arquivar o card não apaga o histórico de execuções
+    card = models.ForeignKey(Card, on_delete=models.SET_NULL, null=True, related_name='jobs_ia')
+    agente = models.ForeignKey(AgenteIA, on_delete=models.CASCADE, related_name='jobs')
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs_ia')
+    force_refresh = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    # Só pode ser pego a partir daqui (backoff entre tentativas)
+    disponivel_em = models.DateTimeField(default=timezone.now)
+
+    resultado = models.TextField(blank=True)
+    erro = models.TextField(blank=True)
+    cache_hit = models.BooleanField(default=False)
+    trabalhador = models.CharField(max_length=100, blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Próximo job da fila: pendentes por ordem de disponibilidade
+            models.Index(fields=['status', 'disponivel_em'], name='jobia_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
@@ -0,0 +1,198 @@
+"""
+Provedores de LLM por trás das views de IA.
+
+As views e serviços só conhecem a interface ProvedorLLM; qual provedor
+roda é escolhido em settings.AI_PROVEDOR:
+- 'gemini' (padrão): Google Gemini, pelo cliente compartilhado;
+- 'fake': sem rede, com latência, jitter, taxa de erro e streaming
+  configuráveis em settings.AI_PROVEDOR_FAKE (testes de carga e dev);
+- ou o caminho de uma classe ('pacote.modulo.MinhaClasse').
+"""
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from google.genai import types
+
+from .cliente import obter_cliente, obter_cliente_async
+
+
+class ErroProvedor(Exception):
+    """Falha da chamada ao provedor (rede, cota, resposta inválida...)."""
+
+
+@dataclass
+class Geracao:
+    texto: str
+    tokens: int = 0
+
+
+class ProvedorLLM:
+    nome = ''
+
+    @property
+    def modelo(self):
+        """Identificador do modelo (entra na chave do cache de gerações)."""
+        raise NotImplementedError
+
+    def erro_configuracao(self):
+        """Mensagem se o provedor não puder ser usado, ou None."""
+        return None
+
+    def gerar(self, prompt, temperatura, timeout=None):
+        """
+        Gera o texto completo. Retorna uma Geracao.
+        `timeout` (segundos): prazo desta chamada, dado por resiliencia.py.
+        """
+        raise NotImplementedError
+
+    async def gerar_stream(self, prompt, temperatura, timeout=None):
+        """
+        Gera o texto em pedaços (async iterator de str).
+        Padrão para provedores sem streaming: um pedaço só, com gerar() numa thread.
+        """
+        geracao = await sync_to_async(self.gerar, thread_sensitive=False)(prompt, temperatura, timeout)
+        yield geracao.texto
+
+
+class ProvedorGemini(ProvedorLLM):
+    nome = 'gemini'
+
+    @property
+    def modelo(self):
+        return settings.GEMINI_MODELO
+
+    def erro_configuracao(self):
+        if not settings.GEMINI_API_KEY:
+            return "API Key do Gemini não configurada no servidor (.env)."
+        return None
+
+    def _config(self, temperatura, timeout):
+        config = types.GenerateContentConfig(temperature=temperatura)
+        if timeout is not None:
+            # Prazo da chamada (o SDK recebe em milissegundos); sem ele vale o GEMINI_TIMEOUT
+            config.http_options = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+        return config
+
+    def gerar(self, prompt, temperatura, timeout=None):
+        response = obter_cliente().models.generate_content(
+            model=self.modelo,
+            contents=prompt,
+            config=self._config(temperatura, timeout),
+        )
+        uso = getattr(response, 'usage_metadata', None)
+        return Geracao(response.text, getattr(uso, 'total_token_count', None) or 0)
+
+    async def gerar_stream(self, prompt, temperatura, timeout=None):
+        stream = await obter_cliente_async().models.generate_content_stream(
+            model=self.modelo,
+            contents=prompt,
+            config=self._config(temperatura, timeout),
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+class ProvedorFake(ProvedorLLM):
+    """
+    Provedor local que imita um LLM: espera LATENCIA ± JITTER segundos,
+    falha com probabilidade TAXA_ERRO e, no streaming, entrega o texto
+    em PEDACOS partes espalhadas pela latência.
+    """
+    nome = 'fake'
+
+    def __init__(self, latencia=1.0, jitter=0.0, taxa_erro=0.0, pedacos=10, semente=None):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.pedacos = max(1, pedacos)
+        self.aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def da_configuracao(cls):
+        config = settings.AI_PROVEDOR_FAKE
+        return cls(
+            latencia=config.get('LATENCIA', 1.0),
+            jitter=config.get('JITTER', 0.0),
+            taxa_erro=config.get('TAXA_ERRO', 0.0),
+            pedacos=config.get('PEDACOS', 10),
+            semente=config.get('SEMENTE'),
+        )
+
+    @property
+    def modelo(self):
+        return 'fake'
+
+    def _sortear(self):
+        with self._lock:
+            atraso = max(0.0, self.latencia + self.aleatorio.uniform(-self.jitter, self.jitter))
+            falhar = self.aleatorio.random() < self.taxa_erro
+        return atraso, falhar
+
+    def _texto(self, prompt):
+        palavras = prompt.split()[-40:] or ['ok']
+        return 'Resposta simulada: ' + ' '.join(palavras)
+
+    def gerar(self, prompt, temperatura, timeout=None):
+        atraso, falhar = self._sortear()
+        if timeout is not None and atraso > timeout:
+            time.sleep(max(0.0, timeout))
+            raise TimeoutError("Provedor fake passou do prazo.")
+        time.sleep(atraso)
+        if falhar:
+            raise ErroProvedor("Falha simulada pelo provedor fake.")
+        texto = self._texto(prompt)
+        return Geracao(texto, len(texto.split()))
+
+    async def gerar_stream(self, prompt, temperatura, timeout=None):
+        # O prazo de cada pedaço é cobrado por quem consome (resiliencia.stream)
+        atraso, falhar = self._sortear()
+        texto = self._texto(prompt)
+        tamanho = -(-len(texto) // self.pedacos)
+        for inicio in range(0, len(texto), tamanho):
+            await asyncio.sleep(atraso / self.pedacos)
+            if falhar and inicio >= len(texto) // 2:
+                raise ErroProvedor("Falha simulada pelo provedor fake (no meio do stream).")
+            yield texto[inicio:inicio + tamanho]
+
+
+PROVEDORES = {
+    'gemini': ProvedorGemini,
+    'fake': ProvedorFake.da_configuracao,
+}
+
+_provedor = None
+_lock = threading.Lock()
+
+
+def obter_provedor():
+    """Provedor configurado em settings.AI_PROVEDOR (um por processo)."""
+    global _provedor
+    if _provedor is None:
+        with _lock:
+            if _provedor is None:
+                escolhido = settings.AI_PROVEDOR
+                fabrica = PROVEDORES.get(escolhido) or import_string(escolhido)
+                _provedor = fabrica()
+    return _provedor
+
+
+def resetar_provedor():
+    global _provedor
+    with _lock:
+        _provedor = None
+
+
+@receiver(setting_changed)
+def _resetar_ao_mudar_configuracao(setting, **kwargs):
+    if setting.startswith('AI_PROVEDOR') or setting.startswith('GEMINI_'):
+        resetar_provedor()
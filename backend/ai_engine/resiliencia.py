@@ -0,0 +1,380 @@
+"""
+Proteções em volta das chamadas ao provedor de IA.
+
+Quando o Gemini fica lento, cada chamada prende um worker; sem limite, os
+workers acabam todos presos na IA e o board cai junto. Toda chamada ao
+provedor (execução síncrona, lote, worker_ia e streaming) passa por aqui:
+
+- Cota (balde de fichas): cada escopo tem um balde de TAXA_GLOBAL fichas
+  no total e TAXA_USUARIO por usuário, que se enche de novo aos poucos
+  (o balde inteiro em JANELA_TAXA segundos). Sem ficha: LimiteExcedido
+  (429) na hora, com Retry-After até a próxima ficha.
+- Vagas (semáforo): no máximo CONCORRENCIA_GLOBAL chamadas em andamento e
+  CONCORRENCIA_USUARIO por usuário. Sem vaga, espera até ESPERA_VAGA
+  segundos e então LimiteExcedido (429).
+- Prazo: cada execução tem PRAZO segundos para todas as tentativas; cada
+  tentativa recebe só o que sobra (timeout do provedor). Esgotou:
+  PrazoEsgotado (504).
+- Novas tentativas: erros transitórios (timeout, rede, 5xx, 429 do
+  provedor) tentam de novo até TENTATIVAS vezes, com backoff exponencial
+  e jitter, sem passar do prazo.
+- Disjuntor: DISJUNTOR_FALHAS erros transitórios em DISJUNTOR_JANELA
+  segundos abrem o circuito; por DISJUNTOR_PAUSA segundos as chamadas
+  falham na hora com CircuitoAberto (503). Depois da pausa, uma chamada
+  de teste passa: se der certo o circuito fecha, se falhar abre de novo.
+  A chamada de teste só é reservada depois da cota e da vaga, e é
+  devolvida se terminar sem sucesso nem falha transitória.
+
+O estado (cotas, vagas e disjuntor) fica no cache do Django
+(AI_RESILIENCIA['ALIAS']), então vale entre processos se o cache for
+compartilhado (Redis, Memcached...). O cache do Django não tem
+compare-and-set, então o balde é guardado como GCRA: uma chave só, com o
+instante (em microssegundos) em que ele estaria cheio de novo. Gastar é um
+incr() desse instante, atômico; só o balde já cheio (instante no passado)
+é reposto com set(), e aí uma corrida pode deixar passar uma ficha a mais.
+Cada vaga é uma chave reservada com add() que expira sozinha (PRAZO +
+folga) se o processo morrer no meio da chamada.
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from google.genai import errors
+
+from .provedores import ErroProvedor
+
+FOLGA_VAGA = 5  # segundos além do prazo até uma vaga abandonada expirar
+INTERVALO_ESPERA = 0.05  # segundos entre as tentativas de pegar vaga
+
+
+class IndisponivelIA(ErroProvedor):
+    """IA recusada pela proteção (não chegou a chamar ou desistiu do provedor)."""
+    status = 503
+
+    def __init__(self, mensagem, retry_after=None):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class LimiteExcedido(IndisponivelIA):
+    status = 429
+
+
+class CircuitoAberto(IndisponivelIA):
+    status = 503
+
+
+class PrazoEsgotado(IndisponivelIA):
+    status = 504
+
+
+def _config():
+    return settings.AI_RESILIENCIA
+
+
+def _cache():
+    return caches[_config()['ALIAS']]
+
+
+def transitorio(erro):
+    """Erro que pode passar tentando de novo (e que conta para o disjuntor)."""
+    if isinstance(erro, IndisponivelIA):
+        return False
+    if isinstance(erro, (ErroProvedor, TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(erro, errors.APIError):
+        return erro.code == 429 or erro.code >= 500
+    return False
+
+
+def atraso_backoff(tentativa):
+    """Backoff exponencial com jitter total: entre 0 e BACKOFF * 2^(n-1) segundos."""
+    return random.uniform(0, _config()['BACKOFF'] * (2 ** (tentativa - 1)))
+
+
+# --- Disjuntor ---
+
+CHAVE_FALHAS = 'ia:disjuntor:falhas'
+CHAVE_ABERTO_ATE = 'ia:disjuntor:aberto_ate'
+CHAVE_SONDA = 'ia:disjuntor:sonda'
+
+
+def verificar_disjuntor(sondar=True):
+    """
+    Levanta CircuitoAberto se o provedor está marcado como fora do ar.
+    No semiaberto, sondar=True ocupa a chamada de teste e retorna True (quem
+    chamou registra sucesso/falha ou a devolve com liberar_sonda());
+    sondar=False só consulta (views checando antes de começar).
+    """
+    cache = _cache()
+    aberto_ate = cache.get(CHAVE_ABERTO_ATE)
+    if aberto_ate is None:
+        return False
+    restante = aberto_ate - time.time()
+    if restante > 0:
+        raise CircuitoAberto('Provedor de IA instável; tente de novo em instantes.', retry_after=restante)
+    if not sondar:
+        return False
+    # Pausa acabou (semiaberto): só uma chamada de teste passa por vez
+    if not cache.add(CHAVE_SONDA, 1, _config()['PRAZO'] + FOLGA_VAGA):
+        raise CircuitoAberto('Provedor de IA em teste; tente de novo em instantes.', retry_after=1)
+    return True
+
+
+def liberar_sonda():
+    _cache().delete(CHAVE_SONDA)
+
+
+def registrar_sucesso():
+    cache = _cache()
+    if cache.get_many([CHAVE_FALHAS, CHAVE_ABERTO_ATE]):
+        cache.delete_many([CHAVE_FALHAS, CHAVE_ABERTO_ATE, CHAVE_SONDA])
+
+
+def registrar_falha():
+    config, cache = _config(), _cache()
+    cache.add(CHAVE_FALHAS, 0, config['DISJUNTOR_JANELA'])
+    try:
+        falhas = cache.incr(CHAVE_FALHAS)
+    except ValueError:  # a janela expirou entre o add e o incr
+        cache.add(CHAVE_FALHAS, 1, config['DISJUNTOR_JANELA'])
+        falhas = 1
+    semiaberto = cache.get(CHAVE_ABERTO_ATE) is not None
+    if semiaberto or falhas >= config['DISJUNTOR_FALHAS']:
+        pausa = config['DISJUNTOR_PAUSA']
+        # A chave dura mais que a pausa: depois dela vem o semiaberto
+        cache.set(CHAVE_ABERTO_ATE, time.time() + pausa, pausa + config['DISJUNTOR_JANELA'])
+        cache.delete(CHAVE_SONDA)
+        print(f"ERRO GEMINI: disjuntor aberto por {pausa}s ({falhas} falhas seguidas)")
+
+
+# --- Cotas e vagas ---
+
+def _escopos(usuario):
+    config = _config()
+    escopos = [('global', config['TAXA_GLOBAL'], config['CONCORRENCIA_GLOBAL'])]
+    if usuario is not None and usuario.pk is not None:
+        escopos.append((f'usuario:{usuario.pk}', config['TAXA_USUARIO'], config['CONCORRENCIA_USUARIO']))
+    return escopos
+
+
+def _chave_balde(escopo):
+    return f'ia:balde:{escopo}'
+
+
+def _ficha(taxa, janela):
+    return int(janela * 1_000_000 / taxa)  # microssegundos até voltar uma ficha
+
+
+def _devolver_fichas(escopo, taxa, quantidade, janela):
+    try:
+        _cache().decr(_chave_balde(escopo), _ficha(taxa, janela) * quantidade)
+    except ValueError:  # o balde expirou (cheio) no meio
+        pass
+
+
+def _gastar_fichas(escopo, taxa, quantidade, janela):
+    """
+    Tira `quantidade` fichas do balde do escopo. Retorna None se tinha, ou
+    os segundos até ter (nada é gasto). O balde tem `taxa` fichas e se
+    enche em `janela` segundos: cada ficha volta em janela / taxa.
+    """
+    if taxa <= 0:
+        return janela
+    cache = _cache()
+    chave = _chave_balde(escopo)
+    ficha = _ficha(taxa, janela)
+    capacidade = ficha * taxa
+    agora = int(time.time() * 1_000_000)
+    # Instante em que o balde estaria cheio; no passado (ou sem chave) = cheio agora
+    cheio_em = cache.get(chave)
+    if cheio_em is None or cheio_em < agora:
+        cache.set(chave, agora, janela * 2)
+    try:
+        cheio_em = cache.incr(chave, ficha * quantidade)
+    except ValueError:  # expirou entre o set e o incr
+        cheio_em = agora + ficha * quantidade
+        cache.set(chave, cheio_em, janela * 2)
+    excesso = cheio_em - agora - capacidade
+    if excesso > 0:
+        _devolver_fichas(escopo, taxa, quantidade, janela)
+        return excesso / 1_000_000
+    cache.touch(chave, janela * 2)
+    return None
+
+
+def consumir_cota(usuario=None, quantidade=1):
+    """
+    Gasta `quantidade` fichas de cada escopo (o lote reserva todas de uma
+    vez) ou levanta LimiteExcedido. Recusada, devolve o que já gastou:
+    um usuário no limite não gasta a cota global.
+    """
+    janela = _config()['JANELA_TAXA']
+    gastos = []
+    for escopo, taxa, _ in reversed(_escopos(usuario)):  # usuário primeiro: recusa sem tocar na global
+        espera = _gastar_fichas(escopo, taxa, quantidade, janela)
+        if espera is not None:
+            for gasto, taxa_gasta in gastos:
+                _devolver_fichas(gasto, taxa_gasta, quantidade, janela)
+            raise LimiteExcedido(
+                'Limite de execuções de IA atingido; tente de novo em instantes.',
+                retry_after=espera,
+            )
+        gastos.append((escopo, taxa))
+
+
+def _reservar_vagas(usuario):
+    """Chaves das vagas reservadas (uma por escopo), ou None se algum escopo está cheio."""
+    cache = _cache()
+    duracao = _config()['PRAZO'] + FOLGA_VAGA
+    reservadas = []
+    for escopo, _, concorrencia in _escopos(usuario):
+        chave = next(
+            (chave for chave in (f'ia:vaga:{escopo}:{i}' for i in range(concorrencia))
+             if cache.add(chave, 1, duracao)),
+            None,
+        )
+        if chave is None:
+            cache.delete_many(reservadas)
+            return None
+        reservadas.append(chave)
+    return reservadas
+
+
+def _sem_vaga():
+    return LimiteExcedido('Muitas execuções de IA em andamento; tente de novo em instantes.', retry_after=1)
+
+
+@contextmanager
+def vaga(usuario=None):
+    limite = time.monotonic() + _config()['ESPERA_VAGA']
+    while (reservadas := _reservar_vagas(usuario)) is None:
+        if time.monotonic() >= limite:
+            raise _sem_vaga()
+        time.sleep(INTERVALO_ESPERA)
+    try:
+        yield
+    finally:
+        _cache().delete_many(reservadas)
+
+
+@asynccontextmanager
+async def vaga_async(usuario=None):
+    limite = time.monotonic() + _config()['ESPERA_VAGA']
+    while (reservadas := await sync_to_async(_reservar_vagas)(usuario)) is None:
+        if time.monotonic() >= limite:
+            raise _sem_vaga()
+        await asyncio.sleep(INTERVALO_ESPERA)
+    try:
+        yield
+    finally:
+        await sync_to_async(_cache().delete_many)(reservadas)
+
+
+# --- Chamadas protegidas ---
+
+def _desistir(erro, tentativa, prazo, tentativas):
+    """Erro a levantar se não dá para tentar de novo, ou None (e quanto esperar)."""
+    espera = atraso_backoff(tentativa)
+    restante = prazo - time.monotonic()
+    if tentativa < tentativas and espera < restante:
+        return None, espera
+    if isinstance(erro, (TimeoutError, httpx.TimeoutException)) or restante <= espera:
+        return PrazoEsgotado('A IA não respondeu dentro do prazo.'), 0
+    return erro, 0
+
+
+def chamar(chamada, usuario=None, cota=True, tentativas=None):
+    """
+    Executa `chamada(timeout)` (uma chamada ao provedor; `timeout` é o que
+    sobra do prazo, em segundos) com cota, vaga, prazo, novas tentativas e
+    disjuntor. Levanta IndisponivelIA quando a proteção recusa ou desiste.
+    cota=False quando a cota já foi reservada (lote); `tentativas` troca o
+    TENTATIVAS da configuração (a fila passa 1: ela mesma tenta de novo).
+    """
+    tentativas = tentativas or _config()['TENTATIVAS']
+    verificar_disjuntor(sondar=False)
+    if cota:
+        consumir_cota(usuario)
+    prazo = time.monotonic() + _config()['PRAZO']
+    with vaga(usuario):
+        sonda = verificar_disjuntor()
+        try:
+            tentativa = 0
+            while True:
+                tentativa += 1
+                try:
+                    resultado = chamada(prazo - time.monotonic())
+                except Exception as erro:
+                    if not transitorio(erro):
+                        raise
+                    registrar_falha()
+                    sonda = False
+                    desistir, espera = _desistir(erro, tentativa, prazo, tentativas)
+                    if desistir is erro:
+                        raise
+                    if desistir is not None:
+                        raise desistir from erro
+                    time.sleep(espera)
+                    verificar_disjuntor(sondar=False)
+                    continue
+                registrar_sucesso()
+                sonda = False
+                return resultado
+        finally:
+            if sonda:
+                liberar_sonda()
+
+
+async def stream(abrir, usuario=None):
+    """
+    Versão em streaming de chamar(): `abrir(timeout)` devolve o async
+    iterator do provedor. Cada pedaço precisa chegar dentro do prazo; só
+    tenta de novo se o erro veio antes do primeiro pedaço.
+    """
+    await sync_to_async(verificar_disjuntor)(sondar=False)
+    await sync_to_async(consumir_cota)(usuario)
+    prazo = time.monotonic() + _config()['PRAZO']
+    async with vaga_async(usuario):
+        sonda = await sync_to_async(verificar_disjuntor)()
+        try:
+            tentativa = 0
+            while True:
+                tentativa += 1
+                enviou = False
+                try:
+                    pedacos = abrir(prazo - time.monotonic())
+                    while True:
+                        try:
+                            pedaco = await asyncio.wait_for(anext(pedacos), prazo - time.monotonic())
+                        except StopAsyncIteration:
+                            break
+                        enviou = True
+                        yield pedaco
+                except Exception as erro:
+                    if not transitorio(erro):
+                        raise
+                    await sync_to_async(registrar_falha)()
+                    sonda = False
+                    desistir, espera = _desistir(erro, tentativa, prazo, _config()['TENTATIVAS'])
+                    if enviou and desistir is None:
+                        desistir = erro  # texto parcial já saiu: não dá para recomeçar
+                    if desistir is erro:
+                        raise
+                    if desistir is not None:
+                        raise desistir from erro
+                    await asyncio.sleep(espera)
+                    await sync_to_async(verificar_disjuntor)(sondar=False)
+                    continue
+                await sync_to_async(registrar_sucesso)()
+                sonda = False
+                return
+        finally:
+            # Recusa, erro não transitório ou cliente que desconectou no meio
+            if sonda:
+                await sync_to_async(liberar_sonda)()
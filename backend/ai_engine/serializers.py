@@ -1,7 +1,34 @@
 from rest_framework import serializers
-from .models import AgenteIA
+from .models import AgenteIA, JobIA
 
 class AgenteIASerializer(serializers.ModelSerializer):
     class Meta:
         model = AgenteIA
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class JobIASerializer(serializers.ModelSerializer):
+    agente_usado = serializers.CharField(source='agente.nome', read_only=True)
+
+    class Meta:
+        model = JobIA
+        fields = [
+            'id',
+            'card',
+            'agente',
+            'agente_usado',
+            'force_refresh',
+            'status',
+            'tentativas',
+            'resultado',
+            'erro',
+            'cache_hit',
+            'criado_em',
+            'iniciado_em',
+            'concluido_em'
+        ]
+        read_only_fields = [
+            'status', 'tentativas', 'resultado', 'erro', 'cache_hit',
+            'criado_em', 'iniciado_em', 'concluido_em'
+        ]
+        # No modelo o card é nulo (histórico de card apagado/arquivado), mas todo job novo tem um
+        extra_kwargs = {'card': {'required': True, 'allow_null': False}}
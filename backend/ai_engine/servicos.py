@@ -0,0 +1,151 @@
+"""
+Regras compartilhadas pelas views de IA (síncrona e streaming).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.utils import timezone
+
+from core.metricas import medir_ia
+from projetos.models import Card
+from projetos.tempo_real import publicar_cards
+from projetos.versao import incrementar_versao
+
+from . import resiliencia
+from .cache import chave_geracao, obter_cache
+from .provedores import obter_provedor
+
+
+def montar_prompt(agente, card):
+    # Monta o prompt (Persona + Tarefa)
+    return (
+        f"--- PERSONA / AGENTE ---\n"
+        f"{agente.prompt_sistema}\n\n"
+        f"--- DADOS DO USUÁRIO (Contexto Real) ---\n"
+        f"Título Principal: {card.titulo}\n"
+        f"Descrição Detalhada/Input: {card.conteudo_original}\n\n"
+        f"--- INSTRUÇÕES DE SAÍDA ---\n"
+        f"1. Analise o Título E a Descrição Detalhada para compor sua resposta.\n"
+        f"2. IMPORTANTE: Entregue APENAS o resultado final (o prompt refinado, o código, ou o texto solicitado).\n"
+        f"3. NÃO inclua 'Persona', 'Contexto', 'Objetivo' ou explicações sobre sua estrutura lógica.\n"
+        f"4. Quero apenas o texto pronto para ser copiado e usado.\n\n"
+        f"--- SUA RESPOSTA FINAL ---"
+    )
+
+
+def deve_salvar_no_card(agente):
+    # Lógica de Salvamento Inteligente: só agentes que "refinam" gravam no card
+    nome_agente = agente.nome.lower()
+    return any(x in nome_agente for x in ["refinador", "arquiteto", "engenheiro"])
+
+
+def buscar_no_cache(agente, card, force_refresh=False):
+    """Retorna (chave, entrada) do cache; entrada é None em caso de miss."""
+    cache = obter_cache()
+    if cache is None:
+        return None, None
+    chave = chave_geracao(agente, card, obter_provedor().modelo)
+    if force_refresh:
+        return chave, None
+    return chave, cache.buscar(chave)
+
+
+def guardar_no_cache(chave, agente, texto, latencia_ms, tokens=0):
+    cache = obter_cache()
+    if cache is None or chave is None:
+        return
+    cache.guardar(chave, texto, obter_provedor().modelo, agente.id, latencia_ms, tokens)
+
+
+def chamar_modelo(agente, card, usuario=None, cota=True, tentativas=None):
+    """
+    Chama o provedor de LLM (sem cache), com os limites, prazo, novas
+    tentativas e disjuntor de resiliencia.py. Retorna (texto, latencia_ms, tokens).
+    cota=False: a cota do usuário já foi reservada (lote); tentativas: ver resiliencia.chamar.
+    """
+    provedor, prompt = obter_provedor(), montar_prompt(agente, card)
+    inicio = time.perf_counter()
+    with medir_ia(agente):
+        geracao = resiliencia.chamar(
+            lambda timeout: provedor.gerar(prompt, agente.temperatura, timeout=timeout), usuario, cota, tentativas
+        )
+    latencia_ms = int((time.perf_counter() - inicio) * 1000)
+    return geracao.texto, latencia_ms, geracao.tokens
+
+
+def gerar_texto(agente, card, force_refresh=False, usuario=None, tentativas=None):
+    """
+    Executa o agente sobre o card, passando pelo cache de gerações.
+    Retorna (texto, cache_hit).
+    """
+    chave, entrada = buscar_no_cache(agente, card, force_refresh)
+    if entrada is not None:
+        return entrada['resultado'], True
+
+    texto, latencia_ms, tokens = chamar_modelo(agente, card, usuario, tentativas=tentativas)
+    guardar_no_cache(chave, agente, texto, latencia_ms, tokens)
+    return texto, False
+
+
+def executar_em_lote(agente, cards, force_refresh=False, concorrencia=4, timeout=120, usuario=None):
+    """
+    Roda o agente sobre vários cards com no máximo `concorrencia` chamadas
+    simultâneas ao provedor. Um card que falha ou estoura o `timeout` (do lote
+    inteiro, em segundos) não segura os outros: vira status 'erro'/'timeout'.
+
+    Cache e banco ficam na thread da requisição; as threads só fazem a
+    chamada de rede. Os resultados vão para o card num bulk_update no fim.
+    Retorna uma lista de {card_id, status, result|error}.
+    A cota de IA dos cards sem cache é reservada de uma vez: sem cota para
+    o lote inteiro, levanta LimiteExcedido antes de chamar o provedor.
+    """
+    resultados = {}
+    pendentes = {}
+    for card in cards:
+        chave, entrada = buscar_no_cache(agente, card, force_refresh)
+        if entrada is not None:
+            resultados[card.id] = {'card_id': card.id, 'status': 'cache', 'result': entrada['resultado']}
+        else:
+            pendentes[card.id] = (card, chave)
+
+    if pendentes:
+        resiliencia.consumir_cota(usuario, len(pendentes))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix='ai-lote')
+    futuros = {
+        executor.submit(chamar_modelo, agente, card, usuario, False): card.id
+        for card, _ in pendentes.values()
+    }
+    concluidos, atrasados = wait(futuros, timeout=timeout)
+    # Não espera os atrasados: as chamadas em voo terminam sozinhas (GEMINI_TIMEOUT)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for futuro in concluidos:
+        card_id = futuros[futuro]
+        try:
+            texto, latencia_ms, tokens = futuro.result()
+        except Exception as e:
+            resultados[card_id] = {'card_id': card_id, 'status': 'erro', 'error': str(e)}
+            continue
+        guardar_no_cache(pendentes[card_id][1], agente, texto, latencia_ms, tokens)
+        resultados[card_id] = {'card_id': card_id, 'status': 'ok', 'result': texto}
+
+    for futuro in atrasados:
+        card_id = futuros[futuro]
+        resultados[card_id] = {'card_id': card_id, 'status': 'timeout', 'error': 'Tempo limite do lote esgotado'}
+
+    if deve_salvar_no_card(agente):
+        agora = timezone.now()
+        alterados = []
+        for card in cards:
+            resultado = resultados[card.id]
+            if resultado['status'] in ('ok', 'cache'):
+                card.prompt_refinado = resultado['result']
+                card.atualizado_em = agora
+                alterados.append(card)
+        Card.objects.bulk_update(alterados, ['prompt_refinado', 'atualizado_em'], batch_size=100)
+        if alterados:
+            incrementar_versao(coluna_ids={card.coluna_id for card in alterados})
+            publicar_cards('cards.atualizados', alterados, ['prompt_refinado'])
+
+    return [resultados[card.id] for card in cards]
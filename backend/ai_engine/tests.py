@@ -1,3 +1,574 @@
-from django.test import TestCase
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from io import StringIO
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.metricas import IA
+from projetos.models import Projeto, Coluna, Card
+from . import resiliencia
+from .cache import obter_cache
+from .cliente import obter_cliente, obter_cliente_async, resetar_cliente
+from .fila import processar_job, reivindicar_job
+from .models import AgenteIA, JobIA
+from .provedores import ErroProvedor, obter_provedor
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste')
+class ClienteCompartilhadoTests(SimpleTestCase):
+    def tearDown(self):
+        resetar_cliente()
+
+    def test_reaproveita_o_mesmo_cliente(self):
+        self.assertIs(obter_cliente(), obter_cliente())
+
+    def test_reset_cria_um_cliente_novo(self):
+        antigo = obter_cliente()
+        resetar_cliente()
+        self.assertIsNot(obter_cliente(), antigo)
+
+    def test_cliente_async_tem_os_limites_e_fecha_no_reset(self):
+        async def abrir():
+            return obter_cliente_async()
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        aio = loop.run_until_complete(abrir())
+        httpx_async = aio._api_client._async_httpx_client
+        self.assertEqual(httpx_async._transport._pool._max_connections, settings.GEMINI_MAX_CONEXOES)
+
+        resetar_cliente()
+
+        self.assertTrue(httpx_async.is_closed)
+
+    def test_mudar_configuracao_descarta_o_cliente(self):
+        antigo = obter_cliente()
+        with override_settings(GEMINI_TIMEOUT=5):
+            self.assertIsNot(obter_cliente(), antigo)
+
+
+class StreamFalso:
+    """Imita o client.aio.models do SDK devolvendo pedaços fixos."""
+
+    def __init__(self, pedacos):
+        self.pedacos = pedacos
+
+    async def generate_content_stream(self, **kwargs):
+        async def gerar():
+            for pedaco in self.pedacos:
+                yield SimpleNamespace(text=pedaco)
+        return gerar()
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste')
+class RunAIStreamViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='C')
+        self.card = Card.objects.create(coluna=coluna, titulo='T', conteudo_original='...')
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+
+    async def test_envia_tokens_e_salva_no_fim(self):
+        falso = SimpleNamespace(models=StreamFalso(['Olá', ', ', 'mundo']))
+        with mock.patch('ai_engine.provedores.obter_cliente_async', return_value=falso):
+            response = await self.async_client.post(
+                '/api/ai/run/stream/', {'card_id': self.card.id, 'agente_id': self.agente.id},
+                content_type='application/json', **self.auth,
+            )
+            corpo = ''.join([parte.decode() async for parte in response.streaming_content])
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(corpo.count('event: token'), 3)
+        self.assertIn('event: fim', corpo)
+        await self.card.arefresh_from_db()
+        self.assertEqual(self.card.prompt_refinado, 'Olá, mundo')
+
+    async def test_exige_autenticacao(self):
+        response = await self.async_client.post(
+            '/api/ai/run/stream/', {'card_id': self.card.id, 'agente_id': self.agente.id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+    async def test_corpo_que_nao_e_objeto(self):
+        response = await self.async_client.post(
+            '/api/ai/run/stream/', [self.card.id, self.agente.id], content_type='application/json', **self.auth,
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+def cliente_falso(texto='Resposta da IA'):
+    resposta = SimpleNamespace(text=texto, usage_metadata=SimpleNamespace(total_token_count=42))
+    return SimpleNamespace(models=mock.Mock(**{'generate_content.return_value': resposta}))
+
+
+class CacheGeracoesMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='C')
+        self.card = Card.objects.create(coluna=coluna, titulo='T', conteudo_original='...')
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+        self.falso = cliente_falso()
+        patcher = mock.patch('ai_engine.provedores.obter_cliente', return_value=self.falso)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rodar(self, **extra):
+        return self.client.post('/api/ai/run/', {
+            'card_id': self.card.id, 'agente_id': self.agente.id, **extra
+        }).data
+
+    def test_segunda_execucao_vem_do_cache(self):
+        primeira, segunda = self.rodar(), self.rodar()
+
+        self.assertFalse(primeira['cache_hit'])
+        self.assertTrue(segunda['cache_hit'])
+        self.assertEqual(segunda['result'], 'Resposta da IA')
+        self.assertEqual(self.falso.models.generate_content.call_count, 1)
+
+        estatisticas = obter_cache().estatisticas()
+        self.assertEqual(estatisticas['hits'], 1)
+        self.assertEqual(estatisticas['tokens_economizados'], 42)
+
+    def test_estatisticas_so_para_staff(self):
+        self.rodar()
+
+        self.assertEqual(self.client.get('/api/ai/cache/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(len(self.client.get('/api/ai/cache/').data['por_entrada']), 1)
+
+    def test_force_refresh_ignora_o_cache(self):
+        self.rodar()
+        self.assertFalse(self.rodar(force_refresh=True)['cache_hit'])
+        self.assertEqual(self.falso.models.generate_content.call_count, 2)
+
+    def test_card_alterado_muda_a_chave(self):
+        self.rodar()
+        self.card.conteudo_original = 'outro conteúdo'
+        self.card.save()
+        self.assertFalse(self.rodar()['cache_hit'])
+
+    def test_despeja_a_entrada_menos_usada(self):
+        with self.settings(AI_CACHE={**self.config, 'MAX_ENTRADAS': 2}):
+            backend = obter_cache()
+            for nome in ('a', 'b'):
+                backend.guardar(nome, nome, 'modelo', None, 10, 0)
+            backend.buscar('a')
+            backend.guardar('c', 'c', 'modelo', None, 10, 0)
+
+            self.assertIsNotNone(backend.buscar('a'))
+            self.assertIsNone(backend.buscar('b'))
+            self.assertIsNotNone(backend.buscar('c'))
+
+
+CONFIG_DJANGO = {'BACKEND': 'django', 'ALIAS': 'default', 'TTL': 60, 'MAX_ENTRADAS': 100}
+CONFIG_BANCO = {**CONFIG_DJANGO, 'BACKEND': 'banco'}
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste', AI_CACHE=CONFIG_DJANGO)
+class CacheDjangoTests(CacheGeracoesMixin, APITestCase):
+    config = CONFIG_DJANGO
+
+    def test_limite_aproximado_sem_indice(self):
+        with self.settings(AI_CACHE={**self.config, 'MAX_ENTRADAS': 10}):
+            backend = obter_cache()
+            for i in range(50):
+                backend.guardar(f'chave-{i}', 'texto', 'modelo', None, 10, 0)
+
+            vivas = [i for i in range(50) if cache.get(f'ai_cache:chave-{i}') is not None]
+            self.assertLessEqual(len(vivas), 10)
+            self.assertIn(49, vivas)  # a mais recente sempre fica
+            self.assertIsNone(cache.get('ai_cache:indice'))
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste', AI_CACHE=CONFIG_BANCO)
+class CacheBancoTests(CacheGeracoesMixin, APITestCase):
+    config = CONFIG_BANCO
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste', AI_LOTE_TIMEOUT=0.5, AI_LOTE_CONCORRENCIA=4)
+class RunAIBatchViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        self.coluna = Coluna.objects.create(projeto=self.projeto, titulo='C')
+        self.cards = [
+            Card.objects.create(coluna=self.coluna, titulo=titulo, conteudo_original='...', ordem=i)
+            for i, titulo in enumerate(['ok-1', 'falha', 'lento', 'ok-2'])
+        ]
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+
+    def gerar(self, contents, **kwargs):
+        if 'Título Principal: falha' in contents:
+            raise RuntimeError('quota')
+        if 'Título Principal: lento' in contents:
+            time.sleep(2)
+        return SimpleNamespace(text=f'refinado: {contents.count("ok")}', usage_metadata=None)
+
+    def test_falhas_e_lentos_nao_bloqueiam_o_lote(self):
+        falso = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': self.gerar}))
+        with mock.patch('ai_engine.provedores.obter_cliente', return_value=falso):
+            response = self.client.post('/api/ai/run/lote/', {
+                'agente_id': self.agente.id, 'coluna_id': self.coluna.id
+            })
+
+        self.assertEqual(response.status_code, 200)
+        status_por_card = {r['card_id']: r['status'] for r in response.data['resultados']}
+        ok1, falha, lento, ok2 = self.cards
+        self.assertEqual(status_por_card, {ok1.id: 'ok', falha.id: 'erro', lento.id: 'timeout', ok2.id: 'ok'})
+        self.assertEqual(response.data['sucesso'], 2)
+
+        ok1.refresh_from_db()
+        falha.refresh_from_db()
+        self.assertTrue(ok1.prompt_refinado.startswith('refinado'))
+        self.assertIsNone(falha.prompt_refinado)
+
+    def test_ids_invalidos(self):
+        response = self.client.post('/api/ai/run/lote/', {'agente_id': self.agente.id, 'coluna_id': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_so_roda_em_cards_acessiveis(self):
+        outro = User.objects.create_user('bia', password='x')
+        alheio = Projeto.objects.create(titulo='Alheio', dono=outro)
+
+        response = self.client.post('/api/ai/run/lote/', {
+            'agente_id': self.agente.id, 'projeto_id': alheio.id
+        })
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste', AI_FILA_MAX_TENTATIVAS=2)
+class FilaIATests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='C')
+        self.card = Card.objects.create(coluna=coluna, titulo='T', conteudo_original='...')
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+
+    def rodar_worker(self, falso):
+        with mock.patch('ai_engine.provedores.obter_cliente', return_value=falso):
+            call_command('worker_ia', '--uma-vez', '--concorrencia', '1', stdout=StringIO())
+
+    def test_enfileira_e_worker_grava_o_resultado(self):
+        response = self.client.post('/api/ai/run/', {
+            'card_id': self.card.id, 'agente_id': self.agente.id, 'assincrono': True
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], JobIA.PENDENTE)
+
+        self.rodar_worker(cliente_falso('Pronto'))
+
+        job = self.client.get(f"/api/ai/jobs/{response.data['id']}/").data
+        self.assertEqual(job['status'], JobIA.CONCLUIDO)
+        self.assertEqual(job['resultado'], 'Pronto')
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.prompt_refinado, 'Pronto')
+
+    def test_falha_volta_para_fila_com_backoff_ate_desistir(self):
+        job_id = self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id}).data['id']
+        quebrado = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': RuntimeError('503')}))
+
+        self.rodar_worker(quebrado)
+        job = JobIA.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.tentativas), (JobIA.PENDENTE, 1))
+        self.assertGreater(job.disponivel_em, job.iniciado_em)
+        self.assertIsNone(reivindicar_job('teste'))  # ainda no backoff
+
+        JobIA.objects.filter(pk=job_id).update(disponivel_em=job.iniciado_em)
+        self.rodar_worker(quebrado)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tentativas, job.erro), (JobIA.FALHOU, 2, '503'))
+
+    def test_worker_nao_repete_a_chamada_dentro_da_tentativa(self):
+        self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id})
+        instavel = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': httpx.ConnectError('caiu')}))
+
+        self.rodar_worker(instavel)
+
+        # Quem tenta de novo é a fila (com backoff), não o resiliencia.chamar
+        self.assertEqual(instavel.models.generate_content.call_count, 1)
+        self.assertEqual(JobIA.objects.get().status, JobIA.PENDENTE)
+
+    def test_card_apagado_durante_o_job_marca_falhou(self):
+        job_id = self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id}).data['id']
+        job = reivindicar_job('teste')
+        Card.objects.filter(pk=self.card.pk).delete()  # o job fica, com card nulo
+
+        with mock.patch('ai_engine.provedores.obter_cliente', return_value=cliente_falso('Pronto')):
+            job = processar_job(job)
+
+        self.assertEqual((job.id, job.status), (job_id, JobIA.FALHOU))
+
+    def test_worker_continua_depois_de_erro_inesperado(self):
+        for _ in range(2):
+            self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id})
+        saida = StringIO()
+        with mock.patch('ai_engine.management.commands.worker_ia.processar_job',
+                        side_effect=[RuntimeError('bug'), mock.DEFAULT], wraps=processar_job), \
+                mock.patch('ai_engine.provedores.obter_cliente', return_value=cliente_falso('Pronto')):
+            call_command('worker_ia', '--uma-vez', '--concorrencia', '1', stdout=saida, stderr=StringIO())
+
+        self.assertIn(JobIA.CONCLUIDO, saida.getvalue())
+
+    def test_assincrono_exige_acesso_ao_card(self):
+        outro = User.objects.create_user('bia', password='x')
+        alheio = Projeto.objects.create(titulo='Alheio', dono=outro)
+        card = Card.objects.create(coluna=Coluna.objects.create(projeto=alheio, titulo='C'), titulo='X')
+
+        response = self.client.post('/api/ai/run/', {
+            'card_id': card.id, 'agente_id': self.agente.id, 'assincrono': True
+        })
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(JobIA.objects.exists())
+
+    def test_job_so_e_reivindicado_uma_vez(self):
+        self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id})
+
+        self.assertIsNotNone(reivindicar_job('a'))
+        self.assertIsNone(reivindicar_job('b'))
+
+
+@override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0, 'PEDACOS': 4})
+class ProvedorFakeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='C')
+        self.card = Card.objects.create(coluna=coluna, titulo='T', conteudo_original='...')
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+
+    def test_roda_sem_api_key_nem_rede(self):
+        with override_settings(GEMINI_API_KEY=None):
+            response = self.client.post('/api/ai/run/', {'card_id': self.card.id, 'agente_id': self.agente.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['result'].startswith('Resposta simulada'))
+
+    def test_latencia_por_agente_no_server_timing_e_no_metrics(self):
+        IA.limpar()
+
+        response = self.client.post('/api/ai/run/', {'card_id': self.card.id, 'agente_id': self.agente.id})
+
+        self.assertIn('ia;dur=', response['Server-Timing'])
+        self.assertIn('alchemist_ia_duracao_segundos_count{agente="Refinador",status="ok"} 1', IA.exportar())
+
+    def test_stream_em_pedacos(self):
+        provedor = obter_provedor()
+
+        async def juntar():
+            return [pedaco async for pedaco in provedor.gerar_stream('um dois três', 0.7)]
+
+        pedacos = async_to_sync(juntar)()
+        self.assertEqual(len(pedacos), 4)
+        self.assertEqual(''.join(pedacos), provedor.gerar('um dois três', 0.7).texto)
+
+    def test_taxa_de_erro(self):
+        with override_settings(AI_PROVEDOR_FAKE={'LATENCIA': 0, 'TAXA_ERRO': 1}):
+            with self.assertRaises(ErroProvedor):
+                obter_provedor().gerar('x', 0.7)
+
+
+CONFIG_RESILIENCIA = {
+    'ALIAS': 'default', 'CONCORRENCIA_GLOBAL': 8, 'CONCORRENCIA_USUARIO': 2,
+    'TAXA_GLOBAL': 100, 'TAXA_USUARIO': 100, 'JANELA_TAXA': 60, 'ESPERA_VAGA': 0.1,
+    'PRAZO': 5, 'TENTATIVAS': 3, 'BACKOFF': 0.01,
+    'DISJUNTOR_FALHAS': 3, 'DISJUNTOR_JANELA': 60, 'DISJUNTOR_PAUSA': 30,
+}
+
+
+@override_settings(GEMINI_API_KEY='chave-de-teste', AI_RESILIENCIA=CONFIG_RESILIENCIA)
+class ResilienciaTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        projeto = Projeto.objects.create(titulo='P', dono=self.user)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='C')
+        self.card = Card.objects.create(coluna=coluna, titulo='T', conteudo_original='...')
+        self.agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+
+    def rodar(self, falso=None):
+        dados = {'card_id': self.card.id, 'agente_id': self.agente.id, 'force_refresh': True}
+        if falso is None:
+            return self.client.post('/api/ai/run/', dados)
+        with mock.patch('ai_engine.provedores.obter_cliente', return_value=falso):
+            return self.client.post('/api/ai/run/', dados)
+
+    def test_erro_transitorio_tenta_de_novo(self):
+        resposta = SimpleNamespace(text='Recuperado', usage_metadata=None)
+        falso = SimpleNamespace(models=mock.Mock(**{
+            'generate_content.side_effect': [httpx.ConnectError('caiu'), resposta]
+        }))
+
+        response = self.rodar(falso)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['result'], 'Recuperado')
+        self.assertEqual(falso.models.generate_content.call_count, 2)
+        # Cada tentativa recebe o que sobra do prazo como timeout do SDK
+        config = falso.models.generate_content.call_args.kwargs['config']
+        self.assertLessEqual(config.http_options.timeout, 5000)
+
+    def test_erro_permanente_nao_tenta_de_novo(self):
+        falso = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': RuntimeError('chave inválida')}))
+
+        response = self.rodar(falso)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(falso.models.generate_content.call_count, 1)
+
+    def test_disjuntor_abre_e_falha_rapido(self):
+        falso = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': httpx.ConnectError('caiu')}))
+        self.rodar(falso)
+        self.assertEqual(falso.models.generate_content.call_count, 3)
+
+        response = self.rodar(falso)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(falso.models.generate_content.call_count, 3)  # nem chamou o provedor
+
+        lote = self.client.post('/api/ai/run/lote/', {'agente_id': self.agente.id, 'coluna_id': self.card.coluna_id})
+        self.assertEqual(lote.status_code, 503)
+
+    def test_disjuntor_semiaberto_fecha_com_sucesso(self):
+        cache.set(resiliencia.CHAVE_ABERTO_ATE, time.time() - 1, 60)
+
+        response = self.rodar(cliente_falso('Voltou'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(resiliencia.CHAVE_ABERTO_ATE))
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0})
+    def test_sonda_recusada_pela_cota_e_devolvida(self):
+        cache.set(resiliencia.CHAVE_ABERTO_ATE, time.time() - 1, 60)
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 0}):
+            self.assertEqual(self.rodar().status_code, 429)
+
+        self.assertIsNone(cache.get(resiliencia.CHAVE_SONDA))
+        self.assertEqual(self.rodar().status_code, 200)
+
+    def test_sonda_com_erro_permanente_e_devolvida(self):
+        cache.set(resiliencia.CHAVE_ABERTO_ATE, time.time() - 1, 60)
+        falso = SimpleNamespace(models=mock.Mock(**{'generate_content.side_effect': ValueError('resposta inválida')}))
+
+        self.assertEqual(self.rodar(falso).status_code, 500)
+
+        self.assertIsNone(cache.get(resiliencia.CHAVE_SONDA))
+        self.assertEqual(self.rodar(cliente_falso('Voltou')).status_code, 200)
+
+    def test_usuario_no_limite_nao_gasta_cota_global(self):
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 0, 'TAXA_GLOBAL': 1}):
+            with self.assertRaises(resiliencia.LimiteExcedido):
+                resiliencia.consumir_cota(self.user)
+            resiliencia.consumir_cota(None)  # a ficha global continua lá
+
+    def test_cota_e_um_balde_que_se_enche_aos_poucos(self):
+        inicio = time.time()
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 2, 'JANELA_TAXA': 60}), \
+                mock.patch('ai_engine.resiliencia.time.time') as relogio:
+            relogio.return_value = inicio
+            resiliencia.consumir_cota(self.user, 2)
+            with self.assertRaises(resiliencia.LimiteExcedido) as recusa:
+                resiliencia.consumir_cota(self.user)
+            self.assertAlmostEqual(recusa.exception.retry_after, 30, places=3)
+
+            # Sem rajada dobrada na virada da janela: só uma ficha volta a cada 30s
+            relogio.return_value = inicio + 31
+            resiliencia.consumir_cota(self.user)
+            with self.assertRaises(resiliencia.LimiteExcedido):
+                resiliencia.consumir_cota(self.user)
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0})
+    def test_lote_reserva_a_cota_inteira(self):
+        coluna = self.card.coluna
+        for i in range(2):
+            Card.objects.create(coluna=coluna, titulo=f'Extra {i}', ordem=i + 1)
+        lote = {'agente_id': self.agente.id, 'coluna_id': coluna.id, 'force_refresh': True}
+
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 2}):
+            recusado = self.client.post('/api/ai/run/lote/', lote)
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 3}):
+            cache.clear()
+            aceito = self.client.post('/api/ai/run/lote/', lote)
+
+        self.assertEqual(recusado.status_code, 429)
+        self.assertEqual(aceito.data['sucesso'], 3)
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0})
+    def test_cota_por_usuario(self):
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 1}):
+            self.assertEqual(self.rodar().status_code, 200)
+            response = self.rodar()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0})
+    def test_sem_vaga_para_o_usuario(self):
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'CONCORRENCIA_USUARIO': 1}):
+            with resiliencia.vaga(self.user):
+                response = self.rodar()
+            self.assertEqual(self.rodar().status_code, 200)  # a vaga foi devolvida
+
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 1})
+    def test_prazo_esgotado(self):
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'PRAZO': 0.2}):
+            inicio = time.monotonic()
+            response = self.rodar()
+
+        self.assertEqual(response.status_code, 504)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    @override_settings(AI_PROVEDOR='fake', AI_PROVEDOR_FAKE={'LATENCIA': 0})
+    def test_job_recusado_pelo_limite_nao_gasta_tentativa(self):
+        job_id = self.client.post('/api/ai/jobs/', {'card': self.card.id, 'agente': self.agente.id}).data['id']
+        with override_settings(AI_RESILIENCIA={**CONFIG_RESILIENCIA, 'TAXA_USUARIO': 0}):
+            processar_job(reivindicar_job('teste'))
+
+        job = JobIA.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.tentativas), (JobIA.PENDENTE, 0))
+        self.assertGreater(job.disponivel_em, job.iniciado_em)
+
+    def test_stream_com_disjuntor_aberto(self):
+        cache.set(resiliencia.CHAVE_ABERTO_ATE, time.time() + 30, 60)
+        auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+
+        async def postar():
+            return await self.async_client.post(
+                '/api/ai/run/stream/', {'card_id': self.card.id, 'agente_id': self.agente.id},
+                content_type='application/json', **auth,
+            )
+
+        response = async_to_sync(postar)()
+        self.assertEqual(response.status_code, 503)
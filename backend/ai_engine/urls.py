@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RunAIActionView, AgenteIAViewSet # <--- Agora usando o nome correto
+from .views import RunAIActionView, RunAIBatchView, RunAIStreamView, CacheIAView, AgenteIAViewSet, JobIAViewSet # <--- Agora usando o nome correto
 
 router = DefaultRouter()
 # Rota para gerenciar os agentes (CRUD)
 router.register(r'agentes', AgenteIAViewSet, basename='agente')
+# Fila de execuções (enfileira e acompanha: /api/ai/jobs/<id>/)
+router.register(r'jobs', JobIAViewSet, basename='job')
 
 urlpatterns = [
     # Inclui as rotas do router (ex: /api/ai/agentes/)
@@ -12,4 +14,13 @@ urlpatterns = [
     
     # Rota para executar a IA (ex: /api/ai/run/)
     path('run/', RunAIActionView.as_view(), name='run-ai'),
+
+    # Roda um agente na coluna ou no workspace inteiro (ex: /api/ai/run/lote/)
+    path('run/lote/', RunAIBatchView.as_view(), name='run-ai-lote'),
+
+    # Mesma execução, com o texto chegando por streaming (SSE) (ex: /api/ai/run/stream/)
+    path('run/stream/', RunAIStreamView.as_view(), name='run-ai-stream'),
+
+    # Hits e economia do cache de gerações (ex: /api/ai/cache/)
+    path('cache/', CacheIAView.as_view(), name='cache-ai'),
 ]
\ No newline at end of file
@@ -1,33 +1,54 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, viewsets, permissions
+from rest_framework import mixins, status, viewsets, permissions
+from rest_framework.exceptions import AuthenticationFailed
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.conf import settings
-
-# --- NOVA BIBLIOTECA DO GOOGLE (2026) ---
-from google import genai
-from google.genai import types
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
 # Importar modelos
+from projetos.acesso import cards_acessiveis
+from projetos.autenticacao import JWTComCache
 from projetos.models import Card
-from .models import AgenteIA
-from .serializers import AgenteIASerializer
+from core.metricas import medir_ia
+
+from . import resiliencia
+from .cache import obter_cache
+from .fila import enfileirar
+from .models import AgenteIA, JobIA
+from .provedores import obter_provedor
+from .serializers import AgenteIASerializer, JobIASerializer
+from .servicos import (
+    buscar_no_cache, deve_salvar_no_card, executar_em_lote, gerar_texto, guardar_no_cache,
+    montar_prompt
+)
+
+def cabecalhos_indisponivel(erro):
+    # Retry-After em segundos inteiros (429/503 das proteções de resiliencia.py)
+    return {'Retry-After': str(max(1, round(erro.retry_after)))} if erro.retry_after else {}
+
 
 class RunAIActionView(APIView):
     """
     Executa um Agente de IA em um card específico.
     Recebe: { "card_id": 1, "agente_id": 3 }
+    Com "assincrono": true, só enfileira (JobIA) e responde 202 na hora;
+    o resultado sai em /api/ai/jobs/<id>/ quando o worker_ia terminar.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        # 1. Validação da API Key
-        api_key = getattr(settings, 'GEMINI_API_KEY', None)
-        if not api_key:
-            return Response(
-                {"error": "API Key do Gemini não configurada no servidor (.env)."}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # 1. Validação do provedor (API Key etc.)
+        erro_provedor = obter_provedor().erro_configuracao()
+        if erro_provedor:
+            return Response({"error": erro_provedor}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         card_id = request.data.get('card_id')
         agente_id = request.data.get('agente_id')
@@ -38,51 +59,41 @@ class RunAIActionView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 2. Busca os dados no banco
-        card = get_object_or_404(Card, id=card_id)
+        try:
+            card_id, agente_id = int(card_id), int(agente_id)
+        except (TypeError, ValueError):
+            return Response({"error": "Parâmetros 'card_id' e 'agente_id' inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Busca os dados no banco (só cards de projetos acessíveis, inclusive no modo assíncrono)
+        card = get_object_or_404(cards_acessiveis(request.user), id=card_id)
         agente = get_object_or_404(AgenteIA, id=agente_id)
 
-        # 3. Monta o prompt (Persona + Tarefa)
-        full_prompt = (
-            f"--- PERSONA / AGENTE ---\n"
-            f"{agente.prompt_sistema}\n\n"
-            f"--- DADOS DO USUÁRIO (Contexto Real) ---\n"
-            f"Título Principal: {card.titulo}\n"
-            f"Descrição Detalhada/Input: {card.conteudo_original}\n\n"
-            f"--- INSTRUÇÕES DE SAÍDA ---\n"
-            f"1. Analise o Título E a Descrição Detalhada para compor sua resposta.\n"
-            f"2. IMPORTANTE: Entregue APENAS o resultado final (o prompt refinado, o código, ou o texto solicitado).\n"
-            f"3. NÃO inclua 'Persona', 'Contexto', 'Objetivo' ou explicações sobre sua estrutura lógica.\n"
-            f"4. Quero apenas o texto pronto para ser copiado e usado.\n\n"
-            f"--- SUA RESPOSTA FINAL ---"
-        )
+        # Ignora o cache quando o usuário pede uma resposta nova
+        force_refresh = str(request.data.get('force_refresh', '')).lower() in ('1', 'true')
+
+        if str(request.data.get('assincrono', '')).lower() in ('1', 'true'):
+            job = enfileirar(card, agente, request.user, force_refresh)
+            return Response(JobIASerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
         try:
-            # 4. Configura o Cliente (Nova Sintaxe)
-            client = genai.Client(api_key=api_key)
-
-            # 5. Chama a IA
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    temperature=agente.temperatura
-                )
-            )
-            
-            ai_text = response.text
+            # 3. Monta o prompt e chama a IA (ou reaproveita uma geração idêntica do cache)
+            ai_text, cache_hit = gerar_texto(agente, card, force_refresh, usuario=request.user)
 
             # 6. Lógica de Salvamento Inteligente
-            nome_agente = agente.nome.lower()
-            if any(x in nome_agente for x in ["refinador", "arquiteto", "engenheiro"]):
+            if deve_salvar_no_card(agente):
                 card.prompt_refinado = ai_text
-                card.save()
+                card.save(update_fields=['prompt_refinado', 'atualizado_em'])
 
             return Response({
                 "result": ai_text,
-                "agente_usado": agente.nome
+                "agente_usado": agente.nome,
+                "cache_hit": cache_hit
             }, status=status.HTTP_200_OK)
 
+        except resiliencia.IndisponivelIA as e:
+            # Limite, disjuntor aberto ou prazo esgotado: responde rápido, sem 500
+            return Response({"error": str(e)}, status=e.status, headers=cabecalhos_indisponivel(e))
+
         except Exception as e:
             print(f"ERRO GEMINI: {str(e)}") 
             return Response(
@@ -90,6 +101,230 @@ class RunAIActionView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class RunAIBatchView(APIView):
+    """
+    Executa um Agente de IA sobre todos os cards de uma coluna ou de um workspace.
+    Recebe: { "agente_id": 3, "coluna_id": 7 } ou { "agente_id": 3, "projeto_id": 2 }
+    Opcional: "concorrencia" (limitada por AI_LOTE_CONCORRENCIA) e "force_refresh".
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        erro_provedor = obter_provedor().erro_configuracao()
+        if erro_provedor:
+            return Response({"error": erro_provedor}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        agente_id = request.data.get('agente_id')
+        coluna_id = request.data.get('coluna_id')
+        projeto_id = request.data.get('projeto_id')
+        if not agente_id or not (coluna_id or projeto_id):
+            return Response(
+                {"error": "Parâmetros 'agente_id' e 'coluna_id' ou 'projeto_id' são obrigatórios."}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            agente_id = int(agente_id)
+            coluna_id = int(coluna_id) if coluna_id else None
+            projeto_id = int(projeto_id) if projeto_id else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Parâmetros 'agente_id', 'coluna_id' e 'projeto_id' devem ser numéricos."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            concorrencia = int(request.data.get('concorrencia') or settings.AI_LOTE_CONCORRENCIA)
+        except (TypeError, ValueError):
+            return Response({"error": "Concorrência inválida."}, status=status.HTTP_400_BAD_REQUEST)
+        concorrencia = max(1, min(concorrencia, settings.AI_LOTE_CONCORRENCIA))
+        force_refresh = str(request.data.get('force_refresh', '')).lower() in ('1', 'true')
+
+        agente = get_object_or_404(AgenteIA, id=agente_id)
+        try:
+            # Com o provedor fora do ar, nem começa o lote
+            resiliencia.verificar_disjuntor(sondar=False)
+        except resiliencia.CircuitoAberto as e:
+            return Response({"error": str(e)}, status=e.status, headers=cabecalhos_indisponivel(e))
+        cards = cards_acessiveis(request.user)
+        if coluna_id:
+            cards = cards.filter(coluna_id=coluna_id)
+        else:
+            cards = cards.filter(coluna__projeto_id=projeto_id)
+        cards = list(cards.order_by('coluna__ordem', 'ordem', 'id')[:settings.AI_LOTE_MAX_CARDS + 1])
+
+        if not cards:
+            return Response({"error": "Nenhum card encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        if len(cards) > settings.AI_LOTE_MAX_CARDS:
+            return Response(
+                {"error": f"Limite de {settings.AI_LOTE_MAX_CARDS} cards por lote."}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            resultados = executar_em_lote(
+                agente, cards, force_refresh=force_refresh,
+                concorrencia=concorrencia, timeout=settings.AI_LOTE_TIMEOUT, usuario=request.user,
+            )
+        except resiliencia.LimiteExcedido as e:
+            # Sem cota para o lote inteiro: recusa antes de chamar o provedor
+            return Response({"error": str(e)}, status=e.status, headers=cabecalhos_indisponivel(e))
+        return Response({
+            "agente_usado": agente.nome,
+            "total": len(resultados),
+            "sucesso": sum(r['status'] in ('ok', 'cache') for r in resultados),
+            "resultados": resultados
+        }, status=status.HTTP_200_OK)
+
+def evento_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RunAIStreamView(View):
+    """
+    Versão assíncrona do RunAIActionView: envia o texto por Server-Sent Events
+    à medida que o provedor (Gemini) gera, sem prender um worker durante a geração.
+    Recebe: { "card_id": 1, "agente_id": 3 }
+    Eventos: 'token' ({texto}), 'fim' ({result, agente_usado}) ou 'erro' ({error}).
+    Deve ser servida pelo ASGI (core/asgi.py); o ORM roda fora do event loop.
+    """
+
+    async def post(self, request):
+        # Mesma autenticação JWT da API (a consulta do usuário roda numa thread)
+        try:
+            autenticado = await sync_to_async(JWTComCache().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"error": str(e.detail)}, status=401)
+        if autenticado is None:
+            return JsonResponse({"error": "Autenticação necessária."}, status=401)
+        user = autenticado[0]
+
+        erro_provedor = obter_provedor().erro_configuracao()
+        if erro_provedor:
+            return JsonResponse({"error": erro_provedor}, status=500)
+
+        try:
+            dados = json.loads(request.body or b'{}')
+            if not isinstance(dados, dict):
+                raise ValueError("corpo não é um objeto")
+            card_id = int(dados.get('card_id'))
+            agente_id = int(dados.get('agente_id'))
+            force_refresh = str(dados.get('force_refresh', '')).lower() in ('1', 'true')
+        except (TypeError, ValueError):
+            return JsonResponse(
+                {"error": "Parâmetros 'card_id' e 'agente_id' são obrigatórios."}, status=400
+            )
+
+        try:
+            card = await cards_acessiveis(user).aget(pk=card_id)
+            agente = await AgenteIA.objects.aget(pk=agente_id)
+        except (Card.DoesNotExist, AgenteIA.DoesNotExist):
+            return JsonResponse({"error": "Card ou agente não encontrado."}, status=404)
+
+        chave, entrada = await sync_to_async(buscar_no_cache)(agente, card, force_refresh)
+        if entrada is None:
+            try:
+                # Disjuntor aberto: 503 antes de abrir o stream
+                await sync_to_async(resiliencia.verificar_disjuntor)(sondar=False)
+            except resiliencia.CircuitoAberto as e:
+                response = JsonResponse({"error": str(e)}, status=e.status)
+                for nome, valor in cabecalhos_indisponivel(e).items():
+                    response[nome] = valor
+                return response
+
+        response = StreamingHttpResponse(
+            self.eventos(card, agente, chave, entrada, user), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # não deixa o proxy segurar o stream
+        return response
+
+    async def eventos(self, card, agente, chave, entrada, user):
+        if entrada is not None:
+            # Geração idêntica já está no cache: manda o texto inteiro de uma vez
+            yield evento_sse('token', {"texto": entrada['resultado']})
+            async for evento in self.finalizar(card, agente, entrada['resultado'], cache_hit=True):
+                yield evento
+            return
+
+        partes = []
+        inicio = time.perf_counter()
+        try:
+            provedor = obter_provedor()
+            prompt = montar_prompt(agente, card)
+            pedacos = resiliencia.stream(
+                lambda timeout: provedor.gerar_stream(prompt, agente.temperatura, timeout=timeout), user
+            )
+            # Depois dos cabeçalhos: só o histograma por agente, sem Server-Timing
+            with medir_ia(agente):
+                async for texto in pedacos:
+                    partes.append(texto)
+                    yield evento_sse('token', {"texto": texto})
+        except resiliencia.IndisponivelIA as e:
+            yield evento_sse('erro', {"error": str(e), "status": e.status})
+            return
+        except Exception as e:
+            print(f"ERRO GEMINI (stream): {str(e)}")
+            yield evento_sse('erro', {"error": f"Erro na execução da IA: {str(e)}"})
+            return
+
+        ai_text = ''.join(partes)
+        latencia_ms = int((time.perf_counter() - inicio) * 1000)
+        await sync_to_async(guardar_no_cache)(chave, agente, ai_text, latencia_ms)
+
+        async for evento in self.finalizar(card, agente, ai_text, cache_hit=False):
+            yield evento
+
+    async def finalizar(self, card, agente, ai_text, cache_hit):
+        # Salva só quando o stream termina inteiro
+        if deve_salvar_no_card(agente):
+            card.prompt_refinado = ai_text
+            await card.asave(update_fields=['prompt_refinado', 'atualizado_em'])
+
+        yield evento_sse('fim', {"result": ai_text, "agente_usado": agente.nome, "cache_hit": cache_hit})
+
+class CacheIAView(APIView):
+    """
+    Estatísticas do cache de gerações: hits por entrada e a latência/tokens
+    de API que eles economizaram. Só para staff: as entradas são de todos os
+    usuários.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        cache = obter_cache()
+        if cache is None:
+            return Response({"error": "Cache de gerações desligado (AI_CACHE)."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(cache.estatisticas())
+
+class JobIAViewSet(mixins.CreateModelMixin,
+                   mixins.RetrieveModelMixin,
+                   mixins.ListModelMixin,
+                   viewsets.GenericViewSet):
+    """
+    Fila de execuções de IA: POST enfileira e responde 202 na hora,
+    GET /api/ai/jobs/<id>/ acompanha o status até 'concluido' ou 'falhou'.
+    """
+    serializer_class = JobIASerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return JobIA.objects.filter(usuario=self.request.user).select_related('agente').order_by('-id')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        card = serializer.validated_data['card']
+        if not cards_acessiveis(request.user).filter(pk=card.pk).exists():
+            return Response({"error": "Card não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        job = enfileirar(
+            card, serializer.validated_data['agente'], request.user,
+            serializer.validated_data.get('force_refresh', False),
+        )
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 class AgenteIAViewSet(viewsets.ModelViewSet):
     """
     CRUD para gerenciar os Agentes (Personas) pelo Frontend.
@@ -0,0 +1,189 @@
+"""
+Teste de carga de ponta a ponta contra um servidor rodando.
+
+Faz login JWT, monta um workspace próprio (colunas, cards e um agente) e
+dispara uma mistura de operações numa taxa alvo (malha aberta: as
+requisições saem no horário marcado, mesmo que o servidor atrase):
+- board: GET /api/workspaces/<id>/
+- mover: POST /api/cards/<id>/mover/
+- ia:    POST /api/ai/run/
+
+Para não gastar cota do Gemini, suba o servidor com o provedor fake:
+
+    AI_PROVEDOR=fake AI_FAKE_LATENCIA=0.8 AI_CACHE_BACKEND= uvicorn core.asgi:application --workers 4
+
+Uso (a partir de backend/):
+    python -m benchmarks.carga --usuario ana --senha x --rps 50 --duracao 30
+    python -m benchmarks.carga --rps 20 --pesos board=1,mover=0,ia=1
+
+Relata p50/p95/p99 e a vazão por operação. O atraso de disparo (quanto a
+requisição saiu depois do horário marcado) mostra se o próprio gerador
+saturou; aumente --threads se ele crescer.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class Carga:
+    def __init__(self, url, usuario, senha, colunas, cards):
+        self.url = url.rstrip('/')
+        self.local = threading.local()
+        self.token = self._login(usuario, senha)
+        self.projeto_id, self.colunas, self.cards = self._montar_board(colunas, cards)
+        self.agente_id = self._criar_agente()
+
+    def sessao(self):
+        # Uma Session por thread: reaproveita a conexão keep-alive
+        sessao = getattr(self.local, 'sessao', None)
+        if sessao is None:
+            sessao = requests.Session()
+            sessao.headers['Authorization'] = f'Bearer {self.token}'
+            self.local.sessao = sessao
+        return sessao
+
+    def _login(self, usuario, senha):
+        response = requests.post(f'{self.url}/api/token/', json={'username': usuario, 'password': senha})
+        response.raise_for_status()
+        return response.json()['access']
+
+    def _criar(self, caminho, dados):
+        response = self.sessao().post(f'{self.url}{caminho}', json=dados)
+        response.raise_for_status()
+        return response.json()['id']
+
+    def _montar_board(self, total_colunas, cards_por_coluna):
+        projeto_id = self._criar('/api/workspaces/', {'titulo': f'Carga {int(time.time())}'})
+        colunas, cards = [], []
+        for c in range(total_colunas):
+            coluna_id = self._criar('/api/colunas/', {'projeto': projeto_id, 'titulo': f'Coluna {c}', 'ordem': c})
+            colunas.append(coluna_id)
+            for i in range(cards_por_coluna):
+                cards.append(self._criar('/api/cards/', {
+                    'coluna': coluna_id, 'titulo': f'Card {c}-{i}', 'conteudo_original': 'Texto de carga ' * 20,
+                }))
+        return projeto_id, colunas, cards
+
+    def _criar_agente(self):
+        return self._criar('/api/ai/agentes/', {
+            'nome': 'Carga', 'descricao': 'Agente do teste de carga', 'prompt_sistema': 'Resuma o card.',
+        })
+
+    def board(self):
+        return self.sessao().get(f'{self.url}/api/workspaces/{self.projeto_id}/')
+
+    def mover(self):
+        return self.sessao().post(f'{self.url}/api/cards/{random.choice(self.cards)}/mover/', json={
+            'coluna_id': random.choice(self.colunas), 'nova_posicao': random.randint(0, 5),
+        })
+
+    def ia(self):
+        return self.sessao().post(f'{self.url}/api/ai/run/', json={
+            'card_id': random.choice(self.cards), 'agente_id': self.agente_id,
+        })
+
+    def limpar(self):
+        self.sessao().delete(f'{self.url}/api/workspaces/{self.projeto_id}/')
+        self.sessao().delete(f'{self.url}/api/ai/agentes/{self.agente_id}/')
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def executar(carga, rps, duracao, pesos, threads):
+    operacoes = [nome for nome, peso in pesos.items() if peso > 0]
+    chances = [pesos[nome] for nome in operacoes]
+    latencias = defaultdict(list)
+    erros = defaultdict(int)
+    atrasos = []
+    lock = threading.Lock()
+
+    def disparar(nome, agendado):
+        inicio = time.perf_counter()
+        try:
+            ok = getattr(carga, nome)().status_code < 400
+        except requests.RequestException:
+            ok = False
+        fim = time.perf_counter()
+        with lock:
+            atrasos.append(inicio - agendado)
+            latencias[nome].append((fim - inicio) * 1000)
+            if not ok:
+                erros[nome] += 1
+
+    intervalo = 1.0 / rps
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        inicio = time.perf_counter()
+        proximo = inicio
+        while proximo - inicio < duracao:
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(disparar, random.choices(operacoes, chances)[0], proximo)
+            proximo += intervalo
+    total = time.perf_counter() - inicio  # inclui esperar as requisições em voo
+
+    return latencias, erros, atrasos, total
+
+
+def relatorio(latencias, erros, atrasos, total):
+    print(f"{'operação':<8} {'n':>6} {'erros':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    todas = []
+    for nome, valores in sorted(latencias.items()):
+        todas.extend(valores)
+        print(
+            f"{nome:<8} {len(valores):>6} {erros[nome]:>6} {len(valores) / total:>7.1f} "
+            f"{percentil(valores, 50):>6.1f}ms {percentil(valores, 95):>6.1f}ms {percentil(valores, 99):>6.1f}ms"
+        )
+    if todas:
+        print(
+            f"{'total':<8} {len(todas):>6} {sum(erros.values()):>6} {len(todas) / total:>7.1f} "
+            f"{percentil(todas, 50):>6.1f}ms {percentil(todas, 95):>6.1f}ms {percentil(todas, 99):>6.1f}ms"
+        )
+        print(f"atraso de disparo: mediana {statistics.median(atrasos) * 1000:.1f}ms, máx {max(atrasos) * 1000:.1f}ms")
+
+
+def ler_pesos(texto):
+    pesos = {'board': 0.0, 'mover': 0.0, 'ia': 0.0}
+    for parte in texto.split(','):
+        nome, _, valor = parte.partition('=')
+        if nome.strip() not in pesos:
+            raise argparse.ArgumentTypeError(f"operação desconhecida: {nome}")
+        pesos[nome.strip()] = float(valor)
+    return pesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default='admin')
+    parser.add_argument('--rps', type=float, default=20, help='requisições por segundo (alvo)')
+    parser.add_argument('--duracao', type=float, default=30, help='segundos')
+    parser.add_argument('--pesos', type=ler_pesos, default=ler_pesos('board=6,mover=3,ia=1'))
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--colunas', type=int, default=5)
+    parser.add_argument('--cards', type=int, default=20, help='cards por coluna')
+    parser.add_argument('--manter', action='store_true', help='não apaga o workspace e o agente criados')
+    args = parser.parse_args()
+
+    carga = Carga(args.url, args.usuario, args.senha, args.colunas, args.cards)
+    print(f"{args.rps:g} req/s por {args.duracao:g}s em {args.url} (workspace {carga.projeto_id})")
+    try:
+        relatorio(*executar(carga, args.rps, args.duracao, args.pesos, args.threads))
+    finally:
+        if not args.manter:
+            carga.limpar()
+
+
+if __name__ == '__main__':
+    main()
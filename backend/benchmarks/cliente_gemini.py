@@ -0,0 +1,110 @@
+"""
+Overhead por chamada: um genai.Client novo a cada requisição (como era)
+versus o cliente compartilhado de ai_engine/cliente.py.
+
+Sobe um endpoint HTTP local que imita o generateContent do Gemini e
+responde na hora, então o tempo medido é só o overhead do cliente
+(construção + conexão). Também conta quantas conexões TCP o servidor
+recebeu, para mostrar o reaproveitamento via keep-alive. Com TLS real, a
+diferença por conexão nova é ainda maior.
+
+Uso (a partir de backend/):
+    python -m benchmarks.cliente_gemini --chamadas 200
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.ambiente import configurar_django
+
+RESPOSTA = json.dumps({
+    'candidates': [{'content': {'role': 'model', 'parts': [{'text': 'ok'}]}, 'finishReason': 'STOP'}],
+}).encode()
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # permite keep-alive
+    disable_nagle_algorithm = True  # evita o atraso de ~40ms do delayed ACK nas respostas
+    conexoes = 0
+
+    def setup(self):
+        super().setup()
+        FakeGemini.conexoes += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPOSTA)))
+        self.end_headers()
+        self.wfile.write(RESPOSTA)
+
+    def log_message(self, *args):
+        pass
+
+
+def medir(obter, chamadas):
+    from google.genai import types
+
+    FakeGemini.conexoes = 0
+    tempos = []
+    for _ in range(chamadas):
+        inicio = time.perf_counter()
+        cliente = obter()  # mantém a referência: o Client fecha o httpx ao ser coletado
+        cliente.models.generate_content(
+            model='gemini-2.5-flash',
+            contents='ping',
+            config=types.GenerateContentConfig(temperature=0.7),
+        )
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'mediana': statistics.median(tempos),
+        'p95': tempos[int(len(tempos) * 0.95) - 1],
+        'conexoes': FakeGemini.conexoes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chamadas', type=int, default=200)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), FakeGemini)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{servidor.server_port}/'
+
+    configurar_django()
+    from django.conf import settings
+    from google import genai
+    from google.genai import types
+
+    from ai_engine.cliente import obter_cliente, resetar_cliente
+
+    settings.GEMINI_API_KEY = 'fake'
+    settings.GEMINI_BASE_URL = base_url
+    resetar_cliente()
+
+    def cliente_novo():
+        return genai.Client(api_key='fake', http_options=types.HttpOptions(base_url=base_url))
+
+    try:
+        resultados = {
+            'cliente por chamada': medir(cliente_novo, args.chamadas),
+            'cliente compartilhado': medir(obter_cliente, args.chamadas),
+        }
+    finally:
+        resetar_cliente()
+        servidor.shutdown()
+
+    print(f'{args.chamadas} chamadas contra {base_url}\n')
+    print(f'{"modo":<24}{"mediana (ms)":>14}{"p95 (ms)":>10}{"conexões TCP":>14}')
+    for modo, r in resultados.items():
+        print(f'{modo:<24}{r["mediana"]:>14.2f}{r["p95"]:>10.2f}{r["conexoes"]:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Planos de execução (EXPLAIN) e tempos das consultas do board.
+
+Semeia ~100k cards num banco de teste e, para cada ViewSet de `projetos`,
+executa o queryset de get_queryset() como a API faria, imprimindo o plano
+de cada SQL gerado (incluindo os prefetches) e o tempo de execução.
+
+Uso (a partir de backend/):
+    python -m benchmarks.consultas_board
+    DATABASE_URL=postgres://... python -m benchmarks.consultas_board
+"""
+import argparse
+from types import SimpleNamespace
+
+from benchmarks.ambiente import banco_de_teste, configurar_django, cronometrar, explicar, semear_boards
+
+
+def cenarios(usuario):
+    from projetos.models import Card
+    from projetos.views import CardViewSet, ColunaViewSet, ProjetoViewSet
+
+    def queryset_de(viewset_class, acao, **kwargs):
+        viewset = viewset_class(action=acao, kwargs=kwargs, format_kwarg=None)
+        viewset.request = SimpleNamespace(user=usuario, method='GET', query_params={})
+        return viewset.get_queryset()
+
+    projeto_id = queryset_de(ProjetoViewSet, 'list').values_list('id', flat=True).first()
+    coluna_id = Card.objects.filter(coluna__projeto_id=projeto_id).values_list('coluna_id', flat=True).first()
+
+    return [
+        ('ProjetoViewSet.list', lambda: list(queryset_de(ProjetoViewSet, 'list'))),
+        ('ProjetoViewSet.retrieve', lambda: queryset_de(ProjetoViewSet, 'retrieve').get(pk=projeto_id)),
+        ('ColunaViewSet.list', lambda: list(queryset_de(ColunaViewSet, 'list'))),
+        ('CardViewSet.list', lambda: list(queryset_de(CardViewSet, 'list'))),
+        ('CardViewSet (cards da coluna)',
+         lambda: list(queryset_de(CardViewSet, 'list').filter(coluna_id=coluna_id).order_by('ordem', 'id'))),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=100_000)
+    parser.add_argument('--projetos', type=int, default=500)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.test.utils import CaptureQueriesContext
+
+    with banco_de_teste() as connection:
+        print(f'Banco: {connection.vendor} | semeando {args.cards} cards em {args.projetos} projetos...')
+        usuario = semear_boards(projetos=args.projetos, total_cards=args.cards)[0]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        for nome, executar in cenarios(usuario):
+            with CaptureQueriesContext(connection) as ctx:
+                executar()
+            menor, mediana = cronometrar(executar, args.repeticoes)
+
+            print(f'\n=== {nome}: {len(ctx.captured_queries)} queries | '
+                  f'menor {menor:.1f} ms | mediana {mediana:.1f} ms')
+            for query in ctx.captured_queries:
+                print(f'\n-- {query["sql"][:300]}')
+                print(explicar(connection, query['sql']))
+
+
+if __name__ == '__main__':
+    main()
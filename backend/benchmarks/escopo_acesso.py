@@ -0,0 +1,79 @@
+"""
+Compara o escopo de acesso antigo (OR com JOIN em membros + DISTINCT) com
+o novo baseado em EXISTS (projetos/acesso.py), que é o que
+projetos/colunas/cards_acessiveis usam.
+
+Semeia 10k projetos com muitos membros cada e mede, para Projeto, Coluna e
+Card, o tempo de buscar os ids acessíveis por um usuário. O EXISTS é montado
+direto pelo filtro_acesso(), sem passar pelo cache de ids (ids_acessiveis,
+que só serve aos testes de pertinência em Python).
+
+Uso (a partir de backend/):
+    python -m benchmarks.escopo_acesso
+    DATABASE_URL=postgres://... python -m benchmarks.escopo_acesso
+"""
+import argparse
+
+from benchmarks.ambiente import banco_de_teste, configurar_django, cronometrar, semear_boards
+
+
+def escopos(usuario):
+    from django.db.models import Q
+
+    from projetos.acesso import filtro_acesso
+    from projetos.models import Card, Coluna, Projeto
+
+    antigo = {
+        'Projeto': lambda: Projeto.objects.filter(Q(dono=usuario) | Q(membros=usuario)).distinct(),
+        'Coluna': lambda: Coluna.objects.filter(
+            Q(projeto__dono=usuario) | Q(projeto__membros=usuario)
+        ).distinct(),
+        'Card': lambda: Card.objects.filter(
+            Q(coluna__projeto__membros=usuario) | Q(coluna__projeto__dono=usuario)
+        ).distinct(),
+    }
+    novo = {
+        'Projeto': lambda: Projeto.objects.filter(filtro_acesso(usuario)),
+        'Coluna': lambda: Coluna.objects.filter(filtro_acesso(usuario, 'projeto__')),
+        'Card': lambda: Card.objects.filter(filtro_acesso(usuario, 'coluna__projeto__')),
+    }
+    return antigo, novo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projetos', type=int, default=10_000)
+    parser.add_argument('--usuarios', type=int, default=500)
+    parser.add_argument('--membros', type=int, default=25, help='membros por projeto')
+    parser.add_argument('--cards', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_django()
+
+    with banco_de_teste() as connection:
+        print(f'Banco: {connection.vendor} | {args.projetos} projetos x {args.membros} membros, '
+              f'{args.cards} cards...')
+        usuario = semear_boards(
+            usuarios=args.usuarios, projetos=args.projetos, colunas_por_projeto=3,
+            total_cards=args.cards, membros_por_projeto=args.membros,
+        )[0]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        antigo, novo = escopos(usuario)
+        print(f'\n{"model":<10}{"linhas":>10}{"OR+DISTINCT (ms)":>20}{"EXISTS (ms)":>15}{"ganho":>8}')
+        for model in ('Projeto', 'Coluna', 'Card'):
+            ids_antigos = set(antigo[model]().values_list('id', flat=True))
+            ids_novos = set(novo[model]().values_list('id', flat=True))
+            assert ids_antigos == ids_novos, f'{model}: escopos divergem'
+
+            _, mediana_antiga = cronometrar(lambda: list(antigo[model]().values_list('id', flat=True)), args.repeticoes)
+            _, mediana_nova = cronometrar(lambda: list(novo[model]().values_list('id', flat=True)), args.repeticoes)
+            print(f'{model:<10}{len(ids_novos):>10}{mediana_antiga:>20.1f}{mediana_nova:>15.1f}'
+                  f'{mediana_antiga / mediana_nova:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
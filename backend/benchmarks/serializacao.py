@@ -0,0 +1,95 @@
+"""
+Tempo de serialização do board por 10k cards.
+
+Monta um board com --cards cards (em --colunas colunas, todos no board) e
+compara o caminho antigo (queryset com prefetch + ProjetoSerializer) com a
+leitura rápida (projetos/leitura.py, dicts de .values()), cada um
+renderizado pelo JSONRenderer do DRF e pelo ORJSONRenderer (core/renderers.py).
+Os tempos incluem as queries de leitura; a renderização sai à parte.
+
+Uso (a partir de backend/):
+    python -m benchmarks.serializacao
+    python -m benchmarks.serializacao --cards 50000 --projecao 'titulo,prazo,resumo,refinado'
+"""
+import argparse
+
+from benchmarks.ambiente import banco_de_teste, configurar_django, cronometrar
+
+
+def semear_board(dono, total_cards, colunas):
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from projetos.models import Card, Coluna, Projeto
+
+    projeto = Projeto.objects.create(titulo='Board grande', dono=dono)
+    Coluna.objects.bulk_create([Coluna(projeto=projeto, titulo=f'Coluna {c}', ordem=c) for c in range(colunas)])
+    ids = list(projeto.colunas.order_by('ordem').values_list('id', flat=True))
+    agora = timezone.now()
+    Card.objects.bulk_create([
+        Card(
+            coluna_id=ids[i % colunas],
+            titulo=f'Card {i}',
+            conteudo_original='Descrição do card. ' * 20,
+            prompt_refinado='Prompt refinado pela IA. ' * 80 if i % 2 else None,
+            ordem=(i // colunas) * 1024,
+            prazo=agora + timedelta(days=i % 30) if i % 3 == 0 else None,
+        )
+        for i in range(total_cards)
+    ], batch_size=5000)
+    return projeto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=10_000)
+    parser.add_argument('--colunas', type=int, default=10)
+    parser.add_argument('--projecao', default='', help="?fields= dos cards (vazio = todos os campos)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from core.renderers import ORJSONRenderer
+    from projetos.acesso import projetos_acessiveis
+    from projetos.leitura import board_em_dict
+    from projetos.serializers import ProjetoSerializer
+    from projetos.views import ProjetoViewSet, total_membros_subquery
+
+    with banco_de_teste(), override_settings(BOARD_CARDS_POR_COLUNA=args.cards):
+        dono = User.objects.create(username='bench')
+        projeto = semear_board(dono, args.cards, args.colunas)
+
+        request = Request(APIRequestFactory().get('/', {'fields': args.projecao} if args.projecao else {}))
+        request.user = dono
+
+        def serializer():
+            viewset = ProjetoViewSet(action='retrieve', request=request, kwargs={}, format_kwarg=None)
+            return ProjetoSerializer(viewset.get_queryset().get(pk=projeto.pk), context={'request': request}).data
+
+        def leitura_rapida():
+            projetos = projetos_acessiveis(dono).filter(pk=projeto.pk)
+            return board_em_dict(projetos.annotate(num_membros=total_membros_subquery()), request)
+
+        por_10k = 10_000 / args.cards
+        print(f'Board: {args.cards} cards em {args.colunas} colunas | projeção: {args.projecao or "(todos)"}')
+        print(f'{"caminho":<32}{"menor":>12}{"mediana":>12}   (ms por 10k cards)')
+        for nome, montar in [('ProjetoSerializer', serializer), ('leitura rápida (.values())', leitura_rapida)]:
+            dados = montar()
+            menor, mediana = cronometrar(montar, args.repeticoes)
+            print(f'{nome:<32}{menor * por_10k:>12.1f}{mediana * por_10k:>12.1f}')
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                menor, mediana = cronometrar(lambda: renderer.render(dados), args.repeticoes)
+                rotulo = f'  + {type(renderer).__name__}'
+                print(f'{rotulo:<32}{menor * por_10k:>12.1f}{mediana * por_10k:>12.1f}')
+        print(f'\nTamanho do JSON: {len(ORJSONRenderer().render(leitura_rapida())) / 1024:.0f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+As rotas de streaming (ex: /api/ai/run/stream/) e o WebSocket do board
+(/api/ws/workspaces/<id>/) precisam ser servidos por aqui:
+    gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker
+Com mais de um worker, configure BOARD_TEMPO_REAL_BROKER para um broker
+compartilhado (ver projetos/tempo_real.py).
 """
 
 import os
@@ -13,4 +19,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Só depois do setup do Django (importa models)
+from projetos.tempo_real import websocket_board  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_board(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,161 @@
+"""
+Orçamento de queries e detector de N+1.
+
+forma_sql() reduz uma query à sua "forma": valores e listas de IN viram
+marcadores, então `... WHERE coluna_id = 1` e `... = 2` são a mesma forma.
+A mesma forma repetida muitas vezes num request é o sinal do N+1 (um
+SerializerMethodField ou um .count() por linha, por exemplo).
+
+- orcamento_queries(maximo): context manager/decorator para os testes;
+  falha se o bloco passar de `maximo` queries ou repetir uma forma mais de
+  CONSULTAS_REPETICOES_MAXIMAS vezes.
+- NMais1Middleware: avisa no console (print) as formas repetidas de cada
+  request; ligado por CONSULTAS_N_MAIS_1 (padrão: só com DEBUG).
+
+As queries são coletadas por um execute_wrapper em cada conexão, ativo só
+dentro de um coletor (contextvar): fora dele o custo é um ContextVar.get().
+"""
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_coletores = ContextVar('coletores_sql', default=())
+
+# Controle de transação (savepoints do atomic()) fica fora do orçamento e das repetições
+IGNORADAS = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT)\b', re.I)
+LISTA_PARAMETROS = re.compile(r'\(\s*(?:%s|\?|NULL|-?\d+(?:\.\d+)?)(?:\s*,\s*(?:%s|\?|NULL|-?\d+(?:\.\d+)?))*\s*\)')
+TEXTOS = re.compile(r"'(?:[^']|'')*'")
+NUMEROS = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+ESPACOS = re.compile(r'\s+')
+
+
+def forma_sql(sql):
+    """SQL sem os valores: listas de IN viram (...) e literais viram ?."""
+    forma = TEXTOS.sub('?', sql)
+    forma = LISTA_PARAMETROS.sub('(...)', forma)
+    forma = NUMEROS.sub('?', forma).replace('%s', '?')
+    return ESPACOS.sub(' ', forma).strip()
+
+
+def formas_repetidas(sqls, maximo):
+    """[(forma, vezes)] das formas que aparecem mais de `maximo` vezes, da mais repetida."""
+    contagem = Counter(forma_sql(sql) for sql in sqls if not IGNORADAS.match(sql))
+    return [(forma, vezes) for forma, vezes in contagem.most_common() if vezes > maximo]
+
+
+def _coletar(execute, sql, params, many, context):
+    for sqls in _coletores.get():
+        sqls.append(sql)
+    return execute(sql, params, many, context)
+
+
+def _instalar(connection, **kwargs):
+    if _coletar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_coletar)
+
+
+def instalar_nas_conexoes():
+    # As conexões novas passam pelo connection_created; as já abertas, por aqui
+    for connection in connections.all(initialized_only=True):
+        _instalar(connection)
+
+
+connection_created.connect(_instalar)
+
+
+class coletar_queries:
+    """`with coletar_queries() as sqls:` junta em `sqls` o SQL executado no bloco."""
+
+    def __enter__(self):
+        instalar_nas_conexoes()
+        self.sqls = []
+        self._token = _coletores.set((*_coletores.get(), self.sqls))
+        return self.sqls
+
+    def __exit__(self, *exc):
+        _coletores.reset(self._token)
+        return False
+
+
+class OrcamentoExcedido(AssertionError):
+    pass
+
+
+def _listar(sqls):
+    return '\n'.join(f'  {i}. {sql}' for i, sql in enumerate(sqls, 1))
+
+
+class orcamento_queries(ContextDecorator):
+    """
+    Falha (OrcamentoExcedido, um AssertionError) se o bloco fizer mais de
+    `maximo` queries ou repetir uma forma mais de `repeticoes` vezes (N+1).
+    Savepoints e BEGIN/COMMIT não entram na conta.
+
+        with orcamento_queries(4):
+            self.client.get('/api/workspaces/1/')
+
+        @orcamento_queries(3)
+        def test_...(self): ...
+    """
+
+    def __init__(self, maximo, repeticoes=None):
+        self.maximo = maximo
+        self.repeticoes = settings.CONSULTAS_REPETICOES_MAXIMAS if repeticoes is None else repeticoes
+
+    def __enter__(self):
+        self._coleta = coletar_queries()
+        self.sqls = self._coleta.__enter__()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        self._coleta.__exit__(tipo, *exc)
+        if tipo is not None:
+            return False
+        queries = [sql for sql in self.sqls if not IGNORADAS.match(sql)]
+        if len(queries) > self.maximo:
+            raise OrcamentoExcedido(
+                f'{len(queries)} queries, orçamento de {self.maximo}:\n{_listar(queries)}'
+            )
+        repetidas = formas_repetidas(self.sqls, self.repeticoes)
+        if repetidas:
+            forma, vezes = repetidas[0]
+            raise OrcamentoExcedido(f'N+1: a mesma query {vezes} vezes:\n  {forma}\n\n{_listar(self.sqls)}')
+        return False
+
+
+class NMais1Middleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.CONSULTAS_N_MAIS_1:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        with coletar_queries() as sqls:
+            response = self.get_response(request)
+        self.avisar(request, sqls)
+        return response
+
+    async def __acall__(self, request):
+        with coletar_queries() as sqls:
+            response = await self.get_response(request)
+        self.avisar(request, sqls)
+        return response
+
+    def avisar(self, request, sqls):
+        for forma, vezes in formas_repetidas(sqls, settings.CONSULTAS_REPETICOES_MAXIMAS):
+            print(f"⚠️ N+1 em {request.method} {request.path}: {vezes}x {forma[:300]}")
@@ -0,0 +1,253 @@
+"""
+Métricas por request: queries e tempo de banco, serialização e IA.
+
+MetricasMiddleware abre uma Medicao por request (num contextvar, que segue
+o request nas threads do sync_to_async) e, na resposta:
+- manda os números no cabeçalho Server-Timing (aparece no DevTools):
+  `db;dur=12.3;desc="7 queries", serializacao;dur=4.1, ia;dur=950, total;dur=980`;
+- soma nos histogramas expostos em /metrics no formato do Prometheus,
+  por rota (nome da view, ex: 'projeto-detail') e por agente de IA.
+
+O tempo de banco vem de um execute_wrapper instalado em cada conexão; os
+trechos medidos com medir() (serialização, chamada ao provedor de IA)
+descontam o banco que rodou dentro deles. Fora de um request (worker_ia,
+threads do lote) medir() só mede para os histogramas, sem Server-Timing.
+
+Custo: dois perf_counter() por query e um lock curto por histograma no
+fim do request. Os histogramas ficam na memória do processo: com vários
+workers, cada um expõe os seus (o Prometheus soma por instância).
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import serializers
+
+BALDES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BALDES_QUERIES = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_medicao = ContextVar('medicao', default=None)
+
+
+class Medicao:
+    __slots__ = ('inicio', 'queries', 'db', 'tempos', '_abertos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0  # segundos
+        self.tempos = {}
+        self._abertos = set()
+
+
+def medicao_atual():
+    return _medicao.get()
+
+
+@contextmanager
+def medir(nome):
+    """Soma o tempo do bloco (sem o banco) em `nome` na medição do request."""
+    medicao = _medicao.get()
+    if medicao is None or nome in medicao._abertos:
+        # Fora de request, ou aninhado (serializer dentro de serializer): já está sendo medido
+        yield
+        return
+    medicao._abertos.add(nome)
+    inicio, db_inicio = time.perf_counter(), medicao.db
+    try:
+        yield
+    finally:
+        medicao._abertos.discard(nome)
+        duracao = time.perf_counter() - inicio - (medicao.db - db_inicio)
+        medicao.tempos[nome] = medicao.tempos.get(nome, 0.0) + duracao
+
+
+def medir_sql(execute, sql, params, many, context):
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.db += time.perf_counter() - inicio
+        medicao.queries += 1
+
+
+def _instalar(connection, **kwargs):
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_sql)
+
+
+connection_created.connect(_instalar)
+
+
+# --- Histogramas (formato de exposição do Prometheus) ---
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos, baldes=BALDES_SEGUNDOS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.baldes = baldes
+        self._series = {}  # valores dos rótulos -> [contagem por balde..., +Inf, soma]
+        self._lock = Lock()
+
+    def observar(self, valores, valor):
+        indice = bisect_left(self.baldes, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * (len(self.baldes) + 1) + [0.0]
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def exportar(self):
+        with self._lock:
+            series = {valores: list(serie) for valores, serie in self._series.items()}
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} histogram']
+        for valores, serie in sorted(series.items()):
+            rotulos = ','.join(f'{r}="{_escapar(v)}"' for r, v in zip(self.rotulos, valores))
+            acumulado = 0
+            for limite, contagem in zip((*self.baldes, '+Inf'), serie):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'{self.nome}_sum{{{rotulos}}} {serie[-1]}')
+            linhas.append(f'{self.nome}_count{{{rotulos}}} {acumulado}')
+        return linhas
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUISICOES = Histograma(
+    'alchemist_http_duracao_segundos', 'Tempo total do request por rota.', ('rota', 'metodo', 'status')
+)
+BANCO = Histograma('alchemist_http_db_segundos', 'Tempo de banco por request.', ('rota', 'metodo'))
+QUERIES = Histograma(
+    'alchemist_http_db_queries', 'Queries por request.', ('rota', 'metodo'), baldes=BALDES_QUERIES
+)
+SERIALIZACAO = Histograma(
+    'alchemist_http_serializacao_segundos', 'Tempo de serialização por request (sem o banco).', ('rota', 'metodo')
+)
+IA = Histograma(
+    'alchemist_ia_duracao_segundos', 'Latência das chamadas ao provedor de IA por agente.', ('agente', 'status')
+)
+HISTOGRAMAS = (REQUISICOES, BANCO, QUERIES, SERIALIZACAO, IA)
+
+
+@contextmanager
+def medir_ia(agente):
+    """Chamada ao provedor de IA: histograma por agente e 'ia' no Server-Timing."""
+    inicio, status = time.perf_counter(), 'erro'
+    try:
+        with medir('ia'):
+            yield
+        status = 'ok'
+    finally:
+        IA.observar((agente.nome, status), time.perf_counter() - inicio)
+
+
+class SerializacaoMedida:
+    """Mixin de serializer: o .data entra como 'serializacao' na medição do request."""
+
+    @property
+    def data(self):
+        with medir('serializacao'):
+            return super().data
+
+
+class ListaMedida(SerializacaoMedida, serializers.ListSerializer):
+    pass
+
+
+# --- Middleware e endpoint ---
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        # Conexões abertas antes do middleware carregar não passaram pelo connection_created
+        for connection in connections.all(initialized_only=True):
+            _instalar(connection)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao)
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao)
+
+    def concluir(self, request, response, medicao):
+        # Streaming: o total vai até os cabeçalhos, não até o fim do corpo
+        total = time.perf_counter() - medicao.inicio
+        match = getattr(request, 'resolver_match', None)
+        rota = match.view_name if match else 'sem_rota'
+        serializacao = medicao.tempos.get('serializacao')
+
+        REQUISICOES.observar((rota, request.method, str(response.status_code)), total)
+        BANCO.observar((rota, request.method), medicao.db)
+        QUERIES.observar((rota, request.method), medicao.queries)
+        if serializacao is not None:
+            SERIALIZACAO.observar((rota, request.method), serializacao)
+
+        if settings.METRICAS_SERVER_TIMING:
+            partes = [f'db;dur={medicao.db * 1000:.1f};desc="{medicao.queries} queries"']
+            partes += [f'{nome};dur={duracao * 1000:.1f}' for nome, duracao in medicao.tempos.items()]
+            partes.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(partes)
+        return response
+
+
+def _pode_ver_metricas(request):
+    token = settings.METRICAS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # Staff logado na sessão (ex: pelo /admin/)
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_active and user.is_staff)
+
+
+def metricas(request):
+    """
+    GET /metrics: histogramas no formato de texto do Prometheus.
+    Só com o METRICAS_TOKEN ('Authorization: Bearer <token>') ou para staff;
+    sem token configurado, o endpoint não aparece (404) para os outros.
+    """
+    if not _pode_ver_metricas(request):
+        if not settings.METRICAS_TOKEN:
+            raise Http404
+        return HttpResponse('Não autorizado\n', status=401, content_type='text/plain; charset=utf-8')
+    linhas = [linha for histograma in HISTOGRAMAS for linha in histograma.exportar()]
+    return HttpResponse('\n'.join(linhas) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,39 @@
+"""
+Renderer JSON com orjson (bem mais rápido que o json da stdlib nos boards
+grandes). orjson é opcional: sem ele cai no JSONRenderer do DRF, assim como
+quando a saída pedida não é a compacta padrão (indentação da API navegável
+ou 'application/json; indent=4', UNICODE_JSON/COMPACT_JSON desligados).
+
+Fora isso a saída é a mesma do JSONRenderer: UTF-8 compacto, U+2028/U+2029
+escapados, chaves não-string (ex: {1: 'a'}) viram string, e tipos que o
+orjson não conhece (Decimal, lazy strings, ...) passam pelo encoder do DRF.
+Única diferença: NaN/Infinity viram null em vez de erro.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metricas import medir
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with medir('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        ret = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS)
+        # Como o JSONRenderer: JSON que também é um subconjunto estrito de JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metricas.MetricasMiddleware',  # primeiro: o total do Server-Timing cobre os outros
+    'core.consultas.NMais1Middleware',  # só com CONSULTAS_N_MAIS_1 (padrão: DEBUG)
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'corsheaders.middleware.CorsMiddleware', # CORS deve ficar no topo
@@ -156,13 +158,56 @@ CSRF_TRUSTED_ORIGINS = [
 # Configuração do Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT do simplejwt com o usuário em cache (projetos/autenticacao.py)
+        'projetos.autenticacao.JWTComCache',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON com orjson (core/renderers.py); sem orjson instalado, cai no do DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Cards por coluna no board; o resto vem de cards/pagina/ (projetos/paginacao.py)
+BOARD_CARDS_POR_COLUNA = int(os.getenv('BOARD_CARDS_POR_COLUNA', '50'))
+BOARD_CARDS_PAGINA_MAXIMA = 200
+
+# Sync incremental do board (projetos/sincronizacao.py)
+BOARD_SYNC_JANELA = int(os.getenv('BOARD_SYNC_JANELA', '5'))  # segundos de sobreposição no cursor
+BOARD_SYNC_RETENCAO_DIAS = int(os.getenv('BOARD_SYNC_RETENCAO_DIAS', '30'))  # lápides de remoção
+# Board em tempo real (projetos/tempo_real.py): BrokerMemoria serve um processo só;
+# com vários workers/nós use 'projetos.tempo_real.BrokerPostgres' (ou uma classe própria)
+BOARD_TEMPO_REAL_BROKER = os.getenv('BOARD_TEMPO_REAL_BROKER', 'projetos.tempo_real.BrokerMemoria')
+BOARD_TEMPO_REAL_REVALIDAR = int(os.getenv('BOARD_TEMPO_REAL_REVALIDAR', '30'))  # segundos: reconfere o acesso
+
+# Métricas por request (core/metricas.py): cabeçalho Server-Timing e /metrics (Prometheus)
+METRICAS_SERVER_TIMING = os.getenv('METRICAS_SERVER_TIMING', 'True') == 'True'
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')  # /metrics: 'Authorization: Bearer <token>' ou staff logado; sem token, 404
+
+# Detector de N+1 (core/consultas.py): avisa no console a mesma query repetida num request
+CONSULTAS_N_MAIS_1 = os.getenv('CONSULTAS_N_MAIS_1', str(DEBUG)) == 'True'
+CONSULTAS_REPETICOES_MAXIMAS = 3  # mesma forma de SQL até 3x por request é tolerada
+
+# Cache do Django: sem REDIS_URL fica o LocMem padrão, que é por processo
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+    }
+# Caches por usuário entre requests: exigem cache compartilhado (a invalidação
+# de um processo não chega ao LocMem dos outros). Sem Redis, 0 = desligado.
+_TTL_PADRAO = REDIS_URL is not None
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '60' if _TTL_PADRAO else '0'))  # segundos: User do token (autenticacao.py)
+ACESSO_CACHE_TTL = int(os.getenv('ACESSO_CACHE_TTL', '300' if _TTL_PADRAO else '0'))  # segundos: ids acessíveis (acesso.py)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1), # Token dura 1 dia (pra não ficar deslogando toda hora)
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -170,4 +215,59 @@ SIMPLE_JWT = {
 
 # Chaves de API para Inteligência Artificial
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+GEMINI_MODELO = os.getenv('GEMINI_MODELO', 'gemini-2.5-flash')
+# Cliente Gemini compartilhado (ai_engine/cliente.py)
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))  # segundos por chamada
+GEMINI_MAX_CONEXOES = int(os.getenv('GEMINI_MAX_CONEXOES', '20'))  # conexões keep-alive no pool
+GEMINI_KEEPALIVE = float(os.getenv('GEMINI_KEEPALIVE', '30'))  # segundos até fechar conexão ociosa
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL') or None  # sobrescreve o endpoint (ex: fake local)
+
+# Provedor de LLM (ai_engine/provedores.py): 'gemini', 'fake' ou caminho de uma classe
+AI_PROVEDOR = os.getenv('AI_PROVEDOR', 'gemini')
+# Provedor 'fake' (testes de carga/dev, sem rede)
+AI_PROVEDOR_FAKE = {
+    'LATENCIA': float(os.getenv('AI_FAKE_LATENCIA', '1.0')),  # segundos por geração
+    'JITTER': float(os.getenv('AI_FAKE_JITTER', '0.3')),  # ± segundos
+    'TAXA_ERRO': float(os.getenv('AI_FAKE_TAXA_ERRO', '0')),  # 0 a 1
+    'PEDACOS': int(os.getenv('AI_FAKE_PEDACOS', '10')),  # pedaços no streaming
+    'SEMENTE': None,  # fixe para resultados reprodutíveis
+}
+
+# Execução em lote (/api/ai/run/lote/)
+AI_LOTE_CONCORRENCIA = int(os.getenv('AI_LOTE_CONCORRENCIA', '4'))  # chamadas simultâneas ao Gemini
+AI_LOTE_TIMEOUT = float(os.getenv('AI_LOTE_TIMEOUT', '120'))  # segundos para o lote inteiro
+AI_LOTE_MAX_CARDS = int(os.getenv('AI_LOTE_MAX_CARDS', '200'))
+
+# Fila de execuções (ai_engine/fila.py + manage.py worker_ia)
+AI_FILA_CONCORRENCIA = int(os.getenv('AI_FILA_CONCORRENCIA', '2'))  # threads por worker
+AI_FILA_MAX_TENTATIVAS = int(os.getenv('AI_FILA_MAX_TENTATIVAS', '3'))
+AI_FILA_BACKOFF = float(os.getenv('AI_FILA_BACKOFF', '10'))  # segundos (dobra a cada tentativa)
+AI_FILA_TIMEOUT_EXECUCAO = int(os.getenv('AI_FILA_TIMEOUT_EXECUCAO', '600'))  # job preso volta p/ fila
+AI_FILA_INTERVALO_RECUPERACAO = int(os.getenv('AI_FILA_INTERVALO_RECUPERACAO', '60'))  # segundos entre buscas
+
+# Cache de gerações (ai_engine/cache.py)
+AI_CACHE = {
+    'BACKEND': os.getenv('AI_CACHE_BACKEND', 'django'),  # 'django', 'banco' ou '' (desligado)
+    'ALIAS': 'default',  # qual entrada de CACHES usar no backend 'django'
+    'TTL': int(os.getenv('AI_CACHE_TTL', str(7 * 24 * 3600))),  # segundos
+    'MAX_ENTRADAS': int(os.getenv('AI_CACHE_MAX_ENTRADAS', '5000')),
+}
+
+# Limites, prazo, novas tentativas e disjuntor das chamadas à IA (ai_engine/resiliencia.py)
+AI_RESILIENCIA = {
+    'ALIAS': 'default',  # entrada de CACHES com o estado (compartilhada entre processos = Redis/Memcached)
+    'CONCORRENCIA_GLOBAL': int(os.getenv('AI_CONCORRENCIA_GLOBAL', '16')),  # chamadas simultâneas no total
+    'CONCORRENCIA_USUARIO': int(os.getenv('AI_CONCORRENCIA_USUARIO', '4')),
+    # Fichas do balde (enche em JANELA_TAXA); TAXA_USUARIO >= AI_LOTE_MAX_CARDS, senão o lote cheio nunca cabe
+    'TAXA_GLOBAL': int(os.getenv('AI_TAXA_GLOBAL', '600')),
+    'TAXA_USUARIO': int(os.getenv('AI_TAXA_USUARIO', '200')),
+    'JANELA_TAXA': int(os.getenv('AI_JANELA_TAXA', '60')),  # segundos para o balde vazio encher de novo
+    'ESPERA_VAGA': float(os.getenv('AI_ESPERA_VAGA', '5')),  # segundos esperando vaga antes do 429
+    'PRAZO': float(os.getenv('AI_PRAZO', '45')),  # segundos por execução, somando as tentativas
+    'TENTATIVAS': int(os.getenv('AI_TENTATIVAS', '3')),
+    'BACKOFF': float(os.getenv('AI_BACKOFF', '0.5')),  # segundos (dobra a cada tentativa, com jitter)
+    'DISJUNTOR_FALHAS': int(os.getenv('AI_DISJUNTOR_FALHAS', '5')),  # falhas na janela que abrem o circuito
+    'DISJUNTOR_JANELA': int(os.getenv('AI_DISJUNTOR_JANELA', '60')),  # segundos
+    'DISJUNTOR_PAUSA': int(os.getenv('AI_DISJUNTOR_PAUSA', '30')),  # segundos falhando rápido (503)
+}
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
\ No newline at end of file
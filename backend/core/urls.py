@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.metricas import metricas
+
 urlpatterns = [
     # Painel Administrativo do Django
     path('admin/', admin.site.urls),
@@ -19,4 +21,7 @@ urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'), # Login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), # Atualizar token
+
+    # Métricas no formato do Prometheus (core/metricas.py)
+    path('metrics', metricas, name='metricas'),
 ]
\ No newline at end of file
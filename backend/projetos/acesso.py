@@ -0,0 +1,134 @@
+"""
+Escopo de acesso aos projetos (dono OU membro).
+
+O filtro antigo `Q(dono=user) | Q(membros=user)` fazia JOIN com a tabela
+de membros, multiplicava as linhas e precisava de `.distinct()` no fim.
+Aqui a participação vira um `EXISTS` correlacionado: cada linha aparece
+uma vez só e o banco resolve o teste pelo índice único (projeto, user).
+
+Os querysets abaixo (projetos/colunas/cards_acessiveis) usam sempre o
+EXISTS: a lista de ids de um usuário em muitos projetos não cabe num IN.
+Para os testes de pertinência feitos em Python (o destino do mover e do
+mover em lote, a revalidação do WebSocket) há ids_acessiveis(), com os ids
+em cache: no próprio objeto do usuário (vale pelo request) e no cache do
+Django por ACESSO_CACHE_TTL segundos (vale entre requests). Mudanças em membros, projeto novo, troca de dono, projeto apagado e
+usuário salvo invalidam as entradas (signals no fim do arquivo); quem grava
+membros ou projetos sem signals (bulk_create) chama invalidar_acesso().
+
+A invalidação apaga a entrada na hora (a própria transação já vê o novo
+acesso) e de novo depois do commit: um request concorrente que leu os ids
+antigos antes do commit não os deixa no cache até o TTL. Sem cache
+compartilhado (ACESSO_CACHE_TTL = 0, ver settings), fica só o memo do request.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Projeto, Coluna, Card
+
+Membro = Projeto.membros.through
+
+# Sobe a cada invalidação neste processo: descarta os ids guardados nos
+# objetos de usuário que sobrevivem a mais de um request
+_geracao = 0
+
+
+def filtro_acesso(user, caminho=''):
+    """
+    Q que restringe aos projetos acessíveis pelo usuário.
+
+    `caminho` é o lookup até o projeto a partir do model filtrado:
+    '' para Projeto, 'projeto__' para Coluna, 'coluna__projeto__' para Card.
+    """
+    projeto_ref = f'{caminho}id' if caminho else 'pk'
+    membro = Membro.objects.filter(projeto_id=OuterRef(projeto_ref), user_id=user.pk)
+    return Q(**{f'{caminho}dono_id': user.pk}) | Exists(membro)
+
+
+def chave_acesso(user_id):
+    return f'acesso:projetos:{user_id}'
+
+
+def ids_acessiveis(user):
+    """frozenset dos ids dos projetos do usuário (dono ou membro), com cache."""
+    if user.pk is None:
+        return frozenset()
+    memo = getattr(user, '_ids_acessiveis', None)
+    if memo is not None and memo[0] == _geracao:
+        return memo[1]
+
+    geracao = _geracao
+    ids = cache.get(chave_acesso(user.pk)) if settings.ACESSO_CACHE_TTL else None
+    if ids is None:
+        ids = frozenset(Projeto.objects.filter(filtro_acesso(user)).values_list('id', flat=True))
+        if settings.ACESSO_CACHE_TTL:
+            cache.set(chave_acesso(user.pk), ids, settings.ACESSO_CACHE_TTL)
+    user._ids_acessiveis = (geracao, ids)
+    return ids
+
+
+def _apagar(chaves):
+    global _geracao
+    _geracao += 1
+    cache.delete_many(chaves)
+
+
+def invalidar_acesso(user_ids):
+    chaves = [chave_acesso(user_id) for user_id in user_ids if user_id is not None]
+    _apagar(chaves)
+    transaction.on_commit(lambda: _apagar(chaves))
+
+
+def projetos_acessiveis(user):
+    return Projeto.objects.filter(filtro_acesso(user))
+
+
+def colunas_acessiveis(user):
+    return Coluna.objects.filter(filtro_acesso(user, 'projeto__'))
+
+
+def cards_acessiveis(user):
+    return Card.objects.filter(filtro_acesso(user, 'coluna__projeto__'))
+
+
+@receiver(m2m_changed, sender=Membro)
+def _membros_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.projetos_membro.add(...): instance é o usuário
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_acesso([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidar_acesso(pk_set)
+    elif action == 'pre_clear':
+        # Depois do clear não dá mais para saber quem era membro
+        invalidar_acesso(instance.membros.values_list('id', flat=True))
+
+
+@receiver(post_init, sender=Projeto)
+def _projeto_carregado(sender, instance, **kwargs):
+    # __dict__: com .only()/.defer() o dono pode não ter vindo do banco
+    instance._dono_original = instance.__dict__.get('dono_id')
+
+
+@receiver(post_save, sender=Projeto)
+def _projeto_salvo(sender, instance, created, **kwargs):
+    if created or instance.dono_id != instance._dono_original:
+        # Troca de dono: o antigo perde o acesso e o novo ganha
+        invalidar_acesso({instance.dono_id, instance._dono_original})
+    instance._dono_original = instance.dono_id
+
+
+@receiver(pre_delete, sender=Projeto)
+def _projeto_apagado(sender, instance, **kwargs):
+    # As linhas de membros saem em cascata, sem m2m_changed
+    invalidar_acesso([instance.dono_id, *instance.membros.values_list('id', flat=True)])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _usuario_alterado(sender, instance, **kwargs):
+    # Usuário novo pode reaproveitar o id de um apagado
+    invalidar_acesso([instance.pk])
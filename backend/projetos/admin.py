@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import Projeto, Coluna, Card
+from .models import ArquivoProjeto, Projeto, Coluna, Card, Remocao
 
 admin.site.register(Projeto)
 admin.site.register(Coluna)
-admin.site.register(Card)
\ No newline at end of file
+admin.site.register(Card)
+admin.site.register(Remocao)
+admin.site.register(ArquivoProjeto)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ProjetosConfig(AppConfig):
     name = 'projetos'
+
+    def ready(self):
+        # Registra os signals da versão do board, dos eventos em tempo real
+        # e da invalidação dos caches de usuário/acesso
+        from . import acesso, autenticacao, tempo_real, versao  # noqa: F401
@@ -0,0 +1,154 @@
+"""
+Arquivamento de projetos em "armazenamento frio".
+
+Arquivar move as colunas e cards do projeto para um snapshot comprimido
+(ArquivoProjeto: JSON + zlib, uma linha) e apaga as linhas das tabelas do
+board, que ficam só com os projetos ativos. Desarquivar recria tudo com
+bulk_create, com o criado_em original e ids novos (o snapshot pode ter
+vindo de outro banco pelo exportar_jsonl/importar_dados); o cliente recebe
+{'tipo': 'recarregar'} nas duas operações. Como as lápides dos ids antigos
+não voltam, desarquivar carimba Projeto.restaurado_em e o sync incremental
+manda recarregar qualquer cursor anterior.
+
+Projeto com execução de IA pendente ou em andamento num card não é
+arquivado (JobsEmAndamento); os jobs já terminados ficam, com o card
+desligado (JobIA.card é SET_NULL).
+
+O snapshot guarda todos os campos concretos de Coluna e Card (pelo
+_meta), então um campo novo entra sem mexer aqui; ao restaurar, campo que
+não existe mais é ignorado e campo novo fica no default.
+"""
+import datetime
+import json
+import zlib
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+
+from .importacao import datas_do_arquivo
+from .models import ArquivoProjeto, Card, Coluna, Projeto, Remocao
+from .tempo_real import publicar
+
+NIVEL_COMPRESSAO = 6
+FORMATO = 1
+
+
+class JobsEmAndamento(Exception):
+    """Há execuções de IA pendentes ou rodando nos cards do projeto."""
+
+
+class _Encoder(DjangoJSONEncoder):
+    # O DjangoJSONEncoder corta as datas em milissegundos; o snapshot guarda tudo
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _linha(objeto):
+    return {campo.attname: getattr(objeto, campo.attname) for campo in type(objeto)._meta.concrete_fields}
+
+
+def _restaurar(modelo, linhas, agora, **fixos):
+    campos = {campo.attname: campo for campo in modelo._meta.concrete_fields if not campo.primary_key}
+    for linha in linhas:
+        valores = {nome: campos[nome].to_python(valor) for nome, valor in linha.items() if nome in campos}
+        valores.update(fixos)
+        # atualizado_em = agora: o sync incremental de quem já tinha um cursor vê o board de volta
+        valores['atualizado_em'] = agora
+        yield modelo(**valores)
+
+
+def _snapshot(projeto):
+    """(bytes comprimidos, colunas, cards, tamanho original), lendo e comprimindo aos poucos."""
+    compressor = zlib.compressobj(NIVEL_COMPRESSAO)
+    partes, tamanho = [], 0
+
+    def escrever(texto):
+        nonlocal tamanho
+        dados = texto.encode()
+        tamanho += len(dados)
+        partes.append(compressor.compress(dados))
+
+    def escrever_lista(nome, queryset):
+        escrever(f'"{nome}": [')
+        total = 0
+        for objeto in queryset.iterator(chunk_size=2000):
+            escrever((',' if total else '') + json.dumps(_linha(objeto), cls=_Encoder))
+            total += 1
+        escrever(']')
+        return total
+
+    escrever('{')
+    colunas = escrever_lista('colunas', Coluna.objects.filter(projeto=projeto).order_by('pk'))
+    escrever(', ')
+    cards = escrever_lista('cards', Card.objects.filter(coluna__projeto=projeto).order_by('pk'))
+    escrever('}')
+    partes.append(compressor.flush())
+    return b''.join(partes), colunas, cards, tamanho
+
+
+def arquivar(projeto):
+    """Move colunas e cards para o snapshot e marca o projeto como arquivado."""
+    with transaction.atomic():
+        projeto = Projeto.objects.select_for_update().get(pk=projeto.pk)
+        if projeto.arquivado:
+            return projeto
+        JobIA = apps.get_model('ai_engine', 'JobIA')
+        if JobIA.objects.filter(
+            card__coluna__projeto=projeto, status__in=[JobIA.PENDENTE, JobIA.EXECUTANDO]
+        ).exists():
+            raise JobsEmAndamento('Há execuções de IA em andamento nos cards do projeto.')
+
+        dados, colunas, cards, tamanho = _snapshot(projeto)
+        ArquivoProjeto.objects.update_or_create(projeto=projeto, defaults={
+            'formato': FORMATO,
+            'dados': dados,
+            'total_colunas': colunas,
+            'total_cards': cards,
+            'tamanho_original': tamanho,
+        })
+
+        # origin=projeto: os signals tratam como cascata do projeto (sem lápide,
+        # versão ou evento por coluna/card); o aviso vai uma vez só, abaixo
+        coletor = Collector(using=router.db_for_write(Coluna), origin=projeto)
+        coletor.collect(Coluna.objects.filter(projeto=projeto))
+        coletor.delete()
+        Remocao.objects.filter(projeto=projeto).delete()
+
+        projeto.arquivado = True
+        projeto.save(update_fields=['arquivado'])  # sobe a versão (ETag)
+        publicar(projeto.pk, {'tipo': 'recarregar'})
+    return projeto
+
+
+def desarquivar(projeto):
+    """Recria colunas e cards do snapshot e reativa o projeto."""
+    with transaction.atomic():
+        projeto = Projeto.objects.select_for_update().get(pk=projeto.pk)
+        if not projeto.arquivado:
+            return projeto
+
+        arquivo = ArquivoProjeto.objects.filter(projeto=projeto).first()
+        if arquivo is not None:
+            dados = json.loads(zlib.decompress(arquivo.dados))
+            agora = timezone.now()
+            with datas_do_arquivo(Coluna, Card):
+                colunas = Coluna.objects.bulk_create(
+                    list(_restaurar(Coluna, dados['colunas'], agora, projeto_id=projeto.pk)), batch_size=1000
+                )
+                ids = {linha['id']: coluna.pk for linha, coluna in zip(dados['colunas'], colunas)}
+                cards = list(_restaurar(Card, dados['cards'], agora))
+                for card in cards:
+                    card.coluna_id = ids[card.coluna_id]
+                Card.objects.bulk_create(cards, batch_size=1000)
+            arquivo.delete()
+
+        projeto.arquivado = False
+        projeto.restaurado_em = timezone.now()
+        projeto.save(update_fields=['arquivado', 'restaurado_em'])
+        publicar(projeto.pk, {'tipo': 'recarregar'})
+    return projeto
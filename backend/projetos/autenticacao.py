@@ -0,0 +1,59 @@
+"""
+Autenticação JWT com o usuário em cache.
+
+O JWTAuthentication do simplejwt lê a linha do User a cada request. Aqui o
+usuário fica no cache do Django por AUTH_CACHE_TTL segundos, chaveado pelo
+id do token; salvar ou apagar o User apaga a entrada (signals abaixo).
+As verificações do simplejwt (usuário ativo, token revogado pela troca de
+senha) continuam valendo em todo request, com o usuário do cache.
+
+Só vale com cache compartilhado (REDIS_URL, ver settings): com o LocMem
+padrão, por processo, a invalidação de um processo não chegaria aos outros,
+então AUTH_CACHE_TTL fica 0 e o usuário é lido do banco a cada request.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def chave_usuario(user_id):
+    return f'auth:usuario:{user_id}'
+
+
+class JWTComCache(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if not settings.AUTH_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        chave = chave_usuario(user_id)
+        user = cache.get(chave)
+        if user is None:
+            # Usuário inexistente/inativo: o simplejwt levanta o erro e nada vai pro cache
+            user = super().get_user(validated_token)
+            cache.set(chave, user, settings.AUTH_CACHE_TTL)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _usuario_alterado(sender, instance, **kwargs):
+    cache.delete(chave_usuario(getattr(instance, api_settings.USER_ID_FIELD)))
@@ -0,0 +1,100 @@
+"""
+Exportação em streaming (JSON Lines) usada por `manage.py exportar_jsonl`.
+
+Uma linha por objeto, no formato do serializer 'jsonl' do Django (o mesmo
+do dumpdata), então o arquivo volta com `manage.py loaddata` (inclusive
+.jsonl.gz). Cada model é lido com .iterator(chunk_size) e escrito linha a
+linha: a memória fica no tamanho de um lote, não do banco.
+
+Escopo: tudo, alguns projetos ou os projetos de um usuário (dono ou
+membro). Com `desde`, só o que foi criado/alterado depois dele
+(atualizado_em em projetos, colunas e cards; criado_em/date_joined no resto,
+que não tem data de alteração) mais as lápides (Remocao) do que foi apagado.
+O projeto e a coluna de tudo o que sai no arquivo vão junto, mesmo sem
+mudança. O incremental é para o `loaddata` no mesmo banco que já tem o
+resto (os usuários e agentes antigos são referenciados, não exportados) e
+as lápides só registram as remoções: nem o loaddata nem o importar_dados
+as aplicam.
+"""
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.db.models import Exists, OuterRef, Q
+
+from ai_engine.models import AgenteIA
+
+from .acesso import projetos_acessiveis
+from .models import ArquivoProjeto, Card, Coluna, Projeto, Remocao
+
+Membro = Projeto.membros.through
+
+
+def _contando(objetos, contagem, rotulo):
+    for objeto in objetos:
+        contagem[rotulo] = contagem.get(rotulo, 0) + 1
+        yield objeto
+
+
+def conjuntos_a_exportar(projeto_ids=None, usuario=None, desde=None):
+    """
+    [(rótulo, queryset)] na ordem em que o loaddata precisa (usuários antes
+    dos projetos, projetos antes das colunas...).
+    """
+    projetos = Projeto.objects.all()
+    if usuario is not None:
+        projetos = projetos_acessiveis(usuario)
+    if projeto_ids:
+        projetos = projetos.filter(pk__in=projeto_ids)
+    escopo_total = usuario is None and not projeto_ids
+
+    usuarios = User.objects.all()
+    if not escopo_total:
+        # Só quem aparece nos projetos exportados (dono ou membro)
+        usuarios = usuarios.filter(
+            Q(Exists(projetos.filter(dono_id=OuterRef('pk'))))
+            | Q(Exists(Membro.objects.filter(user_id=OuterRef('pk'), projeto__in=projetos)))
+        )
+    colunas = Coluna.objects.filter(projeto__in=projetos)
+    cards = Card.objects.filter(coluna__projeto__in=projetos)
+    # Projetos arquivados: colunas e cards estão no snapshot (projetos/arquivamento.py)
+    arquivos = ArquivoProjeto.objects.filter(projeto__in=projetos)
+    agentes = AgenteIA.objects.all() if escopo_total else AgenteIA.objects.none()
+
+    remocoes = Remocao.objects.none()
+    if desde is not None:
+        usuarios = usuarios.filter(date_joined__gte=desde)
+        agentes = agentes.filter(criado_em__gte=desde)
+        cards = cards.filter(atualizado_em__gte=desde)
+        arquivos = arquivos.filter(arquivado_em__gte=desde)
+        remocoes = Remocao.objects.filter(projeto__in=projetos, removido_em__gte=desde)
+        # Os pais do que sai no arquivo vão junto (o loaddata precisa deles)
+        colunas = colunas.filter(Q(atualizado_em__gte=desde) | Q(pk__in=cards.values('coluna_id')))
+        projetos = projetos.filter(
+            Q(atualizado_em__gte=desde)
+            | Q(pk__in=colunas.values('projeto_id'))
+            | Q(pk__in=arquivos.values('projeto_id'))
+            | Q(pk__in=remocoes.values('projeto_id'))
+        )
+
+    return [
+        ('usuários', usuarios.prefetch_related('groups', 'user_permissions')),
+        ('agentes', agentes),
+        ('projetos', projetos.select_related('dono').prefetch_related('membros')),
+        ('colunas', colunas),
+        ('cards', cards),
+        ('arquivos', arquivos),
+        ('remoções', remocoes),
+    ]
+
+
+def exportar(stream, projeto_ids=None, usuario=None, desde=None, chunk_size=2000):
+    """Escreve o escopo pedido em `stream` (texto) e retorna {rótulo: linhas}."""
+    contagem = {}
+    serializer = serializers.get_serializer('jsonl')()
+    for rotulo, queryset in conjuntos_a_exportar(projeto_ids, usuario, desde):
+        serializer.serialize(
+            _contando(queryset.order_by('pk').iterator(chunk_size=chunk_size), contagem, rotulo),
+            stream=stream,
+            use_natural_foreign_keys=True,
+            use_natural_primary_keys=True,
+        )
+    return contagem
@@ -0,0 +1,290 @@
+"""
+Restauração em massa usada por `manage.py importar_dados`.
+
+Lê o JSON Lines do exportar_jsonl (.jsonl, .jsonl.gz, .jsonl.zst) ou o
+array do antigo backup_dados.json (dumpdata) objeto a objeto, sem carregar
+o arquivo, e grava em lotes com bulk_create (uma transação por lote), em vez
+do save() por objeto do loaddata.
+
+As chaves primárias são remapeadas: projetos, colunas, cards e agentes
+ganham ids novos e as referências (coluna -> projeto, card -> coluna)
+seguem os mapas de id antigo -> novo. Usuários são casados pelo username;
+os que já existem são reaproveitados, não sobrescritos. Lápides (Remocao) e
+models fora da lista são ignorados (os ids delas são do banco antigo).
+
+Datas (criado_em, atualizado_em) vêm do arquivo: auto_now/auto_now_add
+ficam desligados durante a importação. Como no loaddata, bulk_create não
+dispara signals (versão do board, tempo real).
+
+Checkpoint: depois de cada lote commitado, grava em disco quantos objetos
+do arquivo já entraram e os mapas de ids. Uma importação interrompida
+continua dali (os objetos já importados são lidos e pulados, não gravados
+de novo). Se o processo morrer entre o commit e a gravação do checkpoint,
+esse último lote entra duplicado na retomada.
+"""
+import gzip
+import io
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.utils import timezone
+
+from ai_engine.models import AgenteIA
+
+from .acesso import invalidar_acesso
+from .models import ArquivoProjeto, Card, Coluna, Projeto
+
+Membro = Projeto.membros.through
+
+# model do arquivo -> (classe, {campo FK: model do mapa que resolve a referência})
+MODELOS = {
+    'auth.user': (User, {}),
+    'ai_engine.agenteia': (AgenteIA, {}),
+    'projetos.projeto': (Projeto, {'dono': 'auth.user'}),
+    'projetos.coluna': (Coluna, {'projeto': 'projetos.projeto'}),
+    'projetos.card': (Card, {'coluna': 'projetos.coluna'}),
+    'projetos.arquivoprojeto': (ArquivoProjeto, {'projeto': 'projetos.projeto'}),
+}
+# Ninguém referencia estes: não precisam de mapa (o de cards seria o maior de todos)
+SEM_MAPA = {'projetos.card', 'projetos.arquivoprojeto'}
+
+ESPACOS = re.compile(r'[\s,]*')
+
+
+def abrir_entrada(caminho):
+    """(texto, arquivo bruto) conforme a extensão; o bruto serve para o progresso."""
+    bruto = open(caminho, 'rb')
+    if caminho.endswith('.gz'):
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=bruto), encoding='utf-8-sig'), bruto
+    if caminho.endswith('.zst'):
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(bruto), encoding='utf-8-sig'), bruto
+    return io.TextIOWrapper(bruto, encoding='utf-8-sig'), bruto
+
+
+def _objetos_do_array(arquivo, primeiro, bloco=1 << 20):
+    """Objetos de um array JSON (dumpdata) lidos aos pedaços, sem json.load do arquivo inteiro."""
+    decoder = json.JSONDecoder()
+    buffer, pos, acabou = primeiro, 0, False
+    pos = ESPACOS.match(buffer, pos).end() + 1  # pula o '['
+    while True:
+        pos = ESPACOS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            objeto, pos = decoder.raw_decode(buffer, pos)
+            yield objeto
+            continue
+        except json.JSONDecodeError:
+            if acabou:
+                if pos >= len(buffer):
+                    return
+                raise
+        pedaco = arquivo.read(bloco)
+        acabou = not pedaco
+        buffer, pos = buffer[pos:] + pedaco, 0
+
+
+def ler_objetos(arquivo, bloco=1 << 20):
+    """Objetos do arquivo, seja JSON Lines ou um array JSON."""
+    primeiro = arquivo.read(bloco)
+    if primeiro.lstrip().startswith('['):
+        yield from _objetos_do_array(arquivo, primeiro, bloco)
+        return
+    # O pedaço lido para detectar o formato pode ter cortado uma linha no meio
+    for linha in (primeiro + arquivo.readline()).splitlines():
+        if linha.strip():
+            yield json.loads(linha)
+    for linha in arquivo:
+        if linha.strip():
+            yield json.loads(linha)
+
+
+def datas_automaticas(modelo):
+    return [
+        campo for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+
+
+@contextmanager
+def datas_do_arquivo(*modelos):
+    """Desliga auto_now/auto_now_add para o bulk_create gravar as datas do arquivo."""
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos for campo in datas_automaticas(modelo)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def referencia(valor):
+    # Chave nos mapas (e no checkpoint, que é JSON): pk '12' ou chave natural '["ana"]'
+    return json.dumps(valor) if isinstance(valor, list) else str(valor)
+
+
+class Importador:
+    def __init__(self, lote=5000, checkpoint=None, progresso=None):
+        self.lote = lote
+        self.caminho_checkpoint = checkpoint
+        self.progresso = progresso or (lambda importador: None)
+        self.mapas = {modelo: {} for modelo in MODELOS if modelo not in SEM_MAPA}
+        self.processados = 0  # objetos do arquivo já resolvidos (importados ou ignorados)
+        self.contagem = {}
+        self.ignorados = 0
+        self._pendentes = []
+        self._modelo_pendente = None
+        # Datas automáticas ausentes no arquivo (backup antigo sem atualizado_em) = agora
+        self._datas = {
+            modelo: [campo.attname for campo in datas_automaticas(classe)]
+            for modelo, (classe, _) in MODELOS.items()
+        }
+        self.inicio = time.monotonic()
+
+    # --- checkpoint ---
+    def carregar_checkpoint(self):
+        if not self.caminho_checkpoint or not os.path.exists(self.caminho_checkpoint):
+            return False
+        with open(self.caminho_checkpoint, encoding='utf-8') as arquivo:
+            estado = json.load(arquivo)
+        self.processados = estado['processados']
+        self.contagem = estado['contagem']
+        self.ignorados = estado['ignorados']
+        self.mapas.update(estado['mapas'])
+        return True
+
+    def salvar_checkpoint(self):
+        if not self.caminho_checkpoint:
+            return
+        temporario = f'{self.caminho_checkpoint}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'processados': self.processados,
+                'contagem': self.contagem,
+                'ignorados': self.ignorados,
+                'mapas': self.mapas,
+            }, arquivo)
+        os.replace(temporario, self.caminho_checkpoint)
+
+    def apagar_checkpoint(self):
+        if self.caminho_checkpoint and os.path.exists(self.caminho_checkpoint):
+            os.remove(self.caminho_checkpoint)
+
+    # --- importação ---
+    def importar(self, objetos):
+        ja_feitos = self.processados
+        with datas_do_arquivo(*(classe for classe, _ in MODELOS.values())):
+            for indice, objeto in enumerate(objetos):
+                if indice < ja_feitos:
+                    continue  # retomada: já entrou antes do checkpoint
+                modelo = objeto.get('model')
+                if modelo != self._modelo_pendente or len(self._pendentes) >= self.lote:
+                    # Troca de model: grava os pais antes dos filhos
+                    self.gravar_lote()
+                self._modelo_pendente = modelo
+                self._pendentes.append(objeto)
+            self.gravar_lote()
+        self.apagar_checkpoint()
+        return self.contagem
+
+    def gravar_lote(self):
+        if not self._pendentes:
+            return
+        modelo, objetos = self._modelo_pendente, self._pendentes
+        self._pendentes = []
+        if modelo not in MODELOS:
+            self.ignorados += len(objetos)
+        else:
+            with transaction.atomic():
+                if modelo == 'auth.user':
+                    criados = self._gravar_usuarios(objetos)
+                else:
+                    criados = self._gravar(modelo, objetos)
+            self.contagem[modelo] = self.contagem.get(modelo, 0) + criados
+            self.ignorados += len(objetos) - criados
+        self.processados += len(objetos)
+        self.salvar_checkpoint()
+        self.progresso(self)
+
+    def _instancia(self, modelo, objeto):
+        """Instância (sem pk) com os campos do arquivo, ou None se um pai não foi importado."""
+        classe, chaves = MODELOS[modelo]
+        valores = {}
+        for nome, valor in objeto['fields'].items():
+            try:
+                campo = classe._meta.get_field(nome)
+            except FieldDoesNotExist:
+                continue  # campo que não existe mais no model
+            if campo.many_to_many:
+                continue
+            if nome in chaves:
+                if valor is not None:
+                    valor = self.mapas[chaves[nome]].get(referencia(valor))
+                    if valor is None:
+                        return None
+                valores[campo.attname] = valor
+            else:
+                valores[campo.attname] = campo.to_python(valor)
+        for nome in self._datas[modelo]:
+            if valores.get(nome) is None:
+                valores[nome] = timezone.now()
+        return classe(**valores)
+
+    def _gravar(self, modelo, objetos):
+        pares = [(objeto, self._instancia(modelo, objeto)) for objeto in objetos]
+        pares = [(objeto, instancia) for objeto, instancia in pares if instancia is not None]
+        classe = MODELOS[modelo][0]
+        classe.objects.bulk_create([instancia for _, instancia in pares], batch_size=self.lote)
+
+        if modelo in self.mapas:
+            mapa = self.mapas[modelo]
+            for objeto, instancia in pares:
+                mapa[referencia(objeto['pk'])] = instancia.pk
+        if modelo == 'projetos.projeto':
+            self._gravar_membros(pares)
+        return len(pares)
+
+    def _gravar_membros(self, pares):
+        usuarios = self.mapas['auth.user']
+        vinculos = [
+            Membro(projeto_id=instancia.pk, user_id=usuarios[referencia(membro)])
+            for objeto, instancia in pares
+            for membro in objeto['fields'].get('membros', [])
+            if referencia(membro) in usuarios
+        ]
+        Membro.objects.bulk_create(vinculos, batch_size=self.lote, ignore_conflicts=True)
+        # bulk_create não dispara os signals que limpam o cache de acesso
+        invalidar_acesso({instancia.dono_id for _, instancia in pares} | {v.user_id for v in vinculos})
+
+    def _gravar_usuarios(self, objetos):
+        # Casados pelo username: quem já existe é reaproveitado
+        nomes = [objeto['fields']['username'] for objeto in objetos]
+        existentes = dict(User.objects.filter(username__in=nomes).values_list('username', 'id'))
+        novos = [
+            self._instancia('auth.user', objeto) for objeto in objetos
+            if objeto['fields']['username'] not in existentes
+        ]
+        User.objects.bulk_create(novos, batch_size=self.lote)
+        ids = {**existentes, **{usuario.username: usuario.pk for usuario in novos}}
+
+        mapa = self.mapas['auth.user']
+        for objeto in objetos:
+            nome = objeto['fields']['username']
+            mapa[referencia([nome])] = ids[nome]
+            if 'pk' in objeto:
+                mapa[referencia(objeto['pk'])] = ids[nome]
+        return len(novos)
+
+    def velocidade(self):
+        return self.processados / max(time.monotonic() - self.inicio, 1e-9)
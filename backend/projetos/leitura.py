@@ -0,0 +1,137 @@
+"""
+Leitura rápida do board (só GET): dicts montados direto de linhas .values(),
+sem instanciar models nem passar pelos campos do ModelSerializer, que
+dominavam o tempo nos boards grandes.
+
+A saída é a mesma de ProjetoSerializer/ColunaSerializer/CardSerializer
+(mesmas chaves, na mesma ordem, datas no mesmo formato e fuso), incluindo
+a projeção ?fields=/?omit= dos cards e o limite de cards por coluna; os
+testes comparam as duas. Escrita e validação continuam nos serializers:
+um campo novo no serializer precisa entrar aqui também.
+
+Tempo por 10k cards: python -m benchmarks.serializacao
+"""
+from django.conf import settings
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+from .models import Card, Coluna
+from .paginacao import cursor_de
+from .projecao import campo_incluido, projecao_pedida, projetar_cards
+from .serializers import CardSerializer
+
+# Mesmo formato (e fuso) das datas que o DRF gera
+formatar_data = serializers.DateTimeField().to_representation
+
+CAMPOS_DATA = {'prazo', 'criado_em'}
+CHAVE_DA_COLUNA = {'coluna': 'coluna_id'}
+
+
+def campos_do_card(request):
+    """Campos do CardSerializer que a projeção do request deixa na saída."""
+    fields, omit = projecao_pedida(request)
+    return [
+        nome for nome in CardSerializer.Meta.fields
+        if campo_incluido(nome, fields, omit, extra=nome in CardSerializer.campos_extras)
+    ]
+
+
+def _linhas_de_cards(cards, request):
+    """(campos, linhas .values()) dos cards, sempre com id/ordem/coluna_id."""
+    campos = campos_do_card(request)
+    chaves = {CHAVE_DA_COLUNA.get(campo, campo) for campo in campos} | {'id', 'ordem', 'coluna_id'}
+    return campos, projetar_cards(cards, request).values(*chaves)
+
+
+def _montar_card(campos):
+    # Resolve chave e conversão de cada campo uma vez, não uma vez por card
+    plano = [(campo, CHAVE_DA_COLUNA.get(campo, campo), campo in CAMPOS_DATA) for campo in campos]
+
+    def montar(linha):
+        card = {}
+        for campo, chave, data in plano:
+            valor = linha[chave]
+            card[campo] = formatar_data(valor) if data else valor
+        return card
+    return montar
+
+
+def cards_em_dicts(cards, request):
+    """Como CardSerializer(cards, many=True).data, para um queryset de cards."""
+    campos, linhas = _linhas_de_cards(cards, request)
+    return list(map(_montar_card(campos), linhas))
+
+
+def colunas_em_dicts(colunas, request):
+    """
+    Como ColunaSerializer(many=True) com os primeiros BOARD_CARDS_POR_COLUNA
+    cards de cada coluna: 1 query para as colunas e 1 para os cards.
+    """
+    colunas = list(
+        colunas.annotate(total_cards=Count('cards'))
+        .values('id', 'titulo', 'ordem', 'cor', 'projeto_id', 'total_cards')
+    )
+    limite = settings.BOARD_CARDS_POR_COLUNA
+    campos, linhas = _linhas_de_cards(
+        Card.objects.filter(coluna_id__in=[coluna['id'] for coluna in colunas])
+        .annotate(posicao_na_coluna=Window(
+            RowNumber(), partition_by=F('coluna_id'), order_by=[F('ordem').asc(), F('id').asc()]
+        ))
+        .filter(posicao_na_coluna__lte=limite)
+        .order_by('ordem', 'id'),
+        request,
+    )
+
+    montar = _montar_card(campos)
+    por_coluna = {coluna['id']: [] for coluna in colunas}
+    ultimo = {}
+    for linha in linhas:
+        por_coluna[linha['coluna_id']].append(montar(linha))
+        ultimo[linha['coluna_id']] = linha
+
+    resultado = []
+    for coluna in colunas:
+        cards = por_coluna[coluna['id']]
+        proximo_cursor = None
+        if cards and coluna['total_cards'] > len(cards):
+            proximo_cursor = cursor_de(ultimo[coluna['id']]['ordem'], ultimo[coluna['id']]['id'])
+        resultado.append({
+            'id': coluna['id'],
+            'titulo': coluna['titulo'],
+            'ordem': coluna['ordem'],
+            'cor': coluna['cor'],
+            'cards': cards,
+            'total_cards': coluna['total_cards'],
+            'proximo_cursor': proximo_cursor,
+            'projeto': coluna['projeto_id'],
+        })
+    return resultado
+
+
+def board_em_dict(projetos, request):
+    """
+    Como ProjetoSerializer para o board (None se o projeto não existe).
+    `projetos`: queryset filtrado no projeto e anotado com num_membros.
+    """
+    projeto = (
+        projetos.annotate(nome_dono=F('dono__username'))
+        .values('id', 'titulo', 'descricao', 'arquivado', 'criado_em', 'dono_id', 'nome_dono', 'num_membros')
+        .first()
+    )
+    if projeto is None:
+        return None
+
+    colunas = Coluna.objects.filter(projeto_id=projeto['id']).order_by('ordem', 'id')
+    return {
+        'id': projeto['id'],
+        'titulo': projeto['titulo'],
+        'descricao': projeto['descricao'],
+        'arquivado': projeto['arquivado'],
+        'criado_em': formatar_data(projeto['criado_em']),
+        'colunas': colunas_em_dicts(colunas, request),
+        'dono': projeto['dono_id'],
+        'nome_dono': projeto['nome_dono'],
+        'is_dono': projeto['dono_id'] == request.user.id,
+        'total_membros': projeto['num_membros'] + 1,
+    }
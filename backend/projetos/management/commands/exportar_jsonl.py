@@ -0,0 +1,106 @@
+import gzip
+import io
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from projetos.exportacao import exportar
+
+EXTENSOES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def ler_data(texto):
+    """'2026-01-31' ou '2026-01-31T12:00:00Z' -> datetime com fuso."""
+    momento = parse_datetime(texto)
+    if momento is None:
+        dia = parse_date(texto)
+        if dia is None:
+            raise CommandError(f"Data inválida em --desde: {texto!r}")
+        momento = timezone.datetime.combine(dia, timezone.datetime.min.time())
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def abrir_saida(caminho, compressao):
+    if compressao == 'gzip':
+        return gzip.open(caminho, 'wt', encoding='utf-8')
+    if compressao == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError("Compressão zstd precisa do pacote 'zstandard' (pip install zstandard).")
+        escritor = zstandard.ZstdCompressor().stream_writer(open(caminho, 'wb'))
+        return io.TextIOWrapper(escritor, encoding='utf-8')
+    return open(caminho, 'w', encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta os dados em JSON Lines (um objeto por linha, em streaming), opcionalmente "
+        "comprimido. Ex: python manage.py exportar_jsonl --saida backup.jsonl.gz --usuario ana"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--saida', default='backup_dados.jsonl.gz',
+            help='Arquivo de saída. A extensão .gz/.zst escolhe a compressão.',
+        )
+        parser.add_argument(
+            '--compressao', choices=['auto', 'nenhuma', 'gzip', 'zstd'], default='auto',
+            help="'auto' decide pela extensão do arquivo.",
+        )
+        parser.add_argument(
+            '--projeto', type=int, action='append', dest='projetos',
+            help='Exporta só este projeto (pode repetir).',
+        )
+        parser.add_argument('--usuario', help='Exporta só os projetos deste usuário (dono ou membro).')
+        parser.add_argument(
+            '--desde',
+            help=(
+                'Incremental: só o criado/alterado a partir desta data (ISO), mais as remoções. '
+                'Carregue com loaddata no mesmo banco da exportação anterior; as remoções vão '
+                'como lápides e não são aplicadas (nem pelo loaddata nem pelo importar_dados).'
+            ),
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Linhas lidas do banco por lote.')
+
+    def handle(self, *args, **options):
+        caminho = options['saida']
+        compressao = options['compressao']
+        if compressao == 'auto':
+            compressao = EXTENSOES.get(os.path.splitext(caminho)[1], 'nenhuma')
+
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"Usuário {options['usuario']!r} não encontrado.")
+        desde = ler_data(options['desde']) if options['desde'] else None
+
+        # Começo da exportação: o --desde da próxima rodada incremental
+        inicio = timezone.now()
+        # Grava num arquivo temporário: uma exportação que falha no meio não
+        # sobrescreve o backup anterior
+        parcial = f'{caminho}.parcial'
+        try:
+            with abrir_saida(parcial, compressao) as stream:
+                contagem = exportar(
+                    stream,
+                    projeto_ids=options['projetos'],
+                    usuario=usuario,
+                    desde=desde,
+                    chunk_size=max(1, options['chunk_size']),
+                )
+            os.replace(parcial, caminho)
+        except BaseException:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+            raise
+
+        resumo = ', '.join(f'{total} {rotulo}' for rotulo, total in contagem.items()) or 'nada'
+        self.stdout.write(f"✅ '{caminho}' ({compressao}): {resumo}.")
+        self.stdout.write(f"Próxima exportação incremental: --desde {inicio.isoformat()}")
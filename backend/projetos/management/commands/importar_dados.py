@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projetos.importacao import Importador, abrir_entrada, ler_objetos
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaura um backup (JSON Lines do exportar_jsonl, .gz/.zst, ou o backup_dados.json antigo) "
+        "em lotes com bulk_create. Ex: python manage.py importar_dados backup.jsonl.gz"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--lote', type=int, default=5000, help='Objetos por bulk_create/transação.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Arquivo de checkpoint para retomar (padrão: <arquivo>.checkpoint).',
+        )
+        parser.add_argument(
+            '--recomecar', action='store_true',
+            help='Ignora um checkpoint existente e importa desde o início.',
+        )
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        if not os.path.exists(caminho):
+            raise CommandError(f"Arquivo {caminho!r} não encontrado.")
+        tamanho = os.path.getsize(caminho) or 1
+        checkpoint = options['checkpoint'] or f'{caminho}.checkpoint'
+        if options['recomecar'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        try:
+            texto, bruto = abrir_entrada(caminho)
+        except ImportError:
+            raise CommandError("Arquivo .zst precisa do pacote 'zstandard' (pip install zstandard).")
+
+        ultimo = [0.0]
+
+        def progresso(importador):
+            # No máximo uma linha a cada 2s (um lote pode levar milissegundos)
+            if time.monotonic() - ultimo[0] < 2:
+                return
+            ultimo[0] = time.monotonic()
+            lido = bruto.tell() / tamanho * 100
+            self.stdout.write(
+                f"  {lido:5.1f}% | {importador.processados} objetos | {importador.velocidade():.0f}/s"
+            )
+
+        importador = Importador(lote=max(1, options['lote']), checkpoint=checkpoint, progresso=progresso)
+        if importador.carregar_checkpoint():
+            self.stdout.write(f"↩️  Retomando do checkpoint: {importador.processados} objetos já importados.")
+
+        self.stdout.write(f"📥 Importando '{caminho}'...")
+        with texto:
+            contagem = importador.importar(ler_objetos(texto))
+
+        resumo = ', '.join(f'{total} {modelo}' for modelo, total in contagem.items()) or 'nada'
+        self.stdout.write(f"✅ Importados: {resumo} ({importador.ignorados} ignorados).")
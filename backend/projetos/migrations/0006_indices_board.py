@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0005_projeto_arquivado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['coluna', 'ordem'], name='card_coluna_ordem_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('prazo__isnull', False)), fields=['prazo'], name='card_prazo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coluna',
+            index=models.Index(fields=['projeto', 'ordem'], name='coluna_projeto_ordem_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(condition=models.Q(('arquivado', False)), fields=['dono', 'id'], name='projeto_ativo_dono_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(condition=models.Q(('arquivado', False)), fields=['id'], name='projeto_ativo_idx'),
+        ),
+    ]
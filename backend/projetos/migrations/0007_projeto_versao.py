@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0006_indices_board'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='versao',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
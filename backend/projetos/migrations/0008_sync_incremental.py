@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0007_projeto_versao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Remocao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('card', 'Card'), ('coluna', 'Coluna')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('removido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='coluna',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['coluna', 'atualizado_em'], name='card_coluna_atualizado_idx'),
+        ),
+        migrations.AddField(
+            model_name='remocao',
+            name='projeto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='remocoes', to='projetos.projeto'),
+        ),
+        migrations.AddIndex(
+            model_name='remocao',
+            index=models.Index(fields=['projeto', 'removido_em'], name='remocao_projeto_data_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0008_sync_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoProjeto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.PositiveSmallIntegerField(default=1)),
+                ('dados', models.BinaryField()),
+                ('total_colunas', models.PositiveIntegerField(default=0)),
+                ('total_cards', models.PositiveIntegerField(default=0)),
+                ('tamanho_original', models.PositiveBigIntegerField(default=0)),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('projeto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='arquivo', to='projetos.projeto')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0009_arquivo_projeto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='restaurado_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0010_projeto_restaurado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projeto',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
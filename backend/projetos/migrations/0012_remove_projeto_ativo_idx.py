@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projetos', '0011_projeto_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='projeto',
+            name='projeto_ativo_idx',
+        ),
+    ]
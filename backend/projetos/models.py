@@ -8,6 +8,18 @@ class Projeto(models.Model):
     membros = models.ManyToManyField(User, related_name='projetos_membro', blank=True)
     arquivado = models.BooleanField(default=False)
     criado_em = models.DateTimeField(auto_now_add=True)
+    # Sobe a cada mudança no board (projetos/versao.py); vira o ETag do retrieve
+    versao = models.PositiveBigIntegerField(default=0, editable=False)
+    # Renomear, mudar membros ou o board (incrementar_versao): exportar_jsonl --desde
+    atualizado_em = models.DateTimeField(auto_now=True)
+    # Último desarquivamento: cursor de sync anterior a ele tem de recarregar o board
+    restaurado_em = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Parcial: "meus projetos ativos" (dono) sem passar pelos arquivados
+            models.Index(fields=['dono', 'id'], name='projeto_ativo_dono_idx', condition=models.Q(arquivado=False)),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -18,6 +30,14 @@ class Coluna(models.Model):
     ordem = models.IntegerField(default=0)
     # NOVA: Cor da coluna (Hexadecimal)
     cor = models.CharField(max_length=7, default='#F1F5F9') # Cinza pastel padrão
+    # Carimbo de mudança para o sync incremental (workspaces/<id>/mudancas/)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Board: colunas de um projeto já na ordem de exibição
+            models.Index(fields=['projeto', 'ordem'], name='coluna_projeto_ordem_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.projeto.titulo}"
@@ -36,5 +56,50 @@ class Card(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Board / mover: cards de uma coluna na ordem de exibição
+            models.Index(fields=['coluna', 'ordem'], name='card_coluna_ordem_idx'),
+            # Sync incremental: cards de uma coluna alterados desde o cursor
+            models.Index(fields=['coluna', 'atualizado_em'], name='card_coluna_atualizado_idx'),
+            # Atrasados / prazos: só os cards que têm prazo
+            models.Index(fields=['prazo'], name='card_prazo_idx', condition=models.Q(prazo__isnull=False)),
+        ]
+
+    def __str__(self):
+        return self.titulo
+
+class Remocao(models.Model):
+    """Lápide de um card/coluna apagado, para o sync incremental avisar o cliente."""
+    CARD = 'card'
+    COLUNA = 'coluna'
+    TIPOS = [(CARD, 'Card'), (COLUNA, 'Coluna')]
+
+    projeto = models.ForeignKey(Projeto, on_delete=models.CASCADE, related_name='remocoes')
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    objeto_id = models.BigIntegerField()
+    removido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['projeto', 'removido_em'], name='remocao_projeto_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id} ({self.projeto_id})"
+
+class ArquivoProjeto(models.Model):
+    """
+    Snapshot comprimido das colunas e cards de um projeto arquivado
+    (projetos/arquivamento.py): uma linha só, fora das tabelas do board.
+    """
+    projeto = models.OneToOneField(Projeto, on_delete=models.CASCADE, related_name='arquivo')
+    formato = models.PositiveSmallIntegerField(default=1)
+    dados = models.BinaryField()  # JSON comprimido com zlib
+    total_colunas = models.PositiveIntegerField(default=0)
+    total_cards = models.PositiveIntegerField(default=0)
+    tamanho_original = models.PositiveBigIntegerField(default=0)  # bytes do JSON antes da compressão
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return self.titulo
\ No newline at end of file
+        return f"Arquivo de {self.projeto_id} ({self.total_cards} cards)"
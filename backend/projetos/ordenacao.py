@@ -0,0 +1,213 @@
+"""
+Ordenação esparsa dos cards dentro de uma coluna.
+
+Em vez de numerar os cards 0, 1, 2... (o que obriga a regravar a coluna
+inteira a cada drag & drop), o campo `ordem` guarda inteiros espaçados
+(0, 1024, 2048...). Mover um card grava só ele, com o ponto médio entre os
+vizinhos. Quando não sobra espaço entre dois vizinhos, a coluna é
+renumerada de uma vez com bulk_update.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Card, Coluna
+from .sincronizacao import registrar_troca_de_projeto
+from .tempo_real import publicar, publicar_cards
+from .versao import incrementar_versao
+
+ESPACAMENTO = 1024
+
+# Limites do IntegerField (signed 32 bits) usado em Card.ordem
+ORDEM_MINIMA = -(2 ** 31)
+ORDEM_MAXIMA = 2 ** 31 - 1
+
+
+def _ordens_da_coluna(coluna_id, excluir_id=None):
+    queryset = Card.objects.filter(coluna_id=coluna_id)
+    if excluir_id is not None:
+        queryset = queryset.exclude(pk=excluir_id)
+    return queryset.order_by('ordem', 'id').values_list('ordem', flat=True)
+
+
+def proxima_ordem(coluna_id):
+    """Ordem para um card novo no fim da coluna (lê só a maior ordem)."""
+    ultima = _ordens_da_coluna(coluna_id).reverse().first()
+    if ultima is None:
+        return 0
+    if ultima + ESPACAMENTO > ORDEM_MAXIMA:
+        rebalancear_coluna(coluna_id)
+        return proxima_ordem(coluna_id)
+    return ultima + ESPACAMENTO
+
+
+def ordem_entre(anterior, posterior):
+    """
+    Calcula uma ordem entre dois vizinhos (None = ponta da coluna).
+    Retorna None quando não há espaço e a coluna precisa ser rebalanceada.
+    """
+    if anterior is None and posterior is None:
+        return 0
+    if anterior is None:
+        nova = posterior - ESPACAMENTO
+    elif posterior is None:
+        nova = anterior + ESPACAMENTO
+    elif posterior - anterior < 2:
+        return None
+    else:
+        nova = (anterior + posterior) // 2
+
+    if not ORDEM_MINIMA <= nova <= ORDEM_MAXIMA:
+        return None
+    return nova
+
+
+def vizinhos(coluna_id, posicao, excluir_id=None):
+    """Retorna (ordem_anterior, ordem_posterior) para inserir na `posicao`."""
+    ordens = _ordens_da_coluna(coluna_id, excluir_id)
+    if posicao <= 0:
+        return None, ordens.first()
+
+    # Lê no máximo 2 valores em volta da posição desejada
+    par = list(ordens[posicao - 1:posicao + 1])
+    if not par:
+        # Posição além do fim: entra depois do último card
+        return ordens.reverse().first(), None
+    if len(par) == 1:
+        return par[0], None
+    return par[0], par[1]
+
+
+def rebalancear_coluna(coluna_id, excluir_id=None):
+    """Renumera a coluna com espaçamento uniforme, em lote."""
+    cards = list(
+        Card.objects.filter(coluna_id=coluna_id)
+        .exclude(pk=excluir_id)
+        .order_by('ordem', 'id')
+        .only('id', 'ordem')
+    )
+    agora = timezone.now()
+    for index, card in enumerate(cards):
+        card.ordem = index * ESPACAMENTO
+        card.atualizado_em = agora  # bulk_update não aplica auto_now (sync incremental)
+    Card.objects.bulk_update(cards, ['ordem', 'atualizado_em'], batch_size=500)
+    publicar_cards('cards.movidos', cards, ['coluna', 'ordem'])
+    return cards
+
+
+def _registrar_trocas_de_projeto(movidos, projeto_das_colunas):
+    """
+    `movidos` é [(card, coluna_origem)]. O save()/bulk_update só avisa o
+    board de destino: quem foi para outro projeto deixa lápide, versão nova
+    e evento de remoção no projeto de origem.
+    """
+    trocas = [
+        (card.pk, projeto_das_colunas[coluna_origem], projeto_das_colunas[card.coluna_id])
+        for card, coluna_origem in movidos
+        if projeto_das_colunas[coluna_origem] != projeto_das_colunas[card.coluna_id]
+    ]
+    if not trocas:
+        return
+    registrar_troca_de_projeto(trocas)
+    por_origem = {}
+    for card_id, origem, _ in trocas:
+        por_origem.setdefault(origem, []).append(card_id)
+    incrementar_versao(projeto_ids=list(por_origem))
+    for origem, card_ids in por_origem.items():
+        publicar(origem, {'tipo': 'card.removido', 'removidos': {'colunas': [], 'cards': card_ids}})
+
+
+def posicionar_card(card, coluna_id, posicao):
+    """
+    Coloca o card na `posicao` da coluna gravando apenas o próprio card.
+    Deve rodar dentro de uma transação.
+    """
+    anterior, posterior = vizinhos(coluna_id, posicao, card.pk)
+    nova_ordem = ordem_entre(anterior, posterior)
+
+    if nova_ordem is None:
+        # Acabou o espaço entre os vizinhos: abre espaço na coluna toda
+        rebalancear_coluna(coluna_id, excluir_id=card.pk)
+        anterior, posterior = vizinhos(coluna_id, posicao, card.pk)
+        nova_ordem = ordem_entre(anterior, posterior)
+
+    coluna_origem = card.coluna_id
+    card.coluna_id = coluna_id
+    card.ordem = nova_ordem
+    card.save(update_fields=['coluna', 'ordem', 'atualizado_em'])
+    if coluna_origem != coluna_id:
+        projeto_das_colunas = dict(
+            Coluna.objects.filter(pk__in=[coluna_origem, coluna_id]).values_list('id', 'projeto_id')
+        )
+        _registrar_trocas_de_projeto([(card, coluna_origem)], projeto_das_colunas)
+    return card
+
+
+def _ordem_na_lista(cards, posicao):
+    """Ordem para cards[posicao] entre os vizinhos da lista (renumera a lista se não couber)."""
+    anterior = cards[posicao - 1].ordem if posicao > 0 else None
+    posterior = cards[posicao + 1].ordem if posicao + 1 < len(cards) else None
+    nova_ordem = ordem_entre(anterior, posterior)
+    if nova_ordem is None:
+        # Mesmo critério do posicionar_card: sem espaço, renumera a coluna toda
+        for index, card in enumerate(cards):
+            card.ordem = index * ESPACAMENTO
+        return cards[posicao].ordem
+    return nova_ordem
+
+
+def aplicar_movimentos(movimentos):
+    """
+    Aplica vários movimentos de uma vez (multi-seleção / limpeza de coluna).
+
+    `movimentos` é uma lista de dicts {card_id, coluna_id, nova_posicao},
+    aplicados na ordem recebida. Como no posicionar_card, cada card movido
+    ganha uma ordem entre os vizinhos (ordenacao esparsa); a coluna só é
+    renumerada quando acaba o espaço. Só as linhas que mudaram vão para um
+    único bulk_update.
+    Retorna {coluna_id: [cards ordenados]} de cada coluna tocada.
+    """
+    card_ids = {m['card_id'] for m in movimentos}
+    # Colunas de origem (as dos cards) e de destino, com o projeto de cada uma
+    projeto_das_colunas = dict(
+        Coluna.objects.filter(Q(cards__pk__in=card_ids) | Q(pk__in={m['coluna_id'] for m in movimentos}))
+        .values_list('id', 'projeto_id')
+    )
+    colunas_tocadas = set(projeto_das_colunas)
+
+    cards = list(
+        Card.objects.filter(coluna_id__in=colunas_tocadas)
+        .order_by('ordem', 'id')
+        .only('id', 'coluna_id', 'ordem')
+    )
+    agora = timezone.now()
+    por_id = {card.pk: card for card in cards}
+    originais = {card.pk: (card.coluna_id, card.ordem) for card in cards}
+    colunas = {coluna_id: [] for coluna_id in colunas_tocadas}
+    for card in cards:
+        colunas[card.coluna_id].append(card)
+
+    for movimento in movimentos:
+        card = por_id[movimento['card_id']]
+        colunas[card.coluna_id].remove(card)
+        destino = colunas[movimento['coluna_id']]
+        posicao = min(movimento['nova_posicao'], len(destino))
+        destino.insert(posicao, card)
+        card.coluna_id = movimento['coluna_id']
+        card.ordem = _ordem_na_lista(destino, posicao)
+
+    alterados = []
+    for cards_da_coluna in colunas.values():
+        for card in cards_da_coluna:
+            if (card.coluna_id, card.ordem) != originais[card.pk]:
+                card.atualizado_em = agora
+                alterados.append(card)
+
+    Card.objects.bulk_update(alterados, ['coluna', 'ordem', 'atualizado_em'], batch_size=500)
+    # bulk_update não dispara signals
+    incrementar_versao(coluna_ids=colunas_tocadas)
+    publicar_cards('cards.movidos', alterados, ['coluna', 'ordem'])
+    _registrar_trocas_de_projeto(
+        [(card, originais[card.pk][0]) for card in alterados if card.coluna_id != originais[card.pk][0]],
+        projeto_das_colunas,
+    )
+    return colunas
@@ -0,0 +1,50 @@
+"""
+Paginação dos cards de uma coluna por keyset em (ordem, id).
+
+O board traz só os primeiros BOARD_CARDS_POR_COLUNA cards de cada coluna
+e, quando há mais, um `proximo_cursor` por coluna. O resto vem de
+GET cards/pagina/?coluna=<id>&cursor=<cursor>, página a página.
+
+Keyset em vez de OFFSET: a página seguinte começa logo depois do último
+card visto (pelo índice coluna+ordem), então o custo não cresce com a
+posição na coluna e um card inserido no meio não desloca as páginas.
+"""
+import base64
+
+from django.db.models import Q
+
+
+def codificar_cursor(card):
+    """Cursor opaco que aponta para logo depois do card."""
+    return cursor_de(card.ordem, card.pk)
+
+
+def cursor_de(ordem, pk):
+    return base64.urlsafe_b64encode(f'{ordem}:{pk}'.encode()).decode()
+
+
+def decodificar_cursor(texto):
+    """(ordem, id) do cursor; ValueError se inválido."""
+    try:
+        ordem, pk = base64.urlsafe_b64decode(texto.encode()).decode().split(':')
+        return int(ordem), int(pk)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def depois_do_cursor(queryset, cursor):
+    ordem, pk = decodificar_cursor(cursor)
+    return queryset.filter(Q(ordem__gt=ordem) | Q(ordem=ordem, pk__gt=pk))
+
+
+def pagina_de_cards(queryset, cursor=None, limite=50):
+    """Uma página de cards em (ordem, id). Retorna (cards, proximo_cursor ou None)."""
+    queryset = queryset.order_by('ordem', 'id')
+    if cursor:
+        queryset = depois_do_cursor(queryset, cursor)
+    # Um a mais para saber se existe próxima página sem um COUNT
+    cards = list(queryset[:limite + 1])
+    if len(cards) <= limite:
+        return cards, None
+    cards = cards[:limite]
+    return cards, codificar_cursor(cards[-1])
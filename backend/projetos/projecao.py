@@ -0,0 +1,58 @@
+"""
+Projeção dos campos do card: ?fields=id,titulo,prazo ou ?omit=prompt_refinado.
+
+Vale para o CardSerializer onde quer que ele apareça num GET (cards/, board,
+colunas, cards/pagina/ e mudancas/). Os textos grandes que ficam de fora
+(conteudo_original e prompt_refinado, saídas da IA com vários KB) também
+saem do SELECT (defer), então nem são lidos do banco.
+
+Para o board, que só mostra um trecho da descrição e se o card já foi
+refinado, há dois campos extras que só vêm quando pedidos em ?fields=:
+`resumo` (começo do conteudo_original, cortado no SQL) e `refinado`
+(booleano). O texto inteiro fica para o GET cards/<id>/, ao abrir o card.
+"""
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Left
+
+CAMPOS_GRANDES = ('conteudo_original', 'prompt_refinado')
+TAMANHO_RESUMO = 200
+
+
+def _lista(texto):
+    return {campo.strip() for campo in (texto or '').split(',') if campo.strip()}
+
+
+def projecao_pedida(request):
+    """
+    (fields, omit) da query string. fields None = campos padrão. Só em
+    leitura: num POST/PATCH os campos do serializer também são a entrada.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, set()
+    fields = _lista(request.query_params.get('fields'))
+    return (fields or None), _lista(request.query_params.get('omit'))
+
+
+def campo_incluido(nome, fields, omit, extra=False):
+    if nome == 'id':
+        return True  # sem o id o cliente não tem como aplicar o card
+    if nome in omit:
+        return False
+    if fields is None:
+        return not extra
+    return nome in fields
+
+
+def projetar_cards(cards, request):
+    """Tira do SELECT os textos grandes fora da projeção e anota os extras pedidos."""
+    fields, omit = projecao_pedida(request)
+    if fields is None and not omit:
+        return cards
+    if campo_incluido('resumo', fields, omit, extra=True):
+        cards = cards.annotate(resumo=Left('conteudo_original', TAMANHO_RESUMO))
+    if campo_incluido('refinado', fields, omit, extra=True):
+        cards = cards.annotate(refinado=ExpressionWrapper(
+            Q(prompt_refinado__isnull=False) & ~Q(prompt_refinado=''), output_field=BooleanField()
+        ))
+    adiados = [campo for campo in CAMPOS_GRANDES if not campo_incluido(campo, fields, omit)]
+    return cards.defer(*adiados) if adiados else cards
@@ -1,9 +1,20 @@
+from django.conf import settings
 from rest_framework import serializers
+
+from core.metricas import ListaMedida, SerializacaoMedida
 from .models import Projeto, Coluna, Card
+from .paginacao import codificar_cursor
+from .projecao import TAMANHO_RESUMO, campo_incluido, projecao_pedida
+
+class CardSerializer(SerializacaoMedida, serializers.ModelSerializer):
+    # Extras do board: só vêm quando pedidos em ?fields= (ver projecao.py)
+    resumo = serializers.SerializerMethodField()
+    refinado = serializers.SerializerMethodField()
+    campos_extras = ('resumo', 'refinado')
 
-class CardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Card
+        list_serializer_class = ListaMedida  # tempo de serialização (core/metricas.py)
         # Listamos explicitamente para garantir que os novos campos venham na API
         fields = [
             'id', 
@@ -13,17 +24,88 @@ class CardSerializer(serializers.ModelSerializer):
             'ordem', 
             'prazo',             # Novo campo
             'coluna', 
-            'criado_em'
+            'criado_em',
+            'resumo',
+            'refinado',
         ]
 
-class ColunaSerializer(serializers.ModelSerializer):
-    cards = CardSerializer(many=True, read_only=True)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Projeção ?fields= / ?omit= do GET
+        fields, omit = projecao_pedida(self.context.get('request'))
+        for nome in list(self.fields):
+            if not campo_incluido(nome, fields, omit, extra=nome in self.campos_extras):
+                self.fields.pop(nome)
+
+    def update(self, instance, validated_data):
+        # Grava só os campos que mudaram: o evento do tempo real (tempo_real.py) leva só eles
+        alterados = []
+        for nome, valor in validated_data.items():
+            campo = Card._meta.get_field(nome)
+            novo = valor.pk if campo.is_relation and valor is not None else valor
+            if getattr(instance, campo.attname) != novo:
+                setattr(instance, campo.attname, novo)
+                alterados.append(campo.name)
+        if alterados:
+            instance.save(update_fields=alterados + ['atualizado_em'])
+        return instance
+
+    def get_resumo(self, obj):
+        # Anotado no SQL por projetar_cards(); sem a anotação, corta aqui
+        resumo = getattr(obj, 'resumo', None)
+        return resumo if resumo is not None else (obj.conteudo_original or '')[:TAMANHO_RESUMO]
+
+    def get_refinado(self, obj):
+        refinado = getattr(obj, 'refinado', None)
+        return refinado if refinado is not None else bool(obj.prompt_refinado)
+
+class MovimentoCardSerializer(serializers.Serializer):
+    """Um item do 'mover em lote': { card_id, coluna_id, nova_posicao }"""
+    card_id = serializers.IntegerField()
+    coluna_id = serializers.IntegerField()
+    nova_posicao = serializers.IntegerField(min_value=0)
+
+class ColunaSerializer(SerializacaoMedida, serializers.ModelSerializer):
+    # Só os primeiros cards (ver views.primeiros_cards); o resto por cards/pagina/
+    cards = serializers.SerializerMethodField()
+    total_cards = serializers.SerializerMethodField()
+    proximo_cursor = serializers.SerializerMethodField()
+
     class Meta:
         model = Coluna
+        list_serializer_class = ListaMedida
         # Adicionado 'cor' na lista de campos
-        fields = ['id', 'titulo', 'ordem', 'cor', 'cards', 'projeto']
+        fields = ['id', 'titulo', 'ordem', 'cor', 'cards', 'total_cards', 'proximo_cursor', 'projeto']
+
+    def _primeiros_cards(self, obj):
+        cards = getattr(obj, 'primeiros_cards', None)
+        if cards is None:
+            # Sem o prefetch (ex: resposta do create)
+            cards = list(obj.cards.order_by('ordem', 'id')[:settings.BOARD_CARDS_POR_COLUNA])
+            obj.primeiros_cards = cards
+        return cards
+
+    def get_cards(self, obj):
+        return CardSerializer(self._primeiros_cards(obj), many=True, context=self.context).data
+
+    def get_total_cards(self, obj):
+        total = getattr(obj, 'total_cards', None)
+        return len(self._primeiros_cards(obj)) if total is None else total
+
+    def get_proximo_cursor(self, obj):
+        cards = self._primeiros_cards(obj)
+        if not cards or self.get_total_cards(obj) <= len(cards):
+            return None
+        return codificar_cursor(cards[-1])
+
+class ColunaSemCardsSerializer(SerializacaoMedida, serializers.ModelSerializer):
+    """Coluna sem os cards aninhados (sync incremental manda os cards à parte)."""
+    class Meta:
+        model = Coluna
+        list_serializer_class = ListaMedida
+        fields = ['id', 'titulo', 'ordem', 'cor', 'projeto']
 
-class ProjetoSerializer(serializers.ModelSerializer):
+class ProjetoSerializer(SerializacaoMedida, serializers.ModelSerializer):
     colunas = ColunaSerializer(many=True, read_only=True)
     
     is_dono = serializers.SerializerMethodField()
@@ -32,6 +114,7 @@ class ProjetoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Projeto
+        list_serializer_class = ListaMedida
         fields = [
             'id', 
             'titulo', 
@@ -44,14 +127,45 @@ class ProjetoSerializer(serializers.ModelSerializer):
             'is_dono',
             'total_membros'
         ]
-        read_only_fields = ['dono']
+        # arquivado muda só por workspaces/<id>/arquivar/ e desarquivar/ (move os dados)
+        read_only_fields = ['dono', 'arquivado']
 
     def get_is_dono(self, obj):
         try:
             user = self.context['request'].user
-            return obj.dono == user
+            # Compara pelo id para não buscar o dono de novo no banco
+            return obj.dono_id == user.id
         except:
             return False
 
     def get_total_membros(self, obj):
-        return obj.membros.count() + 1
\ No newline at end of file
+        # Usa a contagem anotada pelo ViewSet quando disponível (evita N+1)
+        num_membros = getattr(obj, 'num_membros', None)
+        if num_membros is None:
+            num_membros = obj.membros.count()
+        return num_membros + 1
+
+class ProjetoResumoSerializer(ProjetoSerializer):
+    """
+    Versão enxuta para a listagem do Dashboard: sem colunas/cards.
+    Os contadores vêm anotados pelo ProjetoViewSet (calculados no SQL).
+    """
+    total_cards = serializers.IntegerField(read_only=True)
+    cards_atrasados = serializers.IntegerField(read_only=True)
+    ultima_atividade = serializers.DateTimeField(read_only=True)
+
+    class Meta(ProjetoSerializer.Meta):
+        fields = [
+            'id', 
+            'titulo', 
+            'descricao', 
+            'arquivado', 
+            'criado_em', 
+            'dono', 
+            'nome_dono', 
+            'is_dono',
+            'total_membros',
+            'total_cards',
+            'cards_atrasados',
+            'ultima_atividade'
+        ]
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Sync incremental do board: GET workspaces/<id>/mudancas/?desde=<cursor>.
+
+O cliente guarda o cursor que veio com o board (ou com o último sync) e
+pede só o que mudou depois dele: colunas e cards com atualizado_em novo
+(criados, editados ou movidos) e as lápides (Remocao) do que foi apagado.
+
+O cursor é o instante em que o servidor *começou* a ler. Como atualizado_em
+é carimbado no save() e a transação só aparece no commit, a consulta volta
+BOARD_SYNC_JANELA segundos antes do cursor: o cliente pode receber de novo
+algo que já tinha (aplicar é idempotente), mas não perde uma escrita que
+commitou atrasada. Lápides mais velhas que BOARD_SYNC_RETENCAO_DIAS são
+apagadas; um cursor mais antigo que isso recebe `recarregar: true`.
+Card movido para outro projeto também deixa lápide no projeto de origem.
+Desarquivar recria o board com ids novos e sem lápides dos antigos
+(Projeto.restaurado_em): cursor de antes disso também recebe `recarregar`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Card, Remocao
+
+
+def novo_cursor():
+    # Em UTC com 'Z': sem '+' para não virar espaço numa query string mal codificada
+    return timezone.now().isoformat().replace('+00:00', 'Z')
+
+
+def ler_cursor(texto):
+    """Converte o cursor recebido em datetime (ValueError se inválido)."""
+    desde = parse_datetime(texto or '')
+    if desde is None or timezone.is_naive(desde):
+        raise ValueError("Cursor inválido")
+    return desde
+
+
+def _limite_retencao():
+    return timezone.now() - timedelta(days=settings.BOARD_SYNC_RETENCAO_DIAS)
+
+
+def registrar_remocao(projeto_id, tipo, objeto_id):
+    Remocao.objects.create(projeto_id=projeto_id, tipo=tipo, objeto_id=objeto_id)
+    # Aproveita para podar as lápides vencidas do projeto (pelo índice projeto+data)
+    Remocao.objects.filter(projeto_id=projeto_id, removido_em__lt=_limite_retencao()).delete()
+
+
+def registrar_troca_de_projeto(trocas):
+    """
+    Cards que foram para outro projeto: `trocas` é [(card_id, projeto_origem, projeto_destino)].
+    A origem ganha a lápide (o card some do board antigo no sync); a lápide
+    antiga no destino, de um card que está voltando, é apagada.
+    """
+    if not trocas:
+        return
+    voltando = Q()
+    for card_id, _, destino in trocas:
+        voltando |= Q(projeto_id=destino, objeto_id=card_id)
+    Remocao.objects.filter(voltando, tipo=Remocao.CARD).delete()
+    Remocao.objects.bulk_create([
+        Remocao(projeto_id=origem, tipo=Remocao.CARD, objeto_id=card_id) for card_id, origem, _ in trocas
+    ])
+
+
+def mudancas_desde(projeto, desde):
+    """
+    Colunas, cards e remoções do projeto desde o cursor (com a janela de
+    sobreposição). Retorna None se o cursor é velho demais para as lápides
+    ou anterior ao último desarquivamento.
+    """
+    if desde < _limite_retencao():
+        return None
+
+    if projeto.restaurado_em is not None and desde <= projeto.restaurado_em:
+        return None
+
+    limite = desde - timedelta(seconds=settings.BOARD_SYNC_JANELA)
+    remocoes = projeto.remocoes.filter(removido_em__gte=limite).values_list('tipo', 'objeto_id')
+    removidos = {Remocao.COLUNA: [], Remocao.CARD: []}
+    for tipo, objeto_id in remocoes:
+        removidos[tipo].append(objeto_id)
+
+    return {
+        'colunas': projeto.colunas.filter(atualizado_em__gte=limite).order_by('ordem', 'id'),
+        'cards': (
+            Card.objects.filter(coluna__projeto=projeto, atualizado_em__gte=limite)
+            .order_by('coluna_id', 'ordem', 'id')
+        ),
+        'removidos': {'colunas': removidos[Remocao.COLUNA], 'cards': removidos[Remocao.CARD]},
+    }
@@ -0,0 +1,361 @@
+"""
+Board em tempo real: WebSocket por projeto em /api/ws/workspaces/<id>/.
+
+Cada mudança em card/coluna vira um evento pequeno (só o que mudou: um
+movimento é {id, coluna, ordem}, não o board) publicado no canal do projeto
+depois do commit. Os textos grandes do card não vão no evento: no lugar
+deles vêm os extras do board, `resumo` e `refinado` (ver projecao.py), e o
+texto inteiro o cliente busca no GET cards/<id>/ ao abrir o card. O formato do evento segue o do sync incremental
+(sincronizacao.py): {tipo, colunas?, cards?, removidos?}, então o cliente
+aplica os dois do mesmo jeito.
+
+O broker entrega os eventos aos sockets abertos. O padrão (BrokerMemoria)
+vale para um processo só; com vários processos/nós use um broker
+compartilhado (BrokerPostgres, via LISTEN/NOTIFY, ou uma classe própria
+com a mesma interface) em settings.BOARD_TEMPO_REAL_BROKER.
+
+Servido pelo ASGI (core/asgi.py); o token JWT vai na query string
+(?token=...), já que o navegador não manda cabeçalhos no WebSocket. O
+acesso ao projeto é conferido no connect e de novo a cada
+BOARD_TEMPO_REAL_REVALIDAR segundos: membro removido é desconectado (4403).
+Token inválido fecha com 4401; nesses dois códigos o cliente não reconecta.
+"""
+import asyncio
+import json
+import re
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .acesso import ids_acessiveis
+from .autenticacao import JWTComCache
+from .models import Card, Coluna, Projeto
+from .projecao import CAMPOS_GRANDES, TAMANHO_RESUMO
+from .serializers import CardSerializer, ColunaSemCardsSerializer
+
+ROTA = re.compile(r'^/api/ws/workspaces/(?P<projeto_id>\d+)/?$')
+CAMPOS_MOVIMENTO = {'coluna', 'ordem', 'atualizado_em'}
+
+
+def canal_do_board(projeto_id):
+    return f'board.{projeto_id}'
+
+
+class BrokerMemoria:
+    """
+    Broker de um processo só. publicar() pode ser chamado de qualquer thread
+    (views síncronas); a entrega acontece no event loop de cada assinante.
+    Assinante lento que enche a fila recebe {'tipo': 'recarregar'} no lugar
+    dos eventos perdidos (e se atualiza pelo sync incremental).
+    """
+    TAMANHO_FILA = 100
+
+    def __init__(self):
+        self._assinantes = {}
+        self._lock = threading.Lock()
+
+    def assinar(self, canal):
+        fila = asyncio.Queue(maxsize=self.TAMANHO_FILA)
+        with self._lock:
+            self._assinantes.setdefault(canal, {})[fila] = asyncio.get_running_loop()
+        return fila
+
+    def cancelar(self, canal, fila):
+        with self._lock:
+            filas = self._assinantes.get(canal, {})
+            filas.pop(fila, None)
+            if not filas:
+                self._assinantes.pop(canal, None)
+
+    def publicar(self, canal, evento):
+        self._entregar_local(canal, evento)
+
+    def _entregar_local(self, canal, evento):
+        with self._lock:
+            filas = list(self._assinantes.get(canal, {}).items())
+        for fila, loop in filas:
+            try:
+                loop.call_soon_threadsafe(self._enfileirar, fila, evento)
+            except RuntimeError:
+                # Loop já fechado: assinante morto
+                self.cancelar(canal, fila)
+
+    @staticmethod
+    def _enfileirar(fila, evento):
+        try:
+            fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait({'tipo': 'recarregar'})
+
+
+class BrokerPostgres(BrokerMemoria):
+    """
+    Broker entre processos/nós via LISTEN/NOTIFY do Postgres (sem serviço
+    extra). Cada processo escuta um canal só do Postgres numa thread e
+    repassa para os seus assinantes locais. NOTIFY recusa payloads de 8000
+    bytes ou mais: evento maior (lote de cards, textos longos) vira
+    {'tipo': 'recarregar'} e o cliente busca o resto pelo sync incremental.
+    """
+    CANAL_PG = 'alchemist_board'
+    LIMITE_PAYLOAD = 7900  # bytes, com folga para o nome do canal
+
+    def __init__(self):
+        super().__init__()
+        self._ouvinte = None
+
+    def assinar(self, canal):
+        self._iniciar_ouvinte()
+        return super().assinar(canal)
+
+    def publicar(self, canal, evento):
+        payload = json.dumps({'canal': canal, 'evento': evento}, default=str)
+        if len(payload.encode()) >= self.LIMITE_PAYLOAD:
+            payload = json.dumps({'canal': canal, 'evento': {'tipo': 'recarregar'}})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.CANAL_PG, payload])
+
+    def _iniciar_ouvinte(self):
+        with self._lock:
+            if self._ouvinte is None:
+                self._ouvinte = threading.Thread(target=self._ouvir, name='board-listen', daemon=True)
+                self._ouvinte.start()
+
+    def _ouvir(self):
+        while True:
+            try:
+                self._escutar()
+            except Exception as e:
+                print(f"ERRO LISTEN (tempo real): {str(e)}")
+                time.sleep(5)  # reconecta depois de uma queda do banco
+
+    def _escutar(self):
+        # Conexão própria (fora das do Django por thread), em autocommit
+        banco = connections.create_connection(DEFAULT_DB_ALIAS)
+        banco.ensure_connection()
+        bruta = banco.connection
+        try:
+            with bruta.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.CANAL_PG}')
+            while True:
+                if select.select([bruta], [], [], 30) == ([], [], []):
+                    continue
+                bruta.poll()
+                while bruta.notifies:
+                    dados = json.loads(bruta.notifies.pop(0).payload)
+                    self._entregar_local(dados['canal'], dados['evento'])
+        finally:
+            banco.close()
+
+
+_broker = None
+_lock = threading.Lock()
+
+
+def obter_broker():
+    """Broker configurado em settings.BOARD_TEMPO_REAL_BROKER (um por processo)."""
+    global _broker
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                _broker = import_string(settings.BOARD_TEMPO_REAL_BROKER)()
+    return _broker
+
+
+def projetos_das_colunas(cards):
+    """
+    {coluna_id: projeto_id} dos cards: pela coluna já carregada no card, e o
+    resto numa query só (sem cache: a coluna pode mudar de projeto).
+    """
+    projetos, faltando = {}, set()
+    for card in cards:
+        if Card.coluna.is_cached(card):
+            projetos[card.coluna_id] = card.coluna.projeto_id
+        else:
+            faltando.add(card.coluna_id)
+    faltando -= projetos.keys()
+    if faltando:
+        projetos.update(Coluna.objects.filter(pk__in=faltando).values_list('pk', 'projeto_id'))
+    return projetos
+
+
+def _projeto_do_card(card):
+    return projetos_das_colunas([card]).get(card.coluna_id)
+
+
+def _entregar(canal, evento):
+    # Roda depois do commit: falha do broker não pode virar 500 de uma escrita que já valeu
+    try:
+        obter_broker().publicar(canal, evento)
+    except Exception as e:
+        print(f"ERRO tempo real ({canal}): {str(e)}")
+
+
+def publicar(projeto_id, evento):
+    """Publica o evento no canal do board quando (e se) a transação atual commitar."""
+    if projeto_id is None:
+        return
+    canal = canal_do_board(projeto_id)
+    transaction.on_commit(lambda: _entregar(canal, evento))
+
+
+def publicar_cards(tipo, cards, campos):
+    """Evento em lote (bulk_update): só `campos` de cada card (textos grandes como no _card_no_evento), por board."""
+    projetos, por_projeto = projetos_das_colunas(cards), {}
+    for card in cards:
+        dados = {'id': card.pk}
+        for campo in campos:
+            if campo == 'conteudo_original':
+                dados['resumo'] = (card.conteudo_original or '')[:TAMANHO_RESUMO]
+            elif campo == 'prompt_refinado':
+                dados['refinado'] = bool(card.prompt_refinado)
+            else:
+                dados[campo] = card.coluna_id if campo == 'coluna' else getattr(card, campo)
+        por_projeto.setdefault(projetos.get(card.coluna_id), []).append(dados)
+    for projeto_id, dados in por_projeto.items():
+        publicar(projeto_id, {'tipo': tipo, 'cards': dados})
+
+
+def _removidos(colunas=(), cards=()):
+    return {'colunas': list(colunas), 'cards': list(cards)}
+
+
+def _em_cascata(origin, modelos):
+    return getattr(origin, 'model', type(origin)) in modelos
+
+
+def _card_no_evento(card, campos=None):
+    """Os `campos` do card (None = todos), com resumo/refinado no lugar dos textos grandes."""
+    dados = CardSerializer(card).data
+    campos = set(dados) if campos is None else set(campos)
+    evento = {'id': card.pk}
+    evento.update({campo: dados[campo] for campo in campos - set(CAMPOS_GRANDES) if campo in dados})
+    if 'conteudo_original' in campos:
+        evento['resumo'] = (card.conteudo_original or '')[:TAMANHO_RESUMO]
+    if 'prompt_refinado' in campos:
+        evento['refinado'] = bool(card.prompt_refinado)
+    return evento
+
+
+@receiver(post_save, sender=Card)
+def _card_salvo(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        evento = {'tipo': 'card.criado', 'cards': [_card_no_evento(instance)]}
+    elif update_fields and set(update_fields) <= CAMPOS_MOVIMENTO:
+        evento = {'tipo': 'card.movido', 'cards': [
+            {'id': instance.pk, 'coluna': instance.coluna_id, 'ordem': instance.ordem}
+        ]}
+    else:
+        # Só os campos gravados (o PATCH/PUT grava só os que mudaram, ver CardSerializer.update)
+        evento = {'tipo': 'card.atualizado', 'cards': [_card_no_evento(instance, update_fields)]}
+    publicar(_projeto_do_card(instance), evento)
+
+
+@receiver(post_delete, sender=Card)
+def _card_apagado(sender, instance, origin=None, **kwargs):
+    if _em_cascata(origin, {Projeto, Coluna}):
+        return
+    publicar(_projeto_do_card(instance), {'tipo': 'card.removido', 'removidos': _removidos(cards=[instance.pk])})
+
+
+@receiver(post_save, sender=Coluna)
+def _coluna_salva(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    tipo = 'coluna.criada' if created else 'coluna.atualizada'
+    publicar(instance.projeto_id, {'tipo': tipo, 'colunas': [ColunaSemCardsSerializer(instance).data]})
+
+
+@receiver(post_delete, sender=Coluna)
+def _coluna_apagada(sender, instance, origin=None, **kwargs):
+    if _em_cascata(origin, {Projeto}):
+        return
+    publicar(instance.projeto_id, {'tipo': 'coluna.removida', 'removidos': _removidos(colunas=[instance.pk])})
+
+
+async def _autenticar(scope):
+    """Usuário do token JWT da query string (ou None)."""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if not token:
+        return None
+    autenticacao = JWTComCache()
+    try:
+        validado = autenticacao.get_validated_token(token)
+        return await sync_to_async(autenticacao.get_user)(validado)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+async def _tem_acesso(user, projeto_id):
+    # A conexão dura horas: descarta os ids guardados no objeto do usuário
+    user.__dict__.pop('_ids_acessiveis', None)
+    return projeto_id in await sync_to_async(ids_acessiveis)(user)
+
+
+async def websocket_board(scope, receive, send):
+    """App ASGI do WebSocket do board (roteado por core/asgi.py)."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    rota = ROTA.match(scope['path'])
+    user = await _autenticar(scope) if rota else None
+    projeto_id = int(rota['projeto_id']) if rota else None
+    recusa = 4401 if user is None else None
+    if recusa is None and not await _tem_acesso(user, projeto_id):
+        recusa = 4403
+    if recusa:
+        # Aceita e fecha com o código: recusar no handshake chega ao navegador
+        # como 1006, igual a uma queda, e o cliente ficaria reconectando
+        await send({'type': 'websocket.accept'})
+        await send({'type': 'websocket.close', 'code': recusa})
+        return
+
+    broker = obter_broker()
+    canal = canal_do_board(projeto_id)
+    fila = broker.assinar(canal)  # assina antes do accept para não perder eventos
+    await send({'type': 'websocket.accept'})
+
+    async def esperar_desconexao():
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass  # o cliente não manda nada; mensagens são ignoradas
+
+    desconexao = asyncio.ensure_future(esperar_desconexao())
+    proximo = None
+    revalidar_em = time.monotonic() + settings.BOARD_TEMPO_REAL_REVALIDAR
+    try:
+        while True:
+            if proximo is None:
+                proximo = asyncio.ensure_future(fila.get())
+            await asyncio.wait(
+                {proximo, desconexao}, timeout=max(0, revalidar_em - time.monotonic()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if desconexao.done():
+                break
+            if time.monotonic() >= revalidar_em:
+                if not await _tem_acesso(user, projeto_id):
+                    # Removido do projeto (ou projeto apagado) com o socket aberto
+                    await send({'type': 'websocket.close', 'code': 4403})
+                    break
+                revalidar_em = time.monotonic() + settings.BOARD_TEMPO_REAL_REVALIDAR
+            if proximo.done():
+                await send({'type': 'websocket.send', 'text': json.dumps(proximo.result(), default=str)})
+                proximo = None
+    finally:
+        if proximo is not None:
+            proximo.cancel()
+        desconexao.cancel()
+        broker.cancelar(canal, fila)
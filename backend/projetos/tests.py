@@ -1,3 +1,1197 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.asgi import application
+from core.consultas import OrcamentoExcedido, coletar_queries, forma_sql, orcamento_queries
+from core.metricas import HISTOGRAMAS
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+from .acesso import cards_acessiveis, colunas_acessiveis, projetos_acessiveis
+from .importacao import Importador, abrir_entrada, ler_objetos
+from .leitura import board_em_dict, cards_em_dicts
+from .models import ArquivoProjeto, Projeto, Coluna, Card, Remocao
+from .serializers import CardSerializer, ProjetoSerializer
+from .views import ProjetoViewSet, total_membros_subquery
+
+
+def criar_board(dono, titulo='Board', colunas=2, cards_por_coluna=3, membros=()):
+    projeto = Projeto.objects.create(titulo=titulo, dono=dono)
+    projeto.membros.add(*membros)
+    for c in range(colunas):
+        coluna = Coluna.objects.create(projeto=projeto, titulo=f'Coluna {c}', ordem=c)
+        for i in range(cards_por_coluna):
+            Card.objects.create(coluna=coluna, titulo=f'Card {i}', conteudo_original='...', ordem=i)
+    return projeto
+
+
+class WorkspaceQueriesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.outro = User.objects.create_user('bia', password='x')
+        self.client.force_authenticate(self.user)
+
+    def contar_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_listagem_com_numero_fixo_de_queries(self):
+        criar_board(self.user, membros=[self.outro])
+        poucos, _ = self.contar_queries('/api/workspaces/')
+
+        for n in range(5):
+            criar_board(self.user, titulo=f'Meu {n}', colunas=4, cards_por_coluna=6, membros=[self.outro])
+            criar_board(self.outro, titulo=f'Compartilhado {n}', colunas=3, membros=[self.user])
+        muitos, response = self.contar_queries('/api/workspaces/')
+
+        self.assertEqual(poucos, muitos)
+        self.assertEqual(len(response.data), 11)
+
+    def test_listagem_retorna_resumo_sem_cards(self):
+        projeto = criar_board(self.user, colunas=2, cards_por_coluna=3)
+        card = Card.objects.filter(coluna__projeto=projeto).first()
+        card.prazo = timezone.now() - timedelta(days=1)
+        card.save()
+        criar_board(self.user, titulo='Vazio', colunas=0)
+
+        _, response = self.contar_queries('/api/workspaces/')
+        resumos = {p['titulo']: p for p in response.data}
+
+        self.assertNotIn('colunas', resumos['Board'])
+        self.assertEqual(resumos['Board']['total_cards'], 6)
+        self.assertEqual(resumos['Board']['cards_atrasados'], 1)
+        self.assertIsNotNone(resumos['Board']['ultima_atividade'])
+        self.assertEqual(resumos['Vazio']['total_cards'], 0)
+        self.assertEqual(resumos['Vazio']['cards_atrasados'], 0)
+
+    def test_total_membros_nao_e_afetado_pelo_filtro_de_permissao(self):
+        terceiro = User.objects.create_user('caio', password='x')
+        projeto = criar_board(self.outro, membros=[self.user, terceiro])
+
+        response = self.client.get(f'/api/workspaces/{projeto.id}/')
+
+        self.assertEqual(response.data['total_membros'], 3)
+        self.assertFalse(response.data['is_dono'])
+        self.assertEqual(response.data['nome_dono'], 'bia')
+
+    def test_cards_e_colunas_vem_ordenados(self):
+        projeto = criar_board(self.user, colunas=0)
+        coluna = Coluna.objects.create(projeto=projeto, titulo='B', ordem=2)
+        Coluna.objects.create(projeto=projeto, titulo='A', ordem=1)
+        Card.objects.create(coluna=coluna, titulo='segundo', conteudo_original='', ordem=5)
+        Card.objects.create(coluna=coluna, titulo='primeiro', conteudo_original='', ordem=1)
+
+        response = self.client.get(f'/api/workspaces/{projeto.id}/')
+
+        self.assertEqual([c['titulo'] for c in response.data['colunas']], ['A', 'B'])
+        self.assertEqual([c['titulo'] for c in response.data['colunas'][1]['cards']], ['primeiro', 'segundo'])
+
+    def test_colunas_com_numero_fixo_de_queries(self):
+        criar_board(self.user)
+        poucos, _ = self.contar_queries('/api/colunas/')
+
+        for n in range(4):
+            criar_board(self.user, colunas=5, cards_por_coluna=4)
+        muitos, _ = self.contar_queries('/api/colunas/')
+
+        self.assertEqual(poucos, muitos)
+
+
+class MoverCardTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=0)
+        self.origem, self.destino = self.projeto.colunas.order_by('ordem')
+
+    def criar_cards(self, coluna, quantidade):
+        return [
+            self.client.post('/api/cards/', {
+                'coluna': coluna.id, 'titulo': f'Card {i}', 'conteudo_original': '...'
+            }).data['id']
+            for i in range(quantidade)
+        ]
+
+    def ids_da_coluna(self, coluna):
+        return list(coluna.cards.order_by('ordem', 'id').values_list('id', flat=True))
+
+    def mover(self, card_id, coluna, posicao):
+        return self.client.post(f'/api/cards/{card_id}/mover/', {
+            'coluna_id': coluna.id, 'nova_posicao': posicao
+        })
+
+    def test_cards_novos_entram_no_fim_com_espaco(self):
+        ids = self.criar_cards(self.origem, 3)
+
+        self.assertEqual(self.ids_da_coluna(self.origem), ids)
+        ordens = list(Card.objects.filter(id__in=ids).order_by('ordem').values_list('ordem', flat=True))
+        self.assertTrue(all(b - a > 1 for a, b in zip(ordens, ordens[1:])))
+
+    def test_mover_grava_apenas_o_card_movido(self):
+        ids = self.criar_cards(self.destino, 50)
+        movido = self.criar_cards(self.origem, 1)[0]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.mover(movido, self.destino, 20)
+
+        self.assertEqual(response.status_code, 200)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "projetos_card"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.ids_da_coluna(self.destino), ids[:20] + [movido] + ids[20:])
+
+    def test_rebalanceia_quando_acaba_o_espaco(self):
+        ids = self.criar_cards(self.origem, 3)
+        # Sempre entre os dois primeiros: o espaço acaba depois de ~10 movimentos
+        for _ in range(15):
+            ultimo = self.ids_da_coluna(self.origem)[-1]
+            self.assertEqual(self.mover(ultimo, self.origem, 1).status_code, 200)
+
+        ordens = list(Card.objects.filter(id__in=ids).values_list('ordem', flat=True))
+        self.assertEqual(len(set(ordens)), 3)
+        self.assertEqual(len(self.ids_da_coluna(self.origem)), 3)
+
+    def test_posicao_alem_do_fim_vai_para_o_final(self):
+        ids = self.criar_cards(self.origem, 3)
+
+        self.mover(ids[0], self.origem, 99)
+
+        self.assertEqual(self.ids_da_coluna(self.origem), ids[1:] + ids[:1])
+
+    def test_nao_move_para_coluna_de_outro_usuario(self):
+        card_id = self.criar_cards(self.origem, 1)[0]
+        alheio = criar_board(User.objects.create_user('bia', password='x'), colunas=1, cards_por_coluna=0)
+
+        response = self.mover(card_id, alheio.colunas.get(), 0)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Card.objects.get(id=card_id).coluna_id, self.origem.id)
+
+
+class MoverLoteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=4)
+        self.a, self.b = self.projeto.colunas.order_by('ordem')
+
+    def ids(self, coluna):
+        return list(coluna.cards.order_by('ordem', 'id').values_list('id', flat=True))
+
+    def test_move_varios_cards_e_devolve_colunas_tocadas(self):
+        a, b = self.ids(self.a), self.ids(self.b)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/cards/mover-lote/', {'movimentos': [
+                {'card_id': a[0], 'coluna_id': self.b.id, 'nova_posicao': 0},
+                {'card_id': a[1], 'coluna_id': self.b.id, 'nova_posicao': 1},
+                {'card_id': b[3], 'coluna_id': self.a.id, 'nova_posicao': 99},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(self.a), a[2:] + [b[3]])
+        self.assertEqual(self.ids(self.b), [a[0], a[1]] + b[:3])
+        devolvidas = {c['id']: [card['id'] for card in c['cards']] for c in response.data['colunas']}
+        self.assertEqual(devolvidas, {self.a.id: self.ids(self.a), self.b.id: self.ids(self.b)})
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "projetos_card"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_so_regrava_os_cards_movidos(self):
+        for coluna in (self.a, self.b):
+            for i, card in enumerate(coluna.cards.order_by('ordem', 'id')):
+                Card.objects.filter(pk=card.pk).update(ordem=i * 1024)
+        a, b = self.ids(self.a), self.ids(self.b)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/cards/mover-lote/', {'movimentos': [
+                {'card_id': a[0], 'coluna_id': self.b.id, 'nova_posicao': 2},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(self.b), b[:2] + [a[0]] + b[2:])
+        self.assertEqual(Card.objects.get(pk=a[0]).ordem, 1536)
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "projetos_card"'))
+        self.assertEqual(update.count('WHEN'), 3)  # só o card movido (coluna, ordem, atualizado_em)
+
+    def test_recusa_projeto_sem_permissao(self):
+        alheio = criar_board(User.objects.create_user('bia', password='x'), colunas=1)
+        card_alheio = alheio.colunas.get().cards.first()
+
+        response = self.client.post('/api/cards/mover-lote/', {'movimentos': [
+            {'card_id': card_alheio.id, 'coluna_id': self.a.id, 'nova_posicao': 0},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Card.objects.get(id=card_alheio.id).coluna_id, alheio.colunas.get().id)
+
+
+    def test_corpo_que_nao_e_objeto(self):
+        response = self.client.post('/api/cards/mover-lote/', [
+            {'card_id': self.a.cards.first().id, 'coluna_id': self.b.id, 'nova_posicao': 0},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AcessoTests(APITestCase):
+    def test_escopo_sem_duplicar_nem_vazar(self):
+        ana, bia, caio, duda = (User.objects.create_user(n, password='x') for n in ('ana', 'bia', 'caio', 'duda'))
+        compartilhado = criar_board(bia, colunas=2, cards_por_coluna=2, membros=[ana, caio])
+        proprio = criar_board(ana, colunas=1, cards_por_coluna=1, membros=[bia])
+        criar_board(duda, colunas=1, cards_por_coluna=1)
+
+        self.assertEqual(
+            sorted(projetos_acessiveis(ana).values_list('id', flat=True)),
+            sorted([compartilhado.id, proprio.id]),
+        )
+        self.assertEqual(colunas_acessiveis(ana).count(), 3)
+        self.assertEqual(cards_acessiveis(ana).count(), 5)
+        self.assertEqual(cards_acessiveis(duda).count(), 1)
+        self.assertNotIn('DISTINCT', str(cards_acessiveis(ana).query))
+
+
+class EtagBoardTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user)
+        self.url = f'/api/workspaces/{self.projeto.id}/'
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def condicional(self, etag):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_304_sem_serializar_quando_nada_mudou(self):
+        etag = self.etag()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.condicional(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(self.condicional(f'W/{etag}').status_code, 304)
+
+    def test_mutacoes_mudam_o_etag(self):
+        coluna = self.projeto.colunas.first()
+        card = Card.objects.filter(coluna=coluna).first()
+        outra = self.projeto.colunas.last()
+        mutacoes = [
+            lambda: self.client.patch(f'/api/cards/{card.id}/', {'titulo': 'Novo'}),
+            lambda: self.client.post(f'/api/cards/{card.id}/mover/', {'coluna_id': outra.id, 'nova_posicao': 0}),
+            lambda: self.client.post('/api/cards/mover-lote/', {
+                'movimentos': [{'card_id': card.id, 'coluna_id': coluna.id, 'nova_posicao': 0}]
+            }, format='json'),
+            lambda: self.client.delete(f'/api/cards/{card.id}/'),
+            lambda: self.client.patch(f'/api/colunas/{coluna.id}/', {'cor': '#000000'}),
+            lambda: self.projeto.membros.add(User.objects.create_user('bia', password='x')),
+        ]
+        for mutacao in mutacoes:
+            etag = self.etag()
+            mutacao()
+            self.assertEqual(self.condicional(etag).status_code, 200)
+
+    def test_etag_e_por_usuario(self):
+        bia = User.objects.create_user('bia', password='x')
+        self.projeto.membros.add(bia)
+        etag = self.etag()
+
+        self.client.force_authenticate(bia)
+
+        self.assertEqual(self.condicional(etag).status_code, 200)
+
+
+@override_settings(BOARD_CARDS_POR_COLUNA=3)
+class PaginacaoCardsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=7)
+        self.coluna = self.projeto.colunas.order_by('ordem').first()
+
+    def pagina(self, **params):
+        return self.client.get('/api/cards/pagina/', {'coluna': self.coluna.id, **params})
+
+    def test_board_traz_so_os_primeiros_cards(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/workspaces/{self.projeto.id}/')
+
+        coluna = response.data['colunas'][0]
+        self.assertEqual([c['titulo'] for c in coluna['cards']], ['Card 0', 'Card 1', 'Card 2'])
+        self.assertEqual(coluna['total_cards'], 7)
+        self.assertIsNotNone(coluna['proximo_cursor'])
+
+        # Sem query extra por coluna
+        maior = criar_board(self.user, colunas=6, cards_por_coluna=7)
+        with CaptureQueriesContext(connection) as ctx_maior:
+            self.client.get(f'/api/workspaces/{maior.id}/')
+        self.assertEqual(len(ctx_maior.captured_queries), len(ctx.captured_queries))
+
+    def test_paginas_cobrem_a_coluna_sem_repetir(self):
+        cursor = self.client.get(f'/api/workspaces/{self.projeto.id}/').data['colunas'][0]['proximo_cursor']
+        vistos = ['Card 0', 'Card 1', 'Card 2']
+        while cursor:
+            response = self.pagina(cursor=cursor, limite=2)
+            self.assertEqual(response.status_code, 200)
+            vistos += [c['titulo'] for c in response.data['cards']]
+            cursor = response.data['proximo_cursor']
+
+        self.assertEqual(vistos, [f'Card {i}' for i in range(7)])
+
+    def test_coluna_completa_nao_tem_cursor(self):
+        with self.settings(BOARD_CARDS_POR_COLUNA=7):
+            coluna = self.client.get(f'/api/workspaces/{self.projeto.id}/').data['colunas'][0]
+        self.assertEqual(len(coluna['cards']), 7)
+        self.assertIsNone(coluna['proximo_cursor'])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.pagina(cursor='nao-e-cursor').status_code, 400)
+        self.assertEqual(self.client.get('/api/cards/pagina/').status_code, 400)
+
+    def test_coluna_de_outro_usuario_volta_vazia(self):
+        self.client.force_authenticate(User.objects.create_user('bia', password='x'))
+
+        response = self.pagina()
+
+        self.assertEqual(response.data, {'cards': [], 'proximo_cursor': None})
+
+
+class ExportarJsonlTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', password='x')
+        self.bia = User.objects.create_user('bia', password='x')
+        self.caio = User.objects.create_user('caio', password='x')
+        self.projeto = criar_board(self.ana, colunas=2, cards_por_coluna=3, membros=[self.bia])
+        self.outro = criar_board(self.caio, titulo='Outro')
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+
+    def exportar(self, nome='backup.jsonl.gz', **opcoes):
+        caminho = os.path.join(self.pasta.name, nome)
+        call_command('exportar_jsonl', saida=caminho, stdout=StringIO(), **opcoes)
+        abrir = gzip.open if nome.endswith('.gz') else open
+        with abrir(caminho, 'rt', encoding='utf-8') as arquivo:
+            linhas = [json.loads(linha) for linha in arquivo]
+        return caminho, linhas
+
+    def modelos(self, linhas):
+        contagem = {}
+        for linha in linhas:
+            contagem[linha['model']] = contagem.get(linha['model'], 0) + 1
+        return contagem
+
+    def test_escopo_por_usuario(self):
+        _, linhas = self.exportar(usuario='bia')
+
+        self.assertEqual(self.modelos(linhas), {
+            'auth.user': 2, 'projetos.projeto': 1, 'projetos.coluna': 2, 'projetos.card': 6,
+        })
+        self.assertEqual({l['fields']['username'] for l in linhas if l['model'] == 'auth.user'}, {'ana', 'bia'})
+
+    def test_escopo_total_e_por_projeto(self):
+        _, tudo = self.exportar(nome='tudo.jsonl')
+        _, um = self.exportar(nome='um.jsonl', projetos=[self.outro.pk])
+
+        self.assertEqual(self.modelos(tudo)['projetos.card'], 12)
+        self.assertEqual(self.modelos(um)['projetos.projeto'], 1)
+        self.assertEqual(self.modelos(um)['projetos.card'], 6)
+
+    def test_incremental_traz_alterados_e_remocoes(self):
+        desde = timezone.now()
+        card = Card.objects.filter(coluna__projeto=self.projeto).first()
+        card.titulo = 'Mudou'
+        card.save()
+        Card.objects.filter(coluna__projeto=self.projeto).exclude(pk=card.pk).first().delete()
+
+        _, linhas = self.exportar(usuario='ana', desde=desde.isoformat())
+
+        # O projeto e a coluna do card alterado vão junto, para o loaddata
+        self.assertEqual(self.modelos(linhas), {
+            'projetos.projeto': 1, 'projetos.coluna': 1, 'projetos.card': 1, 'projetos.remocao': 1,
+        })
+        card_linha = next(l for l in linhas if l['model'] == 'projetos.card')
+        self.assertEqual(card_linha['fields']['titulo'], 'Mudou')
+
+    def test_incremental_traz_projeto_renomeado_e_membros(self):
+        desde = timezone.now()
+        self.outro.titulo = 'Renomeado'
+        self.outro.save()
+        self.projeto.membros.add(self.caio)
+
+        caminho, linhas = self.exportar(nome='inc.jsonl', desde=desde.isoformat())
+
+        self.assertEqual(self.modelos(linhas), {'projetos.projeto': 2})
+        Projeto.objects.filter(pk=self.outro.pk).update(titulo='Velho')
+        self.projeto.membros.remove(self.caio)
+        call_command('loaddata', caminho, verbosity=0)
+        self.assertEqual(Projeto.objects.get(pk=self.outro.pk).titulo, 'Renomeado')
+        self.assertIn(self.caio, self.projeto.membros.all())
+
+    def test_volta_com_loaddata(self):
+        caminho, _ = self.exportar(projetos=[self.projeto.pk])
+        Projeto.objects.filter(pk=self.projeto.pk).delete()
+
+        call_command('loaddata', caminho, verbosity=0)
+
+        projeto = Projeto.objects.get(pk=self.projeto.pk)
+        self.assertEqual(list(projeto.membros.all()), [self.bia])
+        self.assertEqual(Card.objects.filter(coluna__projeto=projeto).count(), 6)
+
+    def test_lotes_pequenos_nao_mudam_a_saida(self):
+        _, normal = self.exportar(nome='a.jsonl')
+        _, lotes = self.exportar(nome='b.jsonl', chunk_size=1)
+        self.assertEqual(normal, lotes)
+
+
+class ImportarDadosTests(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', password='x')
+        self.bia = User.objects.create_user('bia', password='x')
+        self.projeto = criar_board(self.ana, colunas=3, cards_por_coluna=4, membros=[self.bia])
+        Card.objects.update(criado_em=timezone.now() - timedelta(days=10))
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.backup = os.path.join(self.pasta.name, 'backup.jsonl.gz')
+        call_command('exportar_jsonl', saida=self.backup, stdout=StringIO())
+
+    def importar(self, caminho=None, **opcoes):
+        call_command('importar_dados', caminho or self.backup, stdout=StringIO(), **opcoes)
+
+    def test_restaura_com_ids_novos(self):
+        self.importar()
+
+        novo = Projeto.objects.exclude(pk=self.projeto.pk).get()
+        self.assertEqual(User.objects.count(), 2)  # usuários reaproveitados pelo username
+        self.assertEqual(novo.dono, self.ana)
+        self.assertEqual(list(novo.membros.all()), [self.bia])
+        self.assertEqual(
+            list(Card.objects.filter(coluna__projeto=novo).values_list('coluna__titulo', 'titulo', 'ordem')),
+            list(Card.objects.filter(coluna__projeto=self.projeto).values_list('coluna__titulo', 'titulo', 'ordem')),
+        )
+        # Datas do arquivo, não as da importação
+        self.assertFalse(Card.objects.filter(criado_em__gte=timezone.now() - timedelta(days=1)).exists())
+
+    def test_le_o_backup_antigo_do_dumpdata(self):
+        antigo = os.path.join(self.pasta.name, 'backup_dados.json')
+        with open(antigo, 'w', encoding='utf-8') as arquivo:
+            call_command(
+                'dumpdata', 'auth.user', 'projetos.projeto', 'projetos.coluna', 'projetos.card',
+                natural_foreign=True, natural_primary=True, indent=2, stdout=arquivo,
+            )
+        # Pedaços pequenos: objetos cortados entre leituras
+        with open(antigo, encoding='utf-8') as arquivo:
+            objetos = list(ler_objetos(arquivo, bloco=50))
+        self.assertEqual(len(objetos), 2 + 1 + 3 + 12)
+
+        self.importar(antigo)
+
+        self.assertEqual(Projeto.objects.count(), 2)
+        self.assertEqual(Card.objects.count(), 24)
+
+    def test_retoma_do_checkpoint(self):
+        checkpoint = os.path.join(self.pasta.name, 'checkpoint')
+        lotes = []
+
+        def cair_no_terceiro_lote(importador):
+            lotes.append(importador.processados)
+            if len(lotes) == 3:
+                raise KeyboardInterrupt
+
+        texto, _ = abrir_entrada(self.backup)
+        with texto, self.assertRaises(KeyboardInterrupt):
+            Importador(lote=5, checkpoint=checkpoint, progresso=cair_no_terceiro_lote).importar(ler_objetos(texto))
+        self.assertTrue(os.path.exists(checkpoint))
+
+        self.importar(checkpoint=checkpoint, lote=5)
+
+        self.assertEqual(Projeto.objects.count(), 2)
+        self.assertEqual(Coluna.objects.count(), 6)
+        self.assertEqual(Card.objects.count(), 24)
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class LeituraRapidaTests(APITestCase):
+    """A leitura por .values() tem que sair igual aos serializers."""
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.bia = User.objects.create_user('bia', password='x')
+        self.projeto = criar_board(self.bia, colunas=3, cards_por_coluna=4, membros=[self.user])
+        Coluna.objects.create(projeto=self.projeto, titulo='Vazia', ordem=9)
+        Card.objects.filter(ordem=1).update(prazo=timezone.now(), prompt_refinado='Refinado ✨\u2028')
+
+    def request(self, **params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = self.user
+        return request
+
+    def comparar_board(self, **params):
+        request = self.request(**params)
+        viewset = ProjetoViewSet(action='retrieve', request=request, kwargs={}, format_kwarg=None)
+        projeto = viewset.get_queryset().get(pk=self.projeto.pk)
+        completo = ProjetoSerializer(projeto, context={'request': request}).data
+
+        projetos = projetos_acessiveis(self.user).filter(pk=self.projeto.pk)
+        rapido = board_em_dict(projetos.annotate(num_membros=total_membros_subquery()), request)
+
+        self.assertEqual(json.dumps(rapido), json.dumps(completo))
+
+    def test_board_igual_ao_serializer(self):
+        self.comparar_board()
+
+    def test_board_com_projecao_igual_ao_serializer(self):
+        self.comparar_board(fields='titulo,prazo,resumo,refinado')
+        self.comparar_board(omit='conteudo_original,prompt_refinado')
+
+    def test_board_com_colunas_cortadas_igual_ao_serializer(self):
+        with self.settings(BOARD_CARDS_POR_COLUNA=2):
+            self.comparar_board()
+
+    def test_cards_iguais_ao_serializer(self):
+        request = self.request(omit='conteudo_original')
+        cards = Card.objects.order_by('coluna_id', 'ordem', 'id')
+
+        completo = CardSerializer(cards, many=True, context={'request': request}).data
+
+        self.assertEqual(json.dumps(cards_em_dicts(cards, request)), json.dumps(completo))
+
+    def test_projeto_inacessivel(self):
+        projetos = projetos_acessiveis(User.objects.create_user('caio')).filter(pk=self.projeto.pk)
+        self.assertIsNone(board_em_dict(projetos.annotate(num_membros=total_membros_subquery()), self.request()))
+
+
+class JsonRapidoTests(TestCase):
+    dados = {'titulo': 'Ação ✨', 'linha': 'a\u2028b\u2029c', 'total': 3, 'ok': True, 'nada': None, 'lista': [1.5]}
+
+    def test_renderer_igual_ao_do_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.dados), JSONRenderer().render(self.dados))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_renderer_com_chaves_inteiras(self):
+        dados = {1: 'a', 2: {3: [4]}}
+        self.assertEqual(ORJSONRenderer().render(dados), JSONRenderer().render(dados))
+
+    def test_renderer_com_indentacao_usa_o_do_drf(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(self.dados, media_type), JSONRenderer().render(self.dados, media_type)
+        )
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(BytesIO(JSONRenderer().render(self.dados))), self.dados)
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{quebrado'))
+
+
+class ProjecaoCardsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=1, cards_por_coluna=2)
+        self.card = Card.objects.first()
+        Card.objects.filter(pk=self.card.pk).update(conteudo_original='x' * 5000, prompt_refinado='y' * 5000)
+
+    def cards_do_board(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/workspaces/{self.projeto.id}/', params)
+        self.assertEqual(response.status_code, 200)
+        sql_cards = [q['sql'] for q in ctx.captured_queries if 'FROM "projetos_card"' in q['sql']]
+        return response.data['colunas'][0]['cards'], sql_cards
+
+    def test_sem_projecao_vem_tudo(self):
+        cards, _ = self.cards_do_board()
+        self.assertEqual(set(cards[0]), {
+            'id', 'titulo', 'conteudo_original', 'prompt_refinado', 'ordem', 'prazo', 'coluna', 'criado_em'
+        })
+
+    def test_omit_nao_le_os_textos_grandes(self):
+        cards, sql_cards = self.cards_do_board(omit='conteudo_original,prompt_refinado')
+
+        self.assertNotIn('conteudo_original', cards[0])
+        self.assertNotIn('prompt_refinado', cards[0])
+        self.assertIn('titulo', cards[0])
+        self.assertTrue(sql_cards)
+        for sql in sql_cards:
+            self.assertNotIn('conteudo_original', sql)
+            self.assertNotIn('prompt_refinado', sql)
+
+    def test_fields_com_extras_do_board(self):
+        cards, _ = self.cards_do_board(fields='titulo,prazo,resumo,refinado')
+
+        card = next(c for c in cards if c['id'] == self.card.id)
+        self.assertEqual(set(card), {'id', 'titulo', 'prazo', 'resumo', 'refinado'})
+        self.assertEqual(len(card['resumo']), 200)
+        self.assertTrue(card['refinado'])
+        outro = next(c for c in cards if c['id'] != self.card.id)
+        self.assertFalse(outro['refinado'])
+
+    def test_card_aberto_traz_o_texto_inteiro(self):
+        lista = self.client.get('/api/cards/', {'omit': 'prompt_refinado'}).data
+        self.assertNotIn('prompt_refinado', lista[0])
+
+        card = self.client.get(f'/api/cards/{self.card.id}/').data
+        self.assertEqual(len(card['prompt_refinado']), 5000)
+
+    def test_projecao_nao_vale_na_escrita(self):
+        response = self.client.patch(
+            f'/api/cards/{self.card.id}/?fields=titulo', {'conteudo_original': 'Novo'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.conteudo_original, 'Novo')
+
+
+@override_settings(BOARD_SYNC_JANELA=0)
+class SyncIncrementalTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=3)
+        self.a, self.b = self.projeto.colunas.order_by('ordem')
+        self.cursor = self.client.get(f'/api/workspaces/{self.projeto.id}/').data['cursor']
+
+    def mudancas(self, cursor=None):
+        response = self.client.get(
+            f'/api/workspaces/{self.projeto.id}/mudancas/', {'desde': cursor or self.cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_sem_mudancas_volta_vazio(self):
+        data = self.mudancas()
+
+        self.assertEqual((data['colunas'], data['cards']), ([], []))
+        self.assertEqual(data['removidos'], {'colunas': [], 'cards': []})
+        self.assertFalse(data['recarregar'])
+
+    def test_traz_so_o_que_mudou_e_as_remocoes(self):
+        movido, apagado, _ = self.a.cards.order_by('ordem')
+        self.client.post(f'/api/cards/{movido.id}/mover/', {'coluna_id': self.b.id, 'nova_posicao': 0})
+        self.client.delete(f'/api/cards/{apagado.id}/')
+        self.client.patch(f'/api/colunas/{self.b.id}/', {'titulo': 'Feito'})
+        criado = self.client.post('/api/cards/', {'coluna': self.a.id, 'titulo': 'Novo', 'conteudo_original': '.'})
+
+        data = self.mudancas()
+
+        self.assertEqual({c['id'] for c in data['cards']}, {movido.id, criado.data['id']})
+        self.assertEqual([c['titulo'] for c in data['colunas']], ['Feito'])
+        self.assertNotIn('cards', data['colunas'][0])
+        self.assertEqual(data['removidos']['cards'], [apagado.id])
+        self.assertEqual(self.mudancas(data['cursor'])['cards'], [])
+
+    def test_mover_em_lote_e_coluna_apagada(self):
+        card = self.b.cards.first()
+        self.client.post('/api/cards/mover-lote/', {
+            'movimentos': [{'card_id': card.id, 'coluna_id': self.a.id, 'nova_posicao': 0}]
+        }, format='json')
+        self.client.delete(f'/api/colunas/{self.b.id}/')
+
+        data = self.mudancas()
+
+        self.assertIn(card.id, [c['id'] for c in data['cards']])
+        self.assertEqual(data['removidos'], {'colunas': [self.b.id], 'cards': []})
+
+    def test_card_movido_para_outro_projeto_some_da_origem(self):
+        outro = criar_board(self.user, colunas=1, cards_por_coluna=0)
+        destino = outro.colunas.get()
+        card, lote = self.a.cards.order_by('ordem')[:2]
+
+        self.client.post(f'/api/cards/{card.id}/mover/', {'coluna_id': destino.id, 'nova_posicao': 0})
+        self.client.post('/api/cards/mover-lote/', {
+            'movimentos': [{'card_id': lote.id, 'coluna_id': destino.id, 'nova_posicao': 1}]
+        }, format='json')
+
+        data = self.mudancas()
+        self.assertEqual(sorted(data['removidos']['cards']), sorted([card.id, lote.id]))
+        self.assertNotIn(card.id, [c['id'] for c in data['cards']])
+
+        # Voltando, a lápide antiga não esconde o card
+        self.client.post(f'/api/cards/{card.id}/mover/', {'coluna_id': self.b.id, 'nova_posicao': 0})
+        data = self.mudancas()
+        self.assertEqual(data['removidos']['cards'], [lote.id])
+        self.assertIn(card.id, [c['id'] for c in data['cards']])
+
+    def test_cursor_invalido_ou_vencido(self):
+        response = self.client.get(f'/api/workspaces/{self.projeto.id}/mudancas/', {'desde': 'ontem'})
+        self.assertEqual(response.status_code, 400)
+
+        antigo = (timezone.now() - timedelta(days=365)).isoformat()
+        self.assertTrue(self.mudancas(antigo)['recarregar'])
+
+
+class TempoRealTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=2)
+        self.card = Card.objects.filter(coluna__projeto=self.projeto).first()
+        self.destino = self.projeto.colunas.exclude(pk=self.card.coluna_id).get()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    async def conectar(self, user, projeto_id):
+        entrada, saida = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            'type': 'websocket',
+            'path': f'/api/ws/workspaces/{projeto_id}/',
+            'query_string': f'token={AccessToken.for_user(user)}'.encode(),
+        }
+        tarefa = asyncio.ensure_future(application(scope, entrada.get, saida.put))
+        await entrada.put({'type': 'websocket.connect'})
+        return entrada, saida, tarefa, await asyncio.wait_for(saida.get(), 2)
+
+    def mover(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.post(f'/api/cards/{self.card.id}/mover/', {'coluna_id': self.destino.id, 'nova_posicao': 0})
+
+    def apagar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.delete(f'/api/cards/{self.card.id}/')
+
+    async def test_membro_recebe_diffs_pequenos(self):
+        entrada, saida, tarefa, resposta = await self.conectar(self.user, self.projeto.id)
+        self.assertEqual(resposta['type'], 'websocket.accept')
+
+        await sync_to_async(self.mover)()
+        movido = json.loads((await asyncio.wait_for(saida.get(), 2))['text'])
+        await sync_to_async(self.apagar)()
+        removido = json.loads((await asyncio.wait_for(saida.get(), 2))['text'])
+
+        await entrada.put({'type': 'websocket.disconnect', 'code': 1000})
+        await tarefa
+        self.assertEqual(movido['tipo'], 'card.movido')
+        self.assertEqual(movido['cards'], [{'id': self.card.id, 'coluna': self.destino.id, 'ordem': -1024}])
+        self.assertEqual(removido['removidos'], {'colunas': [], 'cards': [self.card.id]})
+
+    async def test_recusa_quem_nao_e_membro(self):
+        estranho = await sync_to_async(User.objects.create_user)('bia', password='x')
+
+        _, saida, tarefa, resposta = await self.conectar(estranho, self.projeto.id)
+
+        await tarefa
+        self.assertEqual(resposta['type'], 'websocket.accept')
+        self.assertEqual(await saida.get(), {'type': 'websocket.close', 'code': 4403})
+
+    async def test_token_invalido_fecha_com_4401(self):
+        entrada, saida = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'websocket', 'path': f'/api/ws/workspaces/{self.projeto.id}/', 'query_string': b'token=x'}
+        await entrada.put({'type': 'websocket.connect'})
+
+        await application(scope, entrada.get, saida.put)
+
+        self.assertEqual(await saida.get(), {'type': 'websocket.accept'})
+        self.assertEqual(await saida.get(), {'type': 'websocket.close', 'code': 4401})
+
+    def test_edicao_publica_so_os_campos_alterados(self):
+        Card.objects.filter(pk=self.card.pk).update(prompt_refinado='y' * 5000)
+
+        with mock.patch('projetos.tempo_real.obter_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            self.api.patch(f'/api/cards/{self.card.id}/', {
+                'titulo': 'Novo', 'conteudo_original': 'x' * 5000, 'ordem': self.card.ordem,
+            }, format='json')
+
+        canal, evento = broker.return_value.publicar.call_args.args
+        self.assertEqual(broker.return_value.publicar.call_count, 1)
+        self.assertEqual(evento, {'tipo': 'card.atualizado', 'cards': [
+            {'id': self.card.id, 'titulo': 'Novo', 'resumo': 'x' * 200}
+        ]})
+
+    def test_card_de_coluna_que_trocou_de_projeto_vai_para_o_novo_board(self):
+        outro = Projeto.objects.create(titulo='Outro', dono=self.user)
+        with mock.patch('projetos.tempo_real.obter_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            self.api.patch(f'/api/cards/{self.card.id}/', {'titulo': 'Antes'}, format='json')
+            self.api.patch(f'/api/colunas/{self.card.coluna_id}/', {'projeto': outro.id}, format='json')
+            self.api.patch(f'/api/cards/{self.card.id}/', {'titulo': 'Depois'}, format='json')
+
+        canal, evento = broker.return_value.publicar.call_args.args
+        self.assertEqual((canal, evento['cards'][0]['titulo']), (f'board.{outro.id}', 'Depois'))
+
+    @override_settings(BOARD_TEMPO_REAL_REVALIDAR=0.1)
+    async def test_membro_removido_e_desconectado(self):
+        bia = await sync_to_async(User.objects.create_user)('bia', password='x')
+        await sync_to_async(self.projeto.membros.add)(bia)
+        _, saida, tarefa, resposta = await self.conectar(bia, self.projeto.id)
+        self.assertEqual(resposta['type'], 'websocket.accept')
+
+        await sync_to_async(self.projeto.membros.remove)(bia)
+
+        self.assertEqual(await asyncio.wait_for(saida.get(), 2), {'type': 'websocket.close', 'code': 4403})
+        await tarefa
+
+    def test_evento_grande_vira_recarregar_no_postgres(self):
+        from .tempo_real import BrokerPostgres
+
+        cursor = mock.MagicMock()
+        with mock.patch('projetos.tempo_real.connection') as conexao:
+            conexao.cursor.return_value.__enter__.return_value = cursor
+            broker = BrokerPostgres()
+            broker.publicar('board.1', {'tipo': 'card.atualizado', 'cards': [{'id': 1, 'prompt_refinado': 'x' * 9000}]})
+            broker.publicar('board.1', {'tipo': 'card.movido', 'cards': [{'id': 1, 'coluna': 2, 'ordem': 0}]})
+
+        grande, pequeno = [json.loads(c.args[1][1]) for c in cursor.execute.call_args_list]
+        self.assertEqual(grande['evento'], {'tipo': 'recarregar'})
+        self.assertEqual(pequeno['evento']['tipo'], 'card.movido')
+
+    def test_falha_do_broker_nao_derruba_a_escrita(self):
+        with mock.patch('projetos.tempo_real.obter_broker', side_effect=RuntimeError('payload')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.api.patch(f'/api/cards/{self.card.id}/', {'titulo': 'Novo'})
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ArquivamentoTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=3)
+
+    def arquivar(self, acao='arquivar'):
+        return self.client.post(f'/api/workspaces/{self.projeto.id}/{acao}/')
+
+    def test_arquivar_move_o_board_para_o_snapshot(self):
+        response = self.arquivar()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['arquivado'])
+        self.assertFalse(Coluna.objects.filter(projeto=self.projeto).exists())
+        self.assertFalse(Card.objects.filter(coluna__projeto=self.projeto).exists())
+        self.assertFalse(Remocao.objects.filter(projeto=self.projeto).exists())
+        arquivo = ArquivoProjeto.objects.get(projeto=self.projeto)
+        self.assertEqual((arquivo.total_colunas, arquivo.total_cards), (2, 6))
+        self.assertLess(len(arquivo.dados), arquivo.tamanho_original)
+
+    def test_desarquivar_devolve_o_board(self):
+        antes = self.client.get(f'/api/workspaces/{self.projeto.id}/').data
+        self.arquivar()
+
+        response = self.arquivar('desarquivar')
+
+        self.assertFalse(response.data['arquivado'])
+        self.assertFalse(ArquivoProjeto.objects.filter(projeto=self.projeto).exists())
+        depois = self.client.get(f'/api/workspaces/{self.projeto.id}/').data
+        campos = lambda board: [
+            (coluna['titulo'], [(c['titulo'], c['ordem'], c['criado_em']) for c in coluna['cards']])
+            for coluna in board['colunas']
+        ]
+        self.assertEqual(campos(depois), campos(antes))
+
+    def test_sync_de_antes_do_arquivamento_recarrega(self):
+        cursor = self.client.get(f'/api/workspaces/{self.projeto.id}/').data['cursor']
+        self.arquivar()
+        self.arquivar('desarquivar')
+
+        data = self.client.get(f'/api/workspaces/{self.projeto.id}/mudancas/', {'desde': cursor}).data
+
+        # Sem lápides dos ids antigos, aplicar as linhas novas duplicaria o board
+        self.assertTrue(data['recarregar'])
+        novo = self.client.get(f'/api/workspaces/{self.projeto.id}/').data['cursor']
+        data = self.client.get(f'/api/workspaces/{self.projeto.id}/mudancas/', {'desde': novo}).data
+        self.assertFalse(data['recarregar'])
+
+    def test_nao_arquiva_com_ia_em_andamento_e_preserva_o_historico(self):
+        from ai_engine.models import AgenteIA, JobIA
+
+        agente = AgenteIA.objects.create(nome='Refinador', descricao='', prompt_sistema='...')
+        card = Card.objects.filter(coluna__projeto=self.projeto).first()
+        job = JobIA.objects.create(card=card, agente=agente, usuario=self.user)
+
+        self.assertEqual(self.arquivar().status_code, 409)
+        self.assertTrue(Card.objects.filter(pk=card.pk).exists())
+
+        JobIA.objects.filter(pk=job.pk).update(status=JobIA.CONCLUIDO, resultado='Pronto')
+        self.assertEqual(self.arquivar().status_code, 200)
+        job.refresh_from_db()
+        self.assertEqual((job.card_id, job.resultado), (None, 'Pronto'))
+
+    def test_so_o_dono_arquiva(self):
+        bia = User.objects.create_user('bia', password='x')
+        self.projeto.membros.add(bia)
+        self.client.force_authenticate(bia)
+
+        self.assertEqual(self.arquivar().status_code, 403)
+        self.assertTrue(Coluna.objects.filter(projeto=self.projeto).exists())
+
+    def test_listagem_separa_ativos_e_arquivados(self):
+        ativo = criar_board(self.user, colunas=1, cards_por_coluna=1)
+        self.arquivar()
+
+        ativos = self.client.get('/api/workspaces/').data
+        arquivados = self.client.get('/api/workspaces/', {'arquivados': '1'}).data
+
+        self.assertEqual([p['id'] for p in ativos], [ativo.id])
+        self.assertEqual([p['id'] for p in arquivados], [self.projeto.id])
+
+    def test_projeto_arquivado_nao_e_editado(self):
+        self.arquivar()
+
+        criar = self.client.post('/api/colunas/', {'projeto': self.projeto.id, 'titulo': 'Nova'})
+        mudancas = self.client.get(
+            f'/api/workspaces/{self.projeto.id}/mudancas/', {'desde': timezone.now().isoformat()}
+        )
+        patch = self.client.patch(f'/api/workspaces/{self.projeto.id}/', {'arquivado': False})
+
+        self.assertEqual(criar.status_code, 400)
+        self.assertTrue(mudancas.data['recarregar'])
+        self.assertEqual(patch.status_code, 200)
+        self.assertTrue(Projeto.objects.get(pk=self.projeto.pk).arquivado)
+
+
+@override_settings(AUTH_CACHE_TTL=60, ACESSO_CACHE_TTL=300)
+class CacheAcessoTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.bia = User.objects.create_user('bia', password='x')
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=2)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def queries(self, metodo, url, dados=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, metodo)(url, dados)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_segundo_request_nao_busca_o_usuario(self):
+        url = f'/api/workspaces/{self.projeto.id}/'
+        _, primeiro = self.queries('get', url)
+        response, segundo = self.queries('get', url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(segundo), len(primeiro) - 1)
+        self.assertFalse(any('FROM "auth_user"' in sql for sql in segundo))
+
+    def test_querysets_filtram_por_exists_e_nao_pela_lista_de_ids(self):
+        outros = [Projeto(titulo=f'P{i}', dono=self.bia) for i in range(50)]
+        self.projeto.membros.add(self.bia)
+        for projeto in Projeto.objects.bulk_create(outros):
+            projeto.membros.add(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.bia)}')
+
+        response, sqls = self.queries('get', '/api/workspaces/')
+
+        self.assertEqual(len(response.data), 51)
+        self.assertTrue(any('EXISTS' in sql for sql in sqls))
+        self.assertFalse(any('"projetos_projeto"."id" IN (' in sql for sql in sqls))
+
+    def test_usuario_salvo_invalida_o_cache(self):
+        self.client.get('/api/workspaces/')
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get('/api/workspaces/').status_code, 401)
+
+    def test_mudanca_em_membros_vale_no_proximo_request(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.bia)}')
+        url = f'/api/workspaces/{self.projeto.id}/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.projeto.membros.add(self.bia)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.bia.projetos_membro.remove(self.projeto)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_troca_de_dono_invalida_os_dois(self):
+        url = f'/api/workspaces/{self.projeto.id}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.projeto.dono = self.bia
+        self.projeto.save()
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.bia)}')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_invalida_de_novo_depois_do_commit(self):
+        chave = f'acesso:projetos:{self.bia.pk}'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projeto.membros.add(self.bia)
+            # Request concorrente leu os ids antigos antes do commit
+            cache.set(chave, frozenset(), 300)
+
+        self.assertIsNone(cache.get(chave))
+
+    @override_settings(AUTH_CACHE_TTL=0, ACESSO_CACHE_TTL=0)
+    def test_sem_cache_compartilhado_nao_guarda_entre_requests(self):
+        self.client.get(f'/api/workspaces/{self.projeto.id}/')
+
+        self.assertIsNone(cache.get(f'auth:usuario:{self.user.pk}'))
+        self.assertIsNone(cache.get(f'acesso:projetos:{self.user.pk}'))
+
+    def test_mover_confere_o_destino_pelos_ids_em_cache(self):
+        card = Card.objects.filter(coluna__projeto=self.projeto).first()
+        a, b = self.projeto.colunas.order_by('ordem')
+        self.queries('post', f'/api/cards/{card.id}/mover/', {'coluna_id': b.id, 'nova_posicao': 0})
+
+        response, sqls = self.queries('post', f'/api/cards/{card.id}/mover/', {'coluna_id': a.id, 'nova_posicao': 0})
+
+        # Só o EXISTS do get_object(); o destino sai dos ids guardados no primeiro request
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum('projetos_projeto_membros' in sql for sql in sqls), 1)
+
+
+class MetricasTests(APITestCase):
+    def setUp(self):
+        for histograma in HISTOGRAMAS:
+            histograma.limpar()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_authenticate(self.user)
+        self.projeto = criar_board(self.user, colunas=2, cards_por_coluna=2)
+
+    def server_timing(self, response):
+        partes = [parte.split(';') for parte in response['Server-Timing'].split(', ')]
+        return {parte[0]: parte[1:] for parte in partes}
+
+    def test_server_timing_com_banco_e_serializacao(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/workspaces/{self.projeto.id}/')
+
+        timing = self.server_timing(response)
+        self.assertEqual(timing['db'][1], f'desc="{len(ctx.captured_queries)} queries"')
+        self.assertIn('serializacao', timing)
+        self.assertIn('render', timing)
+        self.assertIn('total', timing)
+
+    def test_metrics_agrega_por_rota(self):
+        self.client.get('/api/workspaces/')
+        self.client.get('/api/workspaces/')
+        self.client.get('/api/cards/?fields=titulo')
+
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        texto = self.client.get('/metrics').content.decode()
+
+        self.assertIn(
+            'alchemist_http_duracao_segundos_count{rota="projeto-list",metodo="GET",status="200"} 2', texto
+        )
+        self.assertIn('alchemist_http_db_queries_bucket{rota="card-list",metodo="GET",le="+Inf"} 1', texto)
+        self.assertIn('# TYPE alchemist_http_serializacao_segundos histogram', texto)
+
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_metrics_com_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_sem_token_so_para_staff(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class OrcamentoQueriesTests(APITestCase):
+    """Queries por endpoint não crescem com o board (cache de acesso frio)."""
+    TAMANHOS = [(1, 1), (5, 10), (10, 40)]  # (colunas, cards por coluna)
+
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='x')
+        self.bia = User.objects.create_user('bia', password='x')
+        self.client.force_authenticate(self.user)
+
+    def boards(self):
+        for colunas, cards in self.TAMANHOS:
+            projeto = criar_board(self.user, colunas=colunas, cards_por_coluna=cards, membros=[self.bia])
+            criar_board(self.bia, colunas=colunas, cards_por_coluna=cards, membros=[self.user])
+            cache.clear()
+            with self.subTest(colunas=colunas, cards=cards):
+                yield projeto
+
+    def test_workspaces(self):
+        for projeto in self.boards():
+            with orcamento_queries(2):
+                self.client.get('/api/workspaces/')
+            cache.clear()
+            with orcamento_queries(4):
+                self.client.get(f'/api/workspaces/{projeto.id}/')
+
+    def test_colunas_e_cards(self):
+        for projeto in self.boards():
+            with orcamento_queries(3):
+                self.client.get('/api/colunas/')
+            cache.clear()
+            with orcamento_queries(2):
+                self.client.get('/api/cards/')
+
+    def test_mover(self):
+        for projeto in self.boards():
+            origem, destino = projeto.colunas.order_by('ordem')[0], projeto.colunas.order_by('-ordem')[0]
+            card = origem.cards.order_by('ordem').last()
+            with orcamento_queries(8):
+                response = self.client.post(f'/api/cards/{card.id}/mover/', {'coluna_id': destino.id, 'nova_posicao': 0})
+            self.assertEqual(response.status_code, 200)
+
+
+class DetectorNMais1Tests(TestCase):
+    def test_forma_ignora_valores_e_tamanho_do_in(self):
+        self.assertEqual(
+            forma_sql('SELECT "a"."id" FROM "a" WHERE "a"."x" = 10 AND "a"."y" IN (%s, %s, %s)'),
+            forma_sql('SELECT "a"."id" FROM "a" WHERE "a"."x" = 7 AND "a"."y" IN (%s)'),
+        )
+        self.assertNotEqual(forma_sql("SELECT 1 FROM t1 WHERE nome = 'x'"), forma_sql('SELECT 1 FROM t2'))
+
+    def test_acusa_query_por_linha(self):
+        user = User.objects.create_user('ana', password='x')
+        criar_board(user, colunas=5, cards_por_coluna=1)
+
+        with self.assertRaisesMessage(OrcamentoExcedido, 'N+1'):
+            with orcamento_queries(100):
+                [card.coluna.titulo for card in Card.objects.all()]
+        with orcamento_queries(1):
+            [card.coluna.titulo for card in Card.objects.select_related('coluna')]
+
+    def test_orcamento_excedido_lista_as_queries(self):
+        with self.assertRaisesMessage(OrcamentoExcedido, '2 queries, orçamento de 1'):
+            with orcamento_queries(1):
+                User.objects.count()
+                Projeto.objects.count()
+
+    @override_settings(CONSULTAS_N_MAIS_1=True)
+    def test_middleware_avisa_no_console(self):
+        user = User.objects.create_user('ana', password='x')
+        for n in range(5):
+            criar_board(user, titulo=f'P{n}', colunas=0)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        # Um SerializerMethodField que consulta por linha
+        por_linha = lambda serializer, obj: obj.membros.count() + 1
+        with mock.patch.object(ProjetoSerializer, 'get_total_membros', por_linha), \
+                mock.patch('sys.stdout', new_callable=StringIO) as saida:
+            client.get('/api/workspaces/')
+
+        self.assertIn('N+1 em GET /api/workspaces/: 5x', saida.getvalue())
+
+    def test_coletores_aninhados(self):
+        with coletar_queries() as fora:
+            User.objects.count()
+            with coletar_queries() as dentro:
+                Projeto.objects.count()
+
+        self.assertEqual((len(fora), len(dentro)), (2, 1))
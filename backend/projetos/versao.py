@@ -0,0 +1,86 @@
+"""
+Versão do board, usada como ETag no GET de workspaces/<id>/.
+
+Projeto.versao sobe a cada mudança no board (projeto, membros, colunas ou
+cards). Com isso, o retrieve responde 304 a um If-None-Match lendo só essa
+coluna, sem montar nem serializar a árvore.
+
+save()/delete() de Card e Coluna, e mudanças em membros, sobem a versão
+pelos signals abaixo. Quem grava com bulk_update/update() (que não
+disparam signals) precisa chamar incrementar_versao() explicitamente.
+Apagar um card/coluna também deixa a lápide (Remocao) usada pelo sync
+incremental (sincronizacao.py).
+"""
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Card, Coluna, Projeto, Remocao
+from .sincronizacao import registrar_remocao
+
+
+def incrementar_versao(projeto_ids=None, coluna_ids=None):
+    """Sobe a versão (e o atualizado_em) dos projetos informados, direto ou pelas colunas, em 1 UPDATE."""
+    projetos = Projeto.objects.none()
+    if projeto_ids:
+        projetos = Projeto.objects.filter(pk__in=projeto_ids)
+    elif coluna_ids:
+        projetos = Projeto.objects.filter(colunas__in=coluna_ids)
+    return projetos.update(versao=F('versao') + 1, atualizado_em=timezone.now())
+
+
+def _em_cascata(origin, modelos):
+    # Apagar um projeto/coluna apaga os filhos em cascata: quem sobe a versão
+    # é o handler do objeto de origem, não um UPDATE por filho
+    modelo = getattr(origin, 'model', type(origin))
+    return modelo in modelos
+
+
+@receiver(post_save, sender=Projeto)
+def _projeto_salvo(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        incrementar_versao(projeto_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Projeto.membros.through)
+def _membros_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.projetos_membro.add(...): instance é o usuário
+        if pk_set:
+            incrementar_versao(projeto_ids=pk_set)
+    else:
+        incrementar_versao(projeto_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Coluna)
+def _coluna_salva(sender, instance, raw=False, **kwargs):
+    if not raw:
+        incrementar_versao(projeto_ids=[instance.projeto_id])
+
+
+@receiver(post_delete, sender=Coluna)
+def _coluna_apagada(sender, instance, origin=None, **kwargs):
+    if _em_cascata(origin, {Projeto}):
+        return
+    # A lápide da coluna basta: o cliente some com os cards dela junto
+    registrar_remocao(instance.projeto_id, Remocao.COLUNA, instance.pk)
+    incrementar_versao(projeto_ids=[instance.projeto_id])
+
+
+@receiver(post_save, sender=Card)
+def _card_salvo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        incrementar_versao(coluna_ids=[instance.coluna_id])
+
+
+@receiver(post_delete, sender=Card)
+def _card_apagado(sender, instance, origin=None, **kwargs):
+    if _em_cascata(origin, {Projeto, Coluna}):
+        return
+    projeto_id = Coluna.objects.filter(pk=instance.coluna_id).values_list('projeto_id', flat=True).first()
+    if projeto_id is not None:
+        registrar_remocao(projeto_id, Remocao.CARD, instance.pk)
+        incrementar_versao(projeto_ids=[projeto_id])
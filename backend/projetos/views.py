@@ -1,23 +1,209 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.db import transaction
 from django.db.models import Max
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from core.metricas import medir
+
 from .models import Projeto, Coluna, Card
-from .serializers import ProjetoSerializer, ColunaSerializer, CardSerializer
+from .acesso import cards_acessiveis, colunas_acessiveis, ids_acessiveis, projetos_acessiveis
+from .arquivamento import JobsEmAndamento, arquivar, desarquivar
+from .ordenacao import aplicar_movimentos, posicionar_card, proxima_ordem
+from .leitura import board_em_dict, cards_em_dicts
+from .paginacao import pagina_de_cards
+from .projecao import projetar_cards
+from .serializers import (
+    ProjetoSerializer, ProjetoResumoSerializer, ColunaSerializer, ColunaSemCardsSerializer, CardSerializer,
+    MovimentoCardSerializer
+)
+from .sincronizacao import ler_cursor, mudancas_desde, novo_cursor
+
+def cards_ordenados():
+    return Card.objects.order_by('ordem', 'id')
+
+
+def primeiros_cards(request=None):
+    # Só os primeiros N cards de cada coluna (o prefetch fatiado vira ROW_NUMBER()
+    # por coluna no SQL); o resto vem paginado por cards/pagina/
+    cards = projetar_cards(cards_ordenados(), request)
+    return Prefetch('cards', queryset=cards[:settings.BOARD_CARDS_POR_COLUNA], to_attr='primeiros_cards')
+
+
+def com_primeiros_cards(colunas, request=None):
+    # total_cards diz à coluna se há mais cards além dos do board (proximo_cursor)
+    return colunas.annotate(total_cards=Count('cards')).prefetch_related(primeiros_cards(request))
+
+
+def colunas_com_cards(request=None):
+    # Colunas já trazendo os cards ordenados (1 query para colunas + 1 para cards)
+    return com_primeiros_cards(Coluna.objects.order_by('ordem', 'id'), request)
+
+
+def total_membros_subquery():
+    # Conta os membros via subquery correlacionada, sem JOIN com a tabela de
+    # membros na query principal (o que multiplicaria as linhas do projeto).
+    membros = (
+        Projeto.membros.through.objects
+        .filter(projeto_id=OuterRef('pk'))
+        .order_by()
+        .values('projeto_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(membros), Value(0))
+
+
+def agregado_cards_subquery(agregado, **filtros):
+    # Agrega os cards de cada projeto numa subquery correlacionada,
+    # sem multiplicar as linhas do projeto com JOINs
+    cards = (
+        Card.objects
+        .filter(coluna__projeto_id=OuterRef('pk'), **filtros)
+        .order_by()
+        .values('coluna__projeto_id')
+        .annotate(valor=agregado)
+        .values('valor')
+    )
+    return Subquery(cards)
+
+
+def etag_do_board(projeto_id, versao, user_id):
+    # O usuário entra no ETag porque a resposta muda por usuário (is_dono)
+    return quote_etag(f'{projeto_id}.{versao}.{user_id}')
+
+
+def etag_confere(etag, if_none_match):
+    # Comparação fraca (RFC 9110): um proxy com gzip devolve W/"..."
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in [e.removeprefix('W/') for e in etags]
+
+
+def com_etag(response, etag):
+    response['ETag'] = etag
+    # O navegador guarda o board mas revalida sempre (manda If-None-Match sozinho)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 
 class ProjetoViewSet(viewsets.ModelViewSet):
     serializer_class = ProjetoSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_serializer_class(self):
+        # A listagem (Dashboard) só precisa do resumo; o board completo fica no retrieve
+        if self.action == 'list':
+            return ProjetoResumoSerializer
+        return ProjetoSerializer
+
     def get_queryset(self):
         user = self.request.user
-        # Projetos onde sou dono OU membro
-        return Projeto.objects.filter(
-            Q(dono=user) | Q(membros=user)
-        ).distinct()
+        # Projetos onde sou dono OU membro (EXISTS, sem JOIN + DISTINCT)
+        queryset = (
+            projetos_acessiveis(user)
+            .select_related('dono')
+            .annotate(num_membros=total_membros_subquery())
+        )
+
+        if self.action == 'list':
+            # Por padrão só os ativos (pelos índices parciais de arquivado=False);
+            # ?arquivados=1 lista os arquivados
+            arquivados = self.request.query_params.get('arquivados') in ('1', 'true')
+            # Contadores calculados no SQL, sem carregar colunas nem cards
+            return queryset.filter(arquivado=arquivados).annotate(
+                total_cards=Coalesce(agregado_cards_subquery(Count('*')), Value(0)),
+                cards_atrasados=Coalesce(
+                    agregado_cards_subquery(Count('*'), prazo__lt=timezone.now()), Value(0)
+                ),
+                ultima_atividade=Coalesce(
+                    agregado_cards_subquery(Max('atualizado_em')), 'criado_em'
+                ),
+            )
+
+        # A árvore inteira (projeto -> colunas -> cards) sai em 3 queries fixas
+        return queryset.prefetch_related(Prefetch('colunas', queryset=colunas_com_cards(self.request)))
+
+    def retrieve(self, request, *args, **kwargs):
+        # GET condicional: se o board não mudou desde o ETag do cliente,
+        # responde 304 lendo só Projeto.versao (sem prefetch nem serializer)
+        try:
+            projeto_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        projetos = projetos_acessiveis(request.user).filter(pk=projeto_id)
+        versao = projetos.values_list('versao', flat=True).first()
+        if versao is None:
+            raise Http404
+        # Versão lida antes do board: no pior caso o ETag é mais velho que o
+        # conteúdo (o cliente só baixa de novo), nunca o contrário
+        etag = etag_do_board(projeto_id, versao, request.user.pk)
+        if etag_confere(etag, request.headers.get('If-None-Match', '')):
+            return com_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        # Cursor do sync incremental: tomado antes de ler o board
+        cursor = novo_cursor()
+        # Leitura rápida (.values() -> dicts), mesma saída do ProjetoSerializer
+        with medir('serializacao'):
+            data = board_em_dict(projetos.annotate(num_membros=total_membros_subquery()), request)
+        if data is None:
+            raise Http404
+        data['cursor'] = cursor
+        return com_etag(Response(data), etag)
+
+    # --- SYNC INCREMENTAL ---
+    # GET workspaces/<id>/mudancas/?desde=<cursor>: só o que mudou desde o cursor
+    @action(detail=True, methods=['get'])
+    def mudancas(self, request, pk=None):
+        cursor = novo_cursor()
+        try:
+            desde = ler_cursor(request.query_params.get('desde'))
+        except ValueError:
+            return Response({'error': "Parâmetro 'desde' inválido"}, status=status.HTTP_400_BAD_REQUEST)
+
+        projeto = get_object_or_404(projetos_acessiveis(request.user), pk=pk)
+        mudancas = None if projeto.arquivado else mudancas_desde(projeto, desde)
+        if mudancas is None:
+            # Cursor mais velho que as lápides guardadas: só recarregando o board inteiro
+            return Response({'cursor': cursor, 'recarregar': True})
+
+        with medir('serializacao'):
+            cards = cards_em_dicts(mudancas['cards'], request)
+        return Response({
+            'cursor': cursor,
+            'recarregar': False,
+            'versao': projeto.versao,
+            'colunas': ColunaSemCardsSerializer(mudancas['colunas'], many=True).data,
+            'cards': cards,
+            'removidos': mudancas['removidos'],
+        })
+
+    # --- ARQUIVAR / DESARQUIVAR ---
+    # Colunas e cards vão para um snapshot comprimido (projetos/arquivamento.py)
+    @action(detail=True, methods=['post'])
+    def arquivar(self, request, pk=None):
+        return self._trocar_arquivamento(arquivar, pk)
+
+    @action(detail=True, methods=['post'])
+    def desarquivar(self, request, pk=None):
+        return self._trocar_arquivamento(desarquivar, pk)
+
+    def _trocar_arquivamento(self, operacao, pk):
+        projeto = get_object_or_404(projetos_acessiveis(self.request.user), pk=pk)
+        if projeto.dono_id != self.request.user.id:
+            return Response({'error': 'Só o dono pode arquivar o projeto'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            projeto = operacao(projeto)
+        except JobsEmAndamento as e:
+            return Response({'error': f'{e} Tente de novo quando terminarem.'}, status=status.HTTP_409_CONFLICT)
+        return Response({'id': projeto.id, 'arquivado': projeto.arquivado, 'versao': projeto.versao})
 
     def perform_create(self, serializer):
         serializer.save(dono=self.request.user)
@@ -28,9 +214,12 @@ class ColunaViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Coluna.objects.filter(
-            Q(projeto__dono=user) | Q(projeto__membros=user)
-        ).distinct()
+        return com_primeiros_cards(colunas_acessiveis(user), self.request)
+
+    def perform_create(self, serializer):
+        if serializer.validated_data['projeto'].arquivado:
+            raise ValidationError({'error': 'Projeto arquivado: desarquive antes de editar'})
+        serializer.save()
 
 class CardViewSet(viewsets.ModelViewSet):
     serializer_class = CardSerializer
@@ -38,25 +227,41 @@ class CardViewSet(viewsets.ModelViewSet):
     queryset = Card.objects.all()
 
     def perform_create(self, serializer):
-        coluna_id = self.request.data.get('coluna')
-        
-        # 1. Busca qual é o maior número de 'ordem' que já existe nessa coluna
-        # O aggregate retorna algo tipo: {'ordem__max': 5}
-        maior_ordem_atual = Card.objects.filter(coluna_id=coluna_id).aggregate(Max('ordem'))['ordem__max']
-        
-        # 2. Se não tiver nenhum card (None), a ordem é 1.
-        # Se tiver (ex: 5), a nova ordem será 6.
-        nova_ordem = (maior_ordem_atual if maior_ordem_atual is not None else 0) + 1
-        
-        # 3. Salva o card com essa nova ordem calculada
-        serializer.save(ordem=nova_ordem)
+        coluna = serializer.validated_data['coluna']
+
+        # O card novo entra no fim da coluna, com espaço livre depois do último
+        # (lê só a maior ordem pelo índice, sem aggregate)
+        serializer.save(ordem=proxima_ordem(coluna.id))
 
     def get_queryset(self):
         # Filtra apenas cards dos projetos que o usuário participa
-        return Card.objects.filter(
-            Q(coluna__projeto__membros=self.request.user) |
-            Q(coluna__projeto__dono=self.request.user)
-        ).distinct()
+        # (sem ler do banco os textos grandes que a projeção deixou de fora)
+        return projetar_cards(cards_acessiveis(self.request.user), self.request)
+
+    # --- PÁGINA DE CARDS DE UMA COLUNA (scroll infinito) ---
+    # GET cards/pagina/?coluna=<id>&cursor=<proximo_cursor>&limite=50
+    @action(detail=False, methods=['get'])
+    def pagina(self, request):
+        try:
+            coluna_id = int(request.query_params.get('coluna'))
+            limite = int(request.query_params.get('limite') or settings.BOARD_CARDS_POR_COLUNA)
+        except (TypeError, ValueError):
+            return Response({'error': "Parâmetro 'coluna' é obrigatório"}, status=status.HTTP_400_BAD_REQUEST)
+        limite = max(1, min(limite, settings.BOARD_CARDS_PAGINA_MAXIMA))
+
+        try:
+            cards, proximo_cursor = pagina_de_cards(
+                self.get_queryset().filter(coluna_id=coluna_id),
+                request.query_params.get('cursor'),
+                limite,
+            )
+        except ValueError:
+            return Response({'error': 'Cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'cards': self.get_serializer(cards, many=True).data,
+            'proximo_cursor': proximo_cursor,
+        })
 
     # --- AÇÃO DE MOVER (Drag & Drop Vertical) ---
     # Mantivemos essa função pois ela organiza a ordem dos cards
@@ -69,32 +274,70 @@ class CardViewSet(viewsets.ModelViewSet):
         
         try:
             nova_posicao = int(request.data.get('nova_posicao'))
+            coluna_destino_id = int(nova_coluna_id) if nova_coluna_id else card.coluna_id
         except (TypeError, ValueError):
             return Response({'error': 'Posição inválida'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # A coluna de destino também precisa ser de um projeto do usuário (ids em cache, acesso.py)
+        if coluna_destino_id != card.coluna_id and Coluna.objects.filter(pk=coluna_destino_id).values_list(
+            'projeto_id', flat=True
+        ).first() not in ids_acessiveis(request.user):
+            return Response({'error': 'Coluna inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             with transaction.atomic():
-                # 1. Atualiza a coluna do card (se mudou)
-                if nova_coluna_id and int(nova_coluna_id) != card.coluna.id:
-                    card.coluna_id = nova_coluna_id
-                    card.save()
-
-                # 2. Pega todos os cards da coluna de destino, ordenados
-                cards_na_coluna = list(Card.objects.filter(coluna=card.coluna).exclude(id=card.id).order_by('ordem'))
-                
-                # 3. Insere o card na posição desejada
-                posicao_real = min(nova_posicao, len(cards_na_coluna))
-                cards_na_coluna.insert(posicao_real, card)
-
-                # 4. Salva a nova ordem de todos os vizinhos
-                for index, c in enumerate(cards_na_coluna):
-                    c.ordem = index
-                    c.save(update_fields=['ordem'])
-
-            return Response({'status': 'Card movido com sucesso'})
+                # Grava só o card movido (ordem esparsa, ver ordenacao.py);
+                # a coluna só é renumerada quando acaba o espaço entre vizinhos
+                posicionar_card(card, coluna_destino_id, nova_posicao)
+
+            return Response({'status': 'Card movido com sucesso', 'ordem': card.ordem})
         
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    # --- MOVER EM LOTE (multi-seleção / limpeza de coluna) ---
+    # Recebe: { "movimentos": [{ "card_id": 1, "coluna_id": 2, "nova_posicao": 0 }, ...] }
+    @action(detail=False, methods=['post'], url_path='mover-lote')
+    def mover_lote(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'error': "Envie um objeto com 'movimentos'"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = MovimentoCardSerializer(data=request.data.get('movimentos'), many=True)
+        serializer.is_valid(raise_exception=True)
+        movimentos = serializer.validated_data
+        if not movimentos:
+            return Response({'error': 'Nenhum movimento informado'}, status=status.HTTP_400_BAD_REQUEST)
+
+        card_ids = {m['card_id'] for m in movimentos}
+        coluna_ids = {m['coluna_id'] for m in movimentos}
+
+        # Projetos envolvidos (origem dos cards + colunas de destino)
+        projetos_origem = dict(
+            Card.objects.filter(pk__in=card_ids).values_list('id', 'coluna__projeto_id')
+        )
+        projetos_destino = dict(
+            Coluna.objects.filter(pk__in=coluna_ids).values_list('id', 'projeto_id')
+        )
+        if len(projetos_origem) != len(card_ids) or len(projetos_destino) != len(coluna_ids):
+            return Response({'error': 'Card ou coluna inexistente'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Permissão pelos ids em cache (acesso.py), sem query por projeto ou card
+        projetos_afetados = set(projetos_origem.values()) | set(projetos_destino.values())
+        if not projetos_afetados <= ids_acessiveis(request.user):
+            return Response({'error': 'Sem permissão em um dos projetos'}, status=status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            colunas = aplicar_movimentos(movimentos)
+
+        # Devolve a nova ordem de cada coluna tocada (o Frontend não precisa recarregar)
+        return Response({
+            'colunas': [
+                {
+                    'id': coluna_id,
+                    'cards': [{'id': card.id, 'ordem': card.ordem} for card in cards],
+                }
+                for coluna_id, cards in colunas.items()
+            ]
+        })
+
     # REMOVIDO: O método 'refinar' foi deletado daqui.
     # Agora o Frontend chama direto '/api/ai/run/' que está no outro arquivo (ai_engine/views.py)
\ No newline at end of file
@@ -90,8 +90,12 @@ export default function CardModal({ isOpen, onClose, cardData, columns, onSave,
     if (!activeId) return; // Se falhou ao salvar, para aqui
     
     setIsGenerating(true);
+    setAiResult('');
     try {
-      const response = await projectService.refineCard(activeId, selectedAgentId);
+      // O texto aparece enquanto o agente escreve (streaming)
+      const response = await projectService.refineCardStream(
+        activeId, selectedAgentId, (texto) => setAiResult((atual) => atual + texto)
+      );
       setAiResult(response.result);
       toast.success("Sugestão gerada!");
     } catch (error) {
@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
-import { Plus, FolderGit2, Trash2, ArrowRight, Users, UserCheck } from 'lucide-react';
+import { Plus, FolderGit2, Trash2, ArrowRight, Users, UserCheck, Archive, ArchiveRestore } from 'lucide-react';
 import { projectService } from '../services/projectService';
 
 export default function Dashboard() {
@@ -9,15 +9,16 @@ export default function Dashboard() {
   const [showModal, setShowModal] = useState(false);
   const [newProjectName, setNewProjectName] = useState('');
   const [isAIModalOpen, setIsAIModalOpen] = useState(false);
+  const [showArchived, setShowArchived] = useState(false);
 
-  // Carregar projetos ao abrir a tela
+  // Carregar projetos ao abrir a tela (e ao alternar ativos/arquivados)
   useEffect(() => {
     loadProjects();
-  }, []);
+  }, [showArchived]);
 
   async function loadProjects() {
     try {
-      const data = await projectService.getAll();
+      const data = await projectService.getAll(showArchived);
       setProjects(data);
     } catch (error) {
       console.error("Erro ao carregar:", error);
@@ -51,6 +52,20 @@ export default function Dashboard() {
     }
   }
 
+  async function handleToggleArchive(id, e) {
+    e.preventDefault();
+    try {
+      if (showArchived) {
+        await projectService.unarchive(id);
+      } else {
+        await projectService.archive(id);
+      }
+      loadProjects();
+    } catch (error) {
+      alert(error.response?.data?.error || "Erro ao arquivar projeto");
+    }
+  }
+
   // Filtragem dos Projetos
   const myProjects = projects.filter(p => p.is_dono);
   const sharedProjects = projects.filter(p => !p.is_dono);
@@ -98,15 +113,24 @@ export default function Dashboard() {
            Abrir <ArrowRight size={16} className="ml-1" />
         </div>
 
-        {/* Só mostra lixeira se for MEU projeto */}
+        {/* Só mostra arquivar/lixeira se for MEU projeto */}
         {!isShared && (
-           <button 
-             onClick={(e) => handleDelete(project.id, e)}
-             className="text-gray-300 hover:text-red-500 dark:text-gray-600 dark:hover:text-red-400 transition-colors p-1"
-             title="Apagar Projeto"
-           >
-             <Trash2 size={18} />
-           </button>
+           <div className="flex items-center gap-1">
+             <button 
+               onClick={(e) => handleToggleArchive(project.id, e)}
+               className="text-gray-300 hover:text-indigo-500 dark:text-gray-600 dark:hover:text-indigo-400 transition-colors p-1"
+               title={showArchived ? "Desarquivar Projeto" : "Arquivar Projeto"}
+             >
+               {showArchived ? <ArchiveRestore size={18} /> : <Archive size={18} />}
+             </button>
+             <button 
+               onClick={(e) => handleDelete(project.id, e)}
+               className="text-gray-300 hover:text-red-500 dark:text-gray-600 dark:hover:text-red-400 transition-colors p-1"
+               title="Apagar Projeto"
+             >
+               <Trash2 size={18} />
+             </button>
+           </div>
         )}
       </div>
     </Link>
@@ -121,12 +145,20 @@ export default function Dashboard() {
           <p className="text-gray-500 dark:text-gray-400 mt-1">Gerencie suas ideias e tarefas</p>
         </div>
         
-        <button 
-          onClick={() => setShowModal(true)}
-          className="bg-indigo-600 hover:bg-indigo-700 text-white px-4 py-2 rounded-lg flex items-center gap-2 transition-colors shadow-md"
-        >
-          <Plus size={20} /> Novo Projeto
-        </button>
+        <div className="flex items-center gap-3">
+          <button 
+            onClick={() => setShowArchived(!showArchived)}
+            className="text-gray-600 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-gray-700 px-4 py-2 rounded-lg flex items-center gap-2 transition-colors border border-gray-200 dark:border-gray-700"
+          >
+            <Archive size={18} /> {showArchived ? 'Ver Ativos' : 'Ver Arquivados'}
+          </button>
+          <button 
+            onClick={() => setShowModal(true)}
+            className="bg-indigo-600 hover:bg-indigo-700 text-white px-4 py-2 rounded-lg flex items-center gap-2 transition-colors shadow-md"
+          >
+            <Plus size={20} /> Novo Projeto
+          </button>
+        </div>
       </div>
 
       {loading ? (
@@ -144,10 +176,12 @@ export default function Dashboard() {
               {/* Estado Vazio */}
               {myProjects.length === 0 && (
                 <div className="col-span-full text-center py-12 bg-white dark:bg-gray-800 rounded-xl border border-dashed border-gray-300 dark:border-gray-700">
-                  <p className="text-gray-500 dark:text-gray-400 mb-4">Você ainda não tem projetos.</p>
-                  <button onClick={() => setShowModal(true)} className="text-indigo-600 dark:text-indigo-400 font-semibold hover:underline">
+                  <p className="text-gray-500 dark:text-gray-400 mb-4">
+                    {showArchived ? 'Nenhum projeto arquivado.' : 'Você ainda não tem projetos.'}
+                  </p>
+                  {!showArchived && <button onClick={() => setShowModal(true)} className="text-indigo-600 dark:text-indigo-400 font-semibold hover:underline">
                     Comece criando um agora
-                  </button>
+                  </button>}
                 </div>
               )}
             </div>
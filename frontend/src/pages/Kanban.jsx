@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { ArrowLeft, Plus, MoreHorizontal, Clock, AlertCircle, Sparkles, Trash2, X, Check, Edit2 } from 'lucide-react'; // <--- Adicionei Check e Edit2
 import { DragDropContext, Droppable, Draggable } from '@hello-pangea/dnd';
@@ -25,10 +25,56 @@ const mixHex = (hex, amount, toWhite = true) => {
   return `#${toHex(r)}${toHex(g)}${toHex(b)}`;
 };
 
+const byOrdem = (a, b) => a.ordem - b.ordem;
+
+// Códigos com que o servidor fecha o WebSocket do board quando recusa o usuário
+const NO_RETRY_CODES = new Set([4401, 4403]);
+
+// Eventos e mudanças já vêm na versão leve (resumo/refinado); se vier o texto inteiro, corta aqui
+const RESUMO = 200;
+function toBoardCard({ conteudo_original, prompt_refinado, ...card }) {
+  if (conteudo_original !== undefined) card.resumo = (conteudo_original || '').slice(0, RESUMO);
+  if (prompt_refinado !== undefined) card.refinado = !!prompt_refinado;
+  return card;
+}
+
+// Aplica um delta no board já carregado: o de workspaces/<id>/mudancas/
+// ou um evento do WebSocket (que pode trazer só alguns campos do card)
+function applyChanges(project, { colunas: changedCols = [], cards = [], removidos = {} }) {
+  const removedCols = new Set(removidos.colunas || []);
+  const removedCards = new Set(removidos.cards || []);
+  const existing = new Map(project.colunas.flatMap(col => col.cards).map(card => [card.id, card]));
+  const changedCards = cards.map(card => ({ ...existing.get(card.id), ...toBoardCard(card) }));
+  const changedIds = new Set(changedCards.map(card => card.id));
+
+  const colunas = project.colunas
+    .filter(col => !removedCols.has(col.id))
+    .map(col => ({ ...col, cards: col.cards.filter(card => !changedIds.has(card.id) && !removedCards.has(card.id)) }));
+  const byId = new Map(colunas.map(col => [col.id, col]));
+
+  changedCols.forEach(col => {
+    if (byId.has(col.id)) {
+      Object.assign(byId.get(col.id), col);
+    } else if (!removedCols.has(col.id)) {
+      const nova = { ...col, cards: [] };
+      colunas.push(nova);
+      byId.set(col.id, nova);
+    }
+  });
+  changedCards.forEach(card => {
+    if (!removedCards.has(card.id)) byId.get(card.coluna)?.cards.push(card);
+  });
+
+  colunas.sort(byOrdem);
+  colunas.forEach(col => col.cards.sort(byOrdem));
+  return { ...project, colunas };
+}
+
 export default function Kanban() {
   const { id } = useParams();
   const [project, setProject] = useState(null);
   const [loading, setLoading] = useState(true);
+  const cursorRef = useRef(null); // cursor do sync incremental
   
   const [modalData, setModalData] = useState(null);
   
@@ -44,18 +90,71 @@ export default function Kanban() {
 
   useEffect(() => { loadProject(); }, [id]);
 
+  // Mudanças dos outros membros chegam pelo WebSocket do board
+  useEffect(() => {
+    let socket;
+    let retry;
+    let closed = false;
+    const connect = () => {
+      socket = projectService.subscribeBoard(id, (evento) => {
+        if (evento.tipo === 'recarregar') return syncProject();
+        setProject(prev => prev && applyChanges(prev, evento));
+      });
+      // Caiu: reconecta e recupera o que perdeu pelo sync incremental
+      // (4401 token inválido / 4403 sem acesso: reconectar não adianta)
+      socket.onclose = (event) => {
+        if (closed || NO_RETRY_CODES.has(event.code)) return;
+        retry = setTimeout(() => { syncProject(); connect(); }, 3000);
+      };
+    };
+    connect();
+    return () => { closed = true; clearTimeout(retry); socket.close(); };
+  }, [id]);
+
   async function loadProject() {
     try {
       const data = await projectService.getById(id);
-      data.colunas.sort((a, b) => a.ordem - b.ordem);
-      data.colunas.forEach(col => col.cards.sort((a, b) => a.ordem - b.ordem));
+      data.colunas.sort(byOrdem);
+      data.colunas.forEach(col => col.cards.sort(byOrdem));
+      cursorRef.current = data.cursor;
       setProject(data);
     } catch (e) { toast.error("Erro ao carregar."); } finally { setLoading(false); }
   }
 
+  // Depois de uma mutação: busca só o que mudou, em vez do board inteiro
+  async function syncProject() {
+    if (!cursorRef.current) return loadProject();
+    try {
+      const changes = await projectService.getChanges(id, cursorRef.current);
+      if (changes.recarregar) return loadProject();
+      cursorRef.current = changes.cursor;
+      setProject(prev => applyChanges(prev, changes));
+    } catch (e) { loadProject(); }
+  }
+
+  // Coluna grande: traz a próxima página de cards e junta no fim da lista
+  async function loadMoreCards(coluna) {
+    try {
+      const { cards, proximo_cursor } = await projectService.getCardsPage(coluna.id, coluna.proximo_cursor);
+      setProject(prev => ({
+        ...prev,
+        colunas: prev.colunas.map(col => {
+          if (col.id !== coluna.id) return col;
+          const ids = new Set(col.cards.map(card => card.id));
+          return { ...col, proximo_cursor, cards: [...col.cards, ...cards.filter(card => !ids.has(card.id))] };
+        }),
+      }));
+    } catch (e) { toast.error("Erro ao carregar mais cards."); }
+  }
+
   // --- HANDLERS ---
   function handleOpenCreate(columnId) { setModalData({ columnId: columnId }); }
-  function handleOpenEdit(card) { setModalData(card); }
+  // O board não tem os textos inteiros: busca o card completo ao abrir
+  async function handleOpenEdit(card) {
+    try {
+      setModalData(await projectService.getCard(card.id));
+    } catch (e) { toast.error("Erro ao abrir o card."); }
+  }
   function requestDelete(e, type, id, title) { e.stopPropagation(); setItemToDelete({ type, id, title }); }
 
   // Abre o menu de edição da coluna e preenche o título atual
@@ -76,7 +175,7 @@ export default function Kanban() {
       await projectService.createColumn(id, newColumnTitle, ordem);
       setNewColumnTitle('');
       setIsAddingColumn(false);
-      loadProject();
+      syncProject();
     } catch (e) { toast.error("Erro ao criar lista."); }
   }
 
@@ -117,7 +216,7 @@ export default function Kanban() {
             await projectService.deleteColumn(itemToDelete.id);
             toast.success("Lista removida.");
         }
-        loadProject();
+        syncProject();
     } catch (e) { toast.error("Erro ao excluir."); } 
     finally { setItemToDelete(null); }
   }
@@ -235,7 +334,7 @@ export default function Kanban() {
                             style={{ backgroundColor: headerColor }}
                         >
                           <h3 className="font-bold text-sm uppercase tracking-wider flex items-center gap-2">
-                            {coluna.titulo} <span className="bg-white/20 px-2 py-0.5 rounded-full text-[10px]">{coluna.cards.length}</span>
+                            {coluna.titulo} <span className="bg-white/20 px-2 py-0.5 rounded-full text-[10px]">{coluna.cards.length}{coluna.proximo_cursor && '+'}</span>
                           </h3>
                           
                           <div className="flex items-center gap-1">
@@ -295,9 +394,9 @@ export default function Kanban() {
                                         <button onClick={(e) => requestDelete(e, 'card', card.id, card.titulo)} className="absolute top-2 right-2 p-1.5 text-gray-400 hover:text-red-500 hover:bg-red-50 rounded-full opacity-0 group-hover:opacity-100 transition-opacity z-10"><Trash2 size={14} /></button>
                                         <div className="flex justify-between items-start mb-2 pr-6">
                                             <h4 className="font-bold text-gray-800 dark:text-gray-100 text-sm leading-snug">{card.titulo || "Sem título"}</h4>
-                                            {card.prompt_refinado && <Sparkles size={14} className="text-indigo-500 shrink-0" />}
+                                            {card.refinado && <Sparkles size={14} className="text-indigo-500 shrink-0" />}
                                         </div>
-                                        {card.conteudo_original && <p className="text-xs text-gray-500 line-clamp-2 mb-3">{card.conteudo_original}</p>}
+                                        {card.resumo && <p className="text-xs text-gray-500 line-clamp-2 mb-3">{card.resumo}</p>}
                                         {deadline && <div className={`inline-flex items-center gap-1.5 px-2 py-1 rounded-md text-[10px] font-bold ${deadline.color} ${deadline.bg}`}>{deadline.icon} <span>{deadline.label}</span></div>}
                                       </div>
                                     )}
@@ -305,6 +404,9 @@ export default function Kanban() {
                                 );
                               })}
                               {provided.placeholder}
+                              {coluna.proximo_cursor && (
+                                <button onClick={() => loadMoreCards(coluna)} className="w-full py-2 text-xs font-medium text-indigo-500 hover:bg-black/5 rounded-xl transition-colors">Carregar mais</button>
+                              )}
                               <button onClick={() => handleOpenCreate(coluna.id)} className="w-full py-3 mt-2 text-gray-500 hover:text-gray-800 hover:bg-black/5 rounded-xl text-sm font-medium transition-colors flex items-center justify-center gap-2"><Plus size={16} /> Adicionar Tarefa</button>
                             </div>
                           )}
@@ -347,7 +449,7 @@ export default function Kanban() {
         cardData={modalData}
         columns={project?.colunas}
         onClose={() => setModalData(null)}
-        onSave={() => loadProject()}
+        onSave={() => syncProject()}
         onDelete={(id) => requestDelete({stopPropagation:()=>{}}, 'card', id)}
       />
 
@@ -1,14 +1,34 @@
 import api from './api';
 
+// O board só mostra título, prazo, um trecho da descrição e se já foi refinado:
+// os textos inteiros ficam para quando o card é aberto (getCard)
+const BOARD_CARD_FIELDS = 'titulo,ordem,prazo,coluna,criado_em,resumo,refinado';
+
 export const projectService = {
   // --- PROJETOS ---
-  getAll: async () => {
-    const response = await api.get('workspaces/');
+  getAll: async (arquivados = false) => {
+    const response = await api.get('workspaces/', { params: arquivados ? { arquivados: 1 } : {} });
     return response.data;
   },
 
   getById: async (id) => {
-    const response = await api.get(`workspaces/${id}/`);
+    const response = await api.get(`workspaces/${id}/`, { params: { fields: BOARD_CARD_FIELDS } });
+    return response.data;
+  },
+
+  // WebSocket do board: onEvent recebe cada diff ({ tipo, cards?, colunas?, removidos? })
+  subscribeBoard: (id, onEvent) => {
+    const url = new URL(`${api.defaults.baseURL}ws/workspaces/${id}/`, window.location.origin);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    url.searchParams.set('token', localStorage.getItem('token'));
+    const socket = new WebSocket(url);
+    socket.onmessage = (msg) => onEvent(JSON.parse(msg.data));
+    return socket;
+  },
+
+  // Só o que mudou no board desde o cursor (colunas, cards e removidos)
+  getChanges: async (id, cursor) => {
+    const response = await api.get(`workspaces/${id}/mudancas/`, { params: { desde: cursor, fields: BOARD_CARD_FIELDS } });
     return response.data;
   },
 
@@ -21,6 +41,17 @@ export const projectService = {
     await api.delete(`workspaces/${id}/`);
   },
 
+  // Arquivar tira colunas e cards do board (ficam num snapshot no servidor)
+  archive: async (id) => {
+    const response = await api.post(`workspaces/${id}/arquivar/`);
+    return response.data;
+  },
+
+  unarchive: async (id) => {
+    const response = await api.post(`workspaces/${id}/desarquivar/`);
+    return response.data;
+  },
+
   // --- COLUNAS ---
   createColumn: async (projetoId, titulo, ordem = null) => {
     const payload = { 
@@ -39,6 +70,18 @@ export const projectService = {
   },
 
   // --- CARDS ---
+  // Próxima página de cards de uma coluna (o board traz só os primeiros)
+  getCardsPage: async (colunaId, cursor) => {
+    const response = await api.get('cards/pagina/', { params: { coluna: colunaId, cursor, fields: BOARD_CARD_FIELDS } });
+    return response.data;
+  },
+
+  // Card completo (com conteudo_original e prompt_refinado inteiros)
+  getCard: async (id) => {
+    const response = await api.get(`cards/${id}/`);
+    return response.data;
+  },
+
   createCard: async (colunaId, dataOrContent) => {
     // Se for string (antigo), converte. Se for objeto (novo), usa direto.
     let payload = {};
@@ -63,6 +106,13 @@ export const projectService = {
     });
   },
 
+  // Vários cards de uma vez: [{ card_id, coluna_id, nova_posicao }, ...]
+  // Retorna a nova ordem de cada coluna tocada
+  moveCards: async (movimentos) => {
+    const response = await api.post('cards/mover-lote/', { movimentos });
+    return response.data;
+  },
+
   // --- IA (TheAlchemist) ---
   // ADICIONADO AGORA: Essa função chama a rota de IA que criamos no backend
   updateCard: async (id, data) => {
@@ -84,4 +134,39 @@ export const projectService = {
     });
     return response.data;
   },
+
+  // Mesma chamada, recebendo o texto aos poucos (Server-Sent Events)
+  // onToken(texto) é chamado a cada pedaço; retorna o resultado final
+  refineCardStream: async (cardId, agenteId, onToken) => {
+    const response = await fetch(`${api.defaults.baseURL}ai/run/stream/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: api.defaults.headers.common['Authorization'],
+      },
+      body: JSON.stringify({ card_id: cardId, agente_id: agenteId }),
+    });
+    if (!response.ok) throw new Error(`Erro ${response.status} na IA`);
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Cada evento SSE termina com uma linha em branco
+      const eventos = buffer.split('\n\n');
+      buffer = eventos.pop();
+      for (const bloco of eventos) {
+        const tipo = bloco.match(/^event: (.*)$/m)?.[1];
+        const dados = JSON.parse(bloco.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (tipo === 'token') onToken?.(dados.texto);
+        if (tipo === 'erro') throw new Error(dados.error);
+        if (tipo === 'fim') return dados;
+      }
+    }
+    throw new Error('Stream encerrado antes do fim');
+  },
 };